@@ -0,0 +1,295 @@
+#!/usr/bin/env python
+''' Native AU test of FAAUTeC
+
+    Multiscale bootstrap over a matrix of per-site log-likelihoods as
+    described by Shimodaira (2002, Syst. Biol. 51:492-508) and implemented
+    in CONSEL. The replicates are drawn as multinomial site counts and
+    scored for all trees at once (RELL).
+'''
+
+import math
+import mmap
+import numpy as np
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor
+
+## scales and number of replicates of CONSEL's makermt
+SCALES = [0.5, 0.6, 0.7, 0.8, 0.9, 1.0, 1.1, 1.2, 1.3, 1.4]
+REPLICATES = 10000
+
+## upper bound of sites * replicates held in memory at once
+BATCH_CELLS = 2 ** 24
+
+## number of replicates per scale in one block of work
+SHARD_SIZE = 1000
+
+## number of sites from which on the count of a site pattern is drawn
+## directly, which is faster than drawing its sites
+BINOMIAL_RATIO = 8
+
+def readSiteLH(sitelh_path):
+    ''' Read a site likelihood file in PUZZLE format as written by RAxML
+        and IQ-TREE (first line: number of trees and sites, then one line
+        per tree starting with its name). Returns a trees x sites matrix. '''
+    with open(sitelh_path) as sitelh:
+        treeNumber, siteNumber = [int(i) for i in sitelh.readline().split()]
+        values = sitelh.read().split()
+
+    matrix = np.empty((treeNumber, siteNumber))
+    pos = 0
+    for i in range(treeNumber):
+        ## skip the name of the tree
+        pos = pos + 1
+        matrix[i] = np.asarray(values[pos:pos + siteNumber], dtype=float)
+        pos = pos + siteNumber
+    return matrix
+
+def _normInv(p):
+    ''' Inverse of the standard normal distribution function '''
+    ## Acklam's rational approximation, refined with one Newton step
+    a = [-3.969683028665376e+01, 2.209460984245205e+02, -2.759285104469687e+02,
+         1.383577518672690e+02, -3.066479806614716e+01, 2.506628277459239e+00]
+    b = [-5.447609879822406e+01, 1.615858368580409e+02, -1.556989798598866e+02,
+         6.680131188771972e+01, -1.328068155288572e+01]
+    c = [-7.784894002430293e-03, -3.223964580411365e-01, -2.400758277161838e+00,
+         -2.549732539343734e+00, 4.374664141464968e+00, 2.938163982698783e+00]
+    d = [7.784695709041462e-03, 3.224671290700398e-01, 2.445134137142996e+00,
+         3.754408661907416e+00]
+    if p < 0.02425:
+        q = math.sqrt(-2 * math.log(p))
+        x = (((((c[0]*q+c[1])*q+c[2])*q+c[3])*q+c[4])*q+c[5]) / ((((d[0]*q+d[1])*q+d[2])*q+d[3])*q+1)
+    elif p > 1 - 0.02425:
+        q = math.sqrt(-2 * math.log(1 - p))
+        x = -(((((c[0]*q+c[1])*q+c[2])*q+c[3])*q+c[4])*q+c[5]) / ((((d[0]*q+d[1])*q+d[2])*q+d[3])*q+1)
+    else:
+        q = p - 0.5
+        r = q * q
+        x = (((((a[0]*r+a[1])*r+a[2])*r+a[3])*r+a[4])*r+a[5])*q / (((((b[0]*r+b[1])*r+b[2])*r+b[3])*r+b[4])*r+1)
+    e = _norm(x) - p
+    return x - e * math.sqrt(2 * math.pi) * math.exp(x * x / 2)
+
+def _norm(x):
+    ''' Standard normal distribution function '''
+    return 0.5 * math.erfc(-x / math.sqrt(2))
+
+def _counts(draws, weights, size, rng):
+    ''' Multinomial counts of the columns for size replicates of draws
+        sites; weights are the integer numbers of sites per column. The
+        counts of the columns with many sites are drawn as a chain of
+        binomials over all replicates at once, the remaining draws as sites
+        of the other columns. '''
+    columns = len(weights)
+    counts = np.zeros((size, columns))
+    remaining = np.full(size, draws, dtype=np.int64)
+    rest = weights.sum()
+    heavy = np.flatnonzero(weights >= BINOMIAL_RATIO)
+    light = np.flatnonzero(weights < BINOMIAL_RATIO)
+    for j in heavy:
+        counts[:, j] = rng.binomial(remaining, min(1.0, weights[j] / rest))
+        remaining = remaining - counts[:, j].astype(np.int64)
+        rest = rest - weights[j]
+    if len(light) == columns and np.all(weights == 1):
+        ## every column is one site
+        drawn = rng.integers(0, columns, int(remaining.sum()))
+    elif len(light) > 0:
+        drawn = np.repeat(light, weights[light].astype(np.int64))
+        drawn = drawn[rng.integers(0, len(drawn), int(remaining.sum()))]
+    else:
+        return counts
+    drawn = drawn + np.repeat(np.arange(size) * columns, remaining)
+    return counts + np.bincount(drawn, minlength=size * columns).reshape(size, columns)
+
+def resample(matrix, weights, scale, replicates, rng):
+    ''' Draw replicates of round(scale * sites) sites and return the summed
+        log-likelihood of every tree, as a replicates x trees matrix. The
+        columns of matrix can be site patterns with their number of sites
+        as weights. '''
+    siteNumber = int(weights.sum())
+    columns = matrix.shape[1]
+    draws = int(round(scale * siteNumber))
+    integral = bool(np.all(weights == np.round(weights)))
+    batch = max(1, BATCH_CELLS // max(columns, draws))
+    scores = np.empty((replicates, matrix.shape[0]))
+    for start in range(0, replicates, batch):
+        size = min(batch, replicates - start)
+        if integral:
+            ## drawing site indices and counting them is much faster than
+            ## a multinomial draw over many equally likely sites
+            counts = _counts(draws, weights, size, rng)
+        else:
+            counts = rng.multinomial(draws, weights / weights.sum(), size=size)
+        scores[start:start + size] = counts @ matrix.T
+    return scores
+
+def _fitScales(bp, scales, replicates):
+    ''' Fit sigma * z = v + c * sigma^2 by weighted least squares over the
+        scales with 0 < bp < 1. Returns v and c or None. '''
+    x = []
+    y = []
+    w = []
+    for i in range(len(scales)):
+        if bp[i] <= 0 or bp[i] >= 1:
+            continue
+        sigma = math.sqrt(1 / scales[i])
+        z = _normInv(1 - bp[i])
+        ## variance of sigma * z from the binomial variance of bp
+        var = sigma ** 2 * bp[i] * (1 - bp[i]) / (replicates * (math.exp(-z * z / 2) / math.sqrt(2 * math.pi)) ** 2)
+        x.append(sigma ** 2)
+        y.append(sigma * z)
+        w.append(1 / var)
+    if len(x) < 2:
+        return None
+    x = np.array(x)
+    y = np.array(y)
+    w = np.array(w)
+    design = np.vstack([np.ones(len(x)), x]).T * np.sqrt(w)[:, None]
+    v, c = np.linalg.lstsq(design, y * np.sqrt(w), rcond=None)[0]
+    return v, c
+
+def _shard(matrix, weights, scales, replicates, seed, loglik, obs, rival):
+    ''' Run one block of replicates for every scale. Returns how often each
+        tree was the best one per scale and at scale 1, and the exceedance
+        counts of the KH and SH tests. '''
+    rng = np.random.default_rng(seed)
+    treeNumber = matrix.shape[0]
+    bp = np.zeros((len(scales), treeNumber))
+    kh = np.zeros(treeNumber)
+    sh = np.zeros(treeNumber)
+
+    runScales = list(scales)
+    if 1.0 not in runScales:
+        runScales.append(1.0)
+    for s in range(len(runScales)):
+        scores = resample(matrix, weights, runScales[s], replicates, rng)
+        counts = np.bincount(np.argmax(scores, axis=1), minlength=treeNumber)
+        if s < len(scales):
+            bp[s] = counts
+        if runScales[s] == 1.0:
+            unscaled = counts
+            ## the expectation of the unscaled replicates is the observed
+            ## log-likelihood, so the blocks can be centered independently
+            centered = scores - loglik
+            kh = np.sum(centered[:, rival] - centered >= obs, axis=0)
+            sh = np.sum(np.max(centered, axis=1)[:, None] - centered >= np.maximum(obs, 0), axis=0)
+    return bp, unscaled, kh, sh
+
+def _sharedShard(shm_name, shape, weights, scales, replicates, seed, loglik, obs, rival):
+    ''' Run _shard() on the matrix in shared memory of the calling process '''
+    shm = shared_memory.SharedMemory(name=shm_name)
+    matrix = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+    result = _shard(matrix, weights, scales, replicates, seed, loglik, obs, rival)
+    ## the view has to be released before the memory can be closed
+    del matrix
+    shm.close()
+    return result
+
+def _mappedShard(matrix_path, offset, shape, weights, scales, replicates, seed, loglik, obs, rival):
+    ''' Run _shard() on the matrix mapped from the file of the calling
+        process '''
+    matrix = np.memmap(matrix_path, dtype="<f8", mode="r", offset=offset, shape=shape)
+    result = _shard(matrix, weights, scales, replicates, seed, loglik, obs, rival)
+    del matrix
+    return result
+
+def auTest(matrix, weights=None, scales=SCALES, replicates=REPLICATES, seed=None, workers=1):
+    ''' Calculate the AU, NP, BP, KH and SH p-values of every tree.
+    Args:
+        matrix: trees x sites (or site patterns) matrix of log-likelihoods;
+            the workers map a matrix mapped from a file (e.g. by
+            PatternOps.openPatterns()) themselves instead of copying it
+        weights: number of sites per column of matrix, all 1 if None
+        scales: ratios of replicate size to alignment size
+        replicates: number of replicates per scale
+        seed: seed of the random number generator
+        workers: number of processes which share the replicates
+    Returns:
+        dictionary with one array per statistic
+    '''
+    if weights is None:
+        weights = np.ones(matrix.shape[1])
+    weights = np.asarray(weights, dtype=float)
+    mapped = None
+    if isinstance(matrix, np.memmap) and isinstance(matrix.base, mmap.mmap) and matrix.dtype == np.dtype("<f8") and matrix.flags.c_contiguous:
+        mapped = (matrix.filename, matrix.offset)
+    matrix = np.ascontiguousarray(matrix, dtype=np.float64)
+    treeNumber = matrix.shape[0]
+
+    loglik = matrix @ weights
+    ## observed statistic: distance of each tree to the best other tree
+    rival = np.zeros(treeNumber, dtype=int)
+    obs = np.zeros(treeNumber)
+    for i in range(treeNumber):
+        if treeNumber > 1:
+            others = [j for j in range(treeNumber) if j != i]
+            rival[i] = others[int(np.argmax(loglik[others]))]
+            obs[i] = loglik[rival[i]] - loglik[i]
+
+    ## the replicates are split into blocks of fixed size with their own
+    ## seed stream, so the result for a seed does not depend on workers
+    blocks = [min(SHARD_SIZE, replicates - start) for start in range(0, replicates, SHARD_SIZE)]
+    seeds = np.random.SeedSequence(seed).spawn(len(blocks))
+
+    if workers <= 1 or len(blocks) == 1:
+        shards = [_shard(matrix, weights, scales, blocks[i], seeds[i], loglik, obs, rival) for i in range(len(blocks))]
+    elif mapped:
+        ## every worker maps the pages of the file which the system holds once
+        with ProcessPoolExecutor(max_workers=min(workers, len(blocks))) as pool:
+            shards = list(pool.map(_mappedShard, [mapped[0]] * len(blocks), [mapped[1]] * len(blocks), [matrix.shape] * len(blocks),
+                                   [weights] * len(blocks), [scales] * len(blocks), blocks, seeds,
+                                   [loglik] * len(blocks), [obs] * len(blocks), [rival] * len(blocks)))
+    else:
+        shm = shared_memory.SharedMemory(create=True, size=matrix.nbytes)
+        try:
+            np.ndarray(matrix.shape, dtype=np.float64, buffer=shm.buf)[:] = matrix
+            with ProcessPoolExecutor(max_workers=min(workers, len(blocks))) as pool:
+                shards = list(pool.map(_sharedShard, [shm.name] * len(blocks), [matrix.shape] * len(blocks),
+                                       [weights] * len(blocks), [scales] * len(blocks), blocks, seeds,
+                                       [loglik] * len(blocks), [obs] * len(blocks), [rival] * len(blocks)))
+        finally:
+            shm.close()
+            shm.unlink()
+
+    bp = sum([shard[0] for shard in shards]) / float(replicates)
+    unscaled = sum([shard[1] for shard in shards]) / float(replicates)
+    kh = sum([shard[2] for shard in shards]) / float(replicates)
+    sh = sum([shard[3] for shard in shards]) / float(replicates)
+    if treeNumber < 2:
+        kh = sh = np.ones(treeNumber)
+
+    au = np.zeros(treeNumber)
+    naive = np.zeros(treeNumber)
+    for i in range(treeNumber):
+        fit = _fitScales(bp[:, i], scales, replicates)
+        if fit is None:
+            ## the tree is never or always the best one
+            au[i] = naive[i] = np.mean(bp[:, i])
+        else:
+            v, c = fit
+            au[i] = 1 - _norm(v - c)
+            naive[i] = 1 - _norm(v + c)
+
+    return {"loglik": loglik,
+            "obs": obs,
+            "au": au,
+            "np": naive,
+            "bp": unscaled,
+            "kh": kh,
+            "sh": sh}
+
+def writeReport(result, report_path):
+    ''' Write the p-values of all trees as a table '''
+    columns = ["loglik", "obs", "au", "np", "bp", "kh", "sh"]
+    with open(report_path, "w") as report:
+        report.write("item," + ','.join(columns) + "\n")
+        for i in range(len(result["au"])):
+            report.write(str(i + 1) + ''.join(["," + str(round(float(result[column][i]), 6)) for column in columns]) + "\n")
+
+def readAU(report_path):
+    ''' Read the AU p-values of the hypotheses from a report; the first
+        tree is the unconstrained one. '''
+    au = []
+    with open(report_path) as report:
+        header = report.readline().strip().split(",")
+        for line in report:
+            au.append(float(line.strip().split(",")[header.index("au")]))
+    return au[1:]
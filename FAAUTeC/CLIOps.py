@@ -4,7 +4,6 @@
 import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'FAAUTeC'))
-import FAAUTeCMain
 import argparse
 
 class CLI():
@@ -54,7 +53,7 @@ class CLI():
                             required=False)
 
         optional.add_argument('--au_inference', type=str, 
-                             help="(Optional) Choose program for AU-test calculation 'CONSEL' or 'IQTree' or 'IQTree2', multiple selection possible by ';' as delimiter, e.g. 'CONSEL;IQTree'",
+                             help="(Optional) Choose program for AU-test calculation 'CONSEL' or 'IQTree' or 'IQTree2' or 'Native', multiple selection possible by ';' as delimiter, e.g. 'CONSEL;IQTree'",
                              default='CONSEL',
                              required=False)
 
@@ -88,8 +87,80 @@ class CLI():
                              default='1',
                              required=False)
 
+        optional.add_argument('--jobs', type=int,
+                             help="(Optional) Number of genes processed at the same time; the threads of --thread_number are split between them",
+                             default='1',
+                             required=False)
+
+        optional.add_argument('--cache_dir', type=str,
+                            help='(Optional) folder in which tree searches, site likelihoods and AU tests are cached and reused by later runs',
+                            default=False,
+                            required=False)
+
+        optional.add_argument('--cache_size', type=int,
+                             help="(Optional) Maximal size of the cache in MB; the least recently used results are removed first",
+                             default='5000',
+                             required=False)
+
+        optional.add_argument('--resume',
+                             help='(Optional) Continue an interrupted run in the existing output folder; finished genes are skipped',
+                             default=False,
+                             action='store_true',
+                             required=False)
+
+        optional.add_argument('--bootstrap_number', type=int,
+                             help="(Optional) Number of bootstrap replicates per scale of the 'Native' AU test",
+                             default='10000',
+                             required=False)
+
+        optional.add_argument('--timeout', type=int,
+                             help="(Optional) Seconds after which an external program is stopped and its gene is skipped",
+                             default=None,
+                             required=False)
+
+        optional.add_argument('--stage_jobs',
+                             help="(Optional) Number of genes per pipeline stage (ingest, search, evaluate, autest) running at the same time, e.g. 'search=2,autest=4'; stages which are not given use --jobs; 'auto' chooses them by the runtimes estimated from the alignments and earlier runs",
+                             default=None,
+                             required=False)
+
+        optional.add_argument('--reuse_model',
+                             help='(Optional) Fix the model parameters of the hypothesis searches and of the site likelihood calculation to those of the unconstrained search',
+                             default=False,
+                             action='store_true',
+                             required=False)
+
+        optional.add_argument('--coordinator',
+                             help='(Optional) Put the genes into a queue in output/SUMMARY instead of processing them in this process; workers on this and other hosts which share the folder take the genes and this process merges their results',
+                             default=False,
+                             action='store_true',
+                             required=False)
+
+        optional.add_argument('--local_workers', type=int,
+                             help="(Optional) Number of workers which --coordinator starts on this host; 0 to only use workers started with faautec_worker_CLI.py",
+                             default='1',
+                             required=False)
+
+        optional.add_argument('--replicates', type=int,
+                             help="(Optional) Repeat the AU test of every program this many times with its own seed on the same trees and site likelihoods and report the mean and standard deviation of the p-values",
+                             default='1',
+                             required=False)
+
+        optional.add_argument('--seed', type=int,
+                             help="(Optional) Seed of the run; the seeds of all tree searches and AU tests are derived from it",
+                             default='1',
+                             required=False)
+
+        optional.add_argument('--dry_run',
+                             help="(Optional) Scan the alignments and print the order of the genes, the estimated wall time and every program call of the run without running it",
+                             default=False,
+                             action='store_true',
+                             required=False)
+
         args = parser.parse_args()
 
+        ## the pipeline is loaded after the arguments, so --help and
+        ## wrong arguments return at once
+        import FAAUTeCMain
         FAAUTeCMain.faautec(args.alignment,
                             args.constraint,
                             args.path_consel,
@@ -102,8 +173,46 @@ class CLI():
                             args.path_raxml,
                             args.alpha_level,
                             args.outgroup,
-                            args.latex_format)
+                            args.latex_format,
+                            args.jobs,
+                            args.cache_dir,
+                            args.cache_size,
+                            args.resume,
+                            args.bootstrap_number,
+                            args.timeout,
+                            args.stage_jobs,
+                            args.reuse_model,
+                            args.coordinator,
+                            args.local_workers,
+                            args.replicates,
+                            args.seed,
+                            args.dry_run)
+
+class WorkerCLI():
+
+    def __init__(self):
+        self.client()
+
+    def client(self):
+
+        parser = argparse.ArgumentParser(description="FAAUTeC v.0.2 worker")
+
+        parser.add_argument('root', type=str,
+                            help='folder in which the coordinator was started; it contains output/SUMMARY/queue.sqlite')
+
+        parser.add_argument('--poll', type=int,
+                            help='(Optional) Seconds between two looks at the queue while no gene is free',
+                            default='2',
+                            required=False)
+
+        args = parser.parse_args()
+
+        import FAAUTeCMain
+        FAAUTeCMain.work(os.path.abspath(args.root), args.poll)
 
 
 def start_faautec():
     CLI()
+
+def start_worker():
+    WorkerCLI()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+''' On-disk result cache of FAAUTeC '''
+
+import os
+import json
+import time
+import shutil
+import hashlib
+
+import ProfOps as PfOps
+
+class ResultCache:
+    ''' Results of tree searches, site likelihood calculations and AU tests,
+        keyed by the sha256 of the program versions, the settings and the
+        input files, and evicted least recently used first by evict().
+    Args:
+        cache_dir: folder in which the results are stored
+        max_size: upper bound of the cache size in MB
+        versions: dictionary with the version line of every program path
+    '''
+
+    def __init__(self, cache_dir, max_size, versions):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_size = max_size * 1024 * 1024
+        self.versions = versions
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+    def key(self, tools, parts, files):
+        ''' Hash the versions of the programs, the settings and the content
+            of the input files into one key. '''
+        digest = hashlib.sha256()
+        for tool in tools:
+            digest.update(str(self.versions.get(tool, tool)).encode("utf-8") + b"\0")
+        for part in parts:
+            digest.update(str(part).encode("utf-8") + b"\0")
+        for path in files:
+            with open(path, "rb") as inFile:
+                for block in iter(lambda: inFile.read(1 << 20), b""):
+                    digest.update(block)
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def entry(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def fetch(self, key, files):
+        ''' Copy the cached files of key to the given paths. Returns the
+            stored values or None if key is not cached. '''
+        entry = self.entry(key)
+        if not os.path.isfile(os.path.join(entry, "values.json")):
+            return None
+        try:
+            for i in range(len(files)):
+                shutil.copyfile(os.path.join(entry, "file_" + str(i)), files[i])
+            with open(os.path.join(entry, "values.json")) as valuesFile:
+                values = json.load(valuesFile)
+            ## remember the access for the LRU eviction
+            os.utime(entry)
+        except (IOError, OSError, ValueError):
+            return None
+        return values
+
+    def store(self, key, files, values=None):
+        ''' Store copies of the files and the values under key. The entry is
+            written to a temporary folder first, so that concurrent runs
+            never see half written entries. '''
+        entry = self.entry(key)
+        if os.path.isdir(entry):
+            return
+        tmpEntry = entry + ".tmp" + str(os.getpid())
+        os.makedirs(tmpEntry)
+        for i in range(len(files)):
+            shutil.copyfile(files[i], os.path.join(tmpEntry, "file_" + str(i)))
+        with open(os.path.join(tmpEntry, "values.json"), "w") as valuesFile:
+            json.dump(values or {}, valuesFile)
+        try:
+            os.rename(tmpEntry, entry)
+        except OSError:
+            ## another process stored the same result in the meantime
+            shutil.rmtree(tmpEntry, ignore_errors=True)
+
+    def fetchOrRun(self, key, files, run):
+        ''' Restore the files of key or call run() and store the files it
+            produced. Returns the log of run() or a note for the log. '''
+        if self.fetch(key, files) is not None:
+            ## the runtime of the stage is not that of the program
+            PfOps.record("cache", ' '.join(files), 0, 0, 0)
+            return "# restored from cache " + key + ": " + ' '.join(files)
+        result = run()
+        if all([os.path.isfile(path) for path in files]):
+            self.store(key, files)
+        return result
+
+    def evict(self):
+        ''' Remove the least recently used entries until the cache is
+            smaller than max_size. '''
+        entries = []
+        total = 0
+        for prefix in os.listdir(self.cache_dir):
+            prefixDir = os.path.join(self.cache_dir, prefix)
+            if not os.path.isdir(prefixDir):
+                continue
+            for key in os.listdir(prefixDir):
+                entry = os.path.join(prefixDir, key)
+                if key.find(".tmp") != -1:
+                    continue
+                size = sum([os.path.getsize(os.path.join(entry, f)) for f in os.listdir(entry)])
+                entries.append((os.path.getmtime(entry), size, entry))
+                total = total + size
+
+        entries.sort()
+        removed = 0
+        for mtime, size, entry in entries:
+            if total <= self.max_size:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total = total - size
+            removed = removed + 1
+        return removed
+
+def cachedRun(cache, tools, parts, inputs, outputs, run):
+    ''' Run run() through the cache if one is given '''
+    if not cache:
+        return run()
+    return cache.fetchOrRun(cache.key(tools, parts, inputs), outputs, run)
+
+def cachedTest(cache, tools, parts, inputs, report, run, parse):
+    ''' Run an AU test through the cache if one is given. The report of
+        the test, its runtime and the values parsed from it are cached
+        together. Returns the log, the runtime and the parsed values. '''
+    if cache:
+        key = cache.key(tools, parts, inputs)
+        values = cache.fetch(key, [report])
+        if values is not None:
+            PfOps.record("cache", report, 0, 0, 0)
+            return ["# restored from cache " + key + ": " + report], values.pop("runtime"), values
+
+    start = time.time()
+    log = run()
+    runtime = round(time.time() - start,3)
+    values = parse(report)
+
+    if cache:
+        stored = dict(values)
+        stored.update({"runtime": runtime})
+        cache.store(key, [report], stored)
+    return log, runtime, values
@@ -2,38 +2,83 @@
 ''' Custom operations input and output processes '''
 
 import os
+import json
+import shutil
 import subprocess
-from Bio import SeqIO
-from Bio.Nexus import Nexus
 
-def checkAlignmentFile(alignment_path):
-    nonEmptySeqs = []
-    for seq_record in SeqIO.parse(alignment_path, "fasta"):
-        if str(seq_record.seq).replace("-","") != "":
-            nonEmptySeqs.append(seq_record)
+## versions and features of the external programs, kept between runs
+PROBE_PATH = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "faautec", "probes.json")
 
-    SeqIO.write(nonEmptySeqs, alignment_path, "fasta")
+def probe(program_path, name, run):
+    ''' Result of run(), which asks the program at program_path for name
+        (e.g. its version). The result is stored in PROBE_PATH for the
+        path, size and modification time of the executable, so the program
+        is only asked again after it was replaced. run() has to return
+        JSON data. '''
+    executable = shutil.which(program_path)
+    if not executable:
+        return run()
+    executable = os.path.realpath(executable)
+    stat = os.stat(executable)
+    key = executable + " " + name
+    stamp = [stat.st_size, stat.st_mtime_ns]
+    try:
+        with open(PROBE_PATH) as probeFile:
+            probes = json.load(probeFile)
+    except (OSError, ValueError):
+        probes = {}
+    if key in probes and probes[key]["stamp"] == stamp:
+        return probes[key]["result"]
+
+    result = run()
+    probes.update({key: {"stamp": stamp, "result": result}})
+    ## a cache which cannot be written only costs the next run a probe
+    try:
+        os.makedirs(os.path.dirname(PROBE_PATH), exist_ok=True)
+        tmp_path = PROBE_PATH + "." + str(os.getpid())
+        with open(tmp_path, "w") as probeFile:
+            json.dump(probes, probeFile, indent=1, sort_keys=True)
+        os.replace(tmp_path, PROBE_PATH)
+    except OSError:
+        pass
+    return result
 
 def checkRAxMLVersion(raxml_path):
-    raxmlVersion = subprocess.check_output(raxml_path + ' -v', shell=True).decode('utf-8').strip().split("\n")
-    for line in raxmlVersion:
-        if "RAxML-NG" in line:
-            return(line, "ng")
-        elif "RAxML version" in line:
-            return(line, "standard")
-    return False, False
+    def run():
+        raxmlVersion = subprocess.check_output([raxml_path, '-v']).decode('utf-8').strip().split("\n")
+        for line in raxmlVersion:
+            if "RAxML-NG" in line:
+                return [line, "ng"]
+            elif "RAxML version" in line:
+                return [line, "standard"]
+        return [False, False]
+    line, version = probe(raxml_path, "version", run)
+    return(line, version)
+
+def checkRAxMLFeatures(raxml_path, raxml_version):
+    ''' Options of RAxML which not every version has: "tree_constraint"
+        is True if RAxML-NG searches under a constraint tree, older
+        versions only evaluate the constraint tree '''
+    if raxml_version != "ng":
+        return {"tree_constraint": True}
+    def run():
+        usage = subprocess.run([raxml_path, '--help'], stdout=subprocess.PIPE, stderr=subprocess.STDOUT).stdout.decode('utf-8', 'replace')
+        return {"tree_constraint": "--tree-constraint" in usage}
+    return probe(raxml_path, "features", run)
 
 def checkIQTreeVersion(iqtree_path):
-    iqtreeVersion = subprocess.check_output(iqtree_path + ' -v', shell=True).decode('utf-8').strip().split("\n")
-    for line in iqtreeVersion:
-        if "version" in line:
-            return(line)
-    return False
+    def run():
+        iqtreeVersion = subprocess.check_output([iqtree_path, '-v']).decode('utf-8').strip().split("\n")
+        for line in iqtreeVersion:
+            if "version" in line:
+                return(line)
+        return False
+    return probe(iqtree_path, "version", run)
 
-def checkPrerequisites(au_inference, path_iqtree2, path_consel, ml_inference):
+def checkPrerequisites(au_inference, path_iqtree2, path_consel, ml_inference, resume=False):
     # Output folder
-    if 'output' in os.listdir():
-        print("there is already an output folder, please rename or remove it before running FAAUTeC")
+    if 'output' in os.listdir() and not resume:
+        print("there is already an output folder, please rename or remove it before running FAAUTeC or continue it with --resume")
         return(False)
 
     # Check AU Inference
@@ -64,8 +109,13 @@ def checkPrerequisites(au_inference, path_iqtree2, path_consel, ml_inference):
     except:
         pass
 
+    try:
+        programs.remove("Native")
+    except:
+        pass
+
     if(len(programs) > 0):
-        print("'" + ' '.join(programs) + "' is not a supported Program for AU Test calculation, supported programs are: 'CONSEL', 'IQTree' and 'IQTree2'")
+        print("'" + ' '.join(programs) + "' is not a supported Program for AU Test calculation, supported programs are: 'CONSEL', 'IQTree', 'IQTree2' and 'Native'")
         return(False)
 
     # Check ML Inference
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+''' Execution operations of FAAUTeC
+
+    External programs are started from argument lists without a shell.
+    The output of every step is written to its own file in LOG_DIR and a
+    non-zero exit code raises CommandError. File operations which used to
+    be shell calls (cat, mv, mkdir) are done in-process. Every function
+    returns the equivalent shell line for the log of the gene.
+'''
+
+import os
+import glob
+import time
+import shlex
+import shutil
+import threading
+import subprocess
+
+import ProfOps as PfOps
+
+## folder of the step logs, relative to the working directory
+LOG_DIR = "logs"
+
+## seconds after which an external program is stopped, None for no limit
+TIMEOUT = None
+
+class CommandError(Exception):
+    ''' An external program failed or ran into the timeout '''
+
+    def __init__(self, command, returncode, log_path):
+        self.command = command
+        self.returncode = returncode
+        self.log_path = log_path
+        if returncode is None:
+            reason = "ran into the timeout"
+        else:
+            reason = "exited with code " + str(returncode)
+        Exception.__init__(self, "'" + command + "' " + reason)
+
+def run(args, step, stdout_path=None, timeout=None):
+    ''' Run a program in the working directory.
+    Args:
+        args: program and its arguments
+        step: name of the log file of this step
+        stdout_path: file which receives the standard output instead of
+                     the log, as with '>' in a shell
+        timeout: seconds, TIMEOUT if None
+    Returns:
+        the command line
+    Raises:
+        CommandError
+    '''
+    args = [str(arg) for arg in args]
+    command = ' '.join([shlex.quote(arg) for arg in args])
+    if stdout_path:
+        command = command + " > " + shlex.quote(stdout_path)
+    if timeout is None:
+        timeout = TIMEOUT
+
+    if not os.path.isdir(LOG_DIR):
+        os.makedirs(LOG_DIR, exist_ok=True)
+    log_path = os.path.join(LOG_DIR, step + ".log")
+    with open(log_path, "a") as logFile:
+        logFile.write("$ " + command + "\n")
+        logFile.flush()
+        start = time.time()
+        try:
+            if stdout_path:
+                with open(stdout_path, "w") as outFile:
+                    returncode, usage = _wait(subprocess.Popen(args, stdout=outFile, stderr=logFile), timeout)
+            else:
+                returncode, usage = _wait(subprocess.Popen(args, stdout=logFile, stderr=subprocess.STDOUT), timeout)
+        except OSError as e:
+            logFile.write(str(e) + "\n")
+            raise CommandError(command, 127, log_path)
+    PfOps.commandRecord(step, time.time() - start, usage)
+    if returncode != 0:
+        raise CommandError(command, returncode, log_path)
+    return command
+
+def _wait(process, timeout):
+    ''' Wait for a process and return its exit code, None if it was
+        stopped by the timeout, and its resource usage '''
+    stopped = []
+    def stop():
+        stopped.append(True)
+        process.kill()
+    timer = None
+    if timeout:
+        timer = threading.Timer(timeout, stop)
+        timer.start()
+    try:
+        ## wait4 reports the resource usage of this process alone, which
+        ## also works while other threads wait for their own programs
+        pid, status, usage = os.wait4(process.pid, 0)
+    finally:
+        if timer:
+            timer.cancel()
+    ## the exit code or the negative signal, as subprocess reports it
+    if os.WIFSIGNALED(status):
+        process.returncode = -os.WTERMSIG(status)
+    else:
+        process.returncode = os.WEXITSTATUS(status)
+    if stopped:
+        return None, usage
+    return process.returncode, usage
+
+def concat(paths, out_path):
+    ''' Write the content of all files to out_path '''
+    with PfOps.measure("file", "cat"):
+        with open(out_path, "wb") as outFile:
+            for path in paths:
+                with open(path, "rb") as inFile:
+                    shutil.copyfileobj(inFile, outFile)
+    return "cat " + ' '.join([shlex.quote(path) for path in paths]) + " > " + shlex.quote(out_path)
+
+def move(pattern, out_dir):
+    ''' Move all files matching the glob pattern into out_dir '''
+    with PfOps.measure("file", "mv"):
+        for path in sorted(glob.glob(pattern)):
+            shutil.move(path, os.path.join(out_dir, os.path.basename(path)))
+    return "mv " + pattern + " " + shlex.quote(out_dir)
+
+def rename(path, new_path):
+    ''' Rename a single file '''
+    with PfOps.measure("file", "mv"):
+        os.replace(path, new_path)
+    return "mv " + shlex.quote(path) + " " + shlex.quote(new_path)
+
+def makedirs(path):
+    os.makedirs(path, exist_ok=True)
+    return "mkdir -p " + shlex.quote(path)
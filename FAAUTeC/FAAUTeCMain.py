@@ -3,12 +3,577 @@
 
 import os
 import sys
+import glob
 import time
-import dendropy
+import shutil
+import functools
+import traceback
+import multiprocessing
 
 import IOOps as IOOps
 import FAAUTeCOps as FOps
 import CheckOps as COps
+import SchedOps as SOps
+import CacheOps as CaOps
+import ResumeOps as RsOps
+import AUOps as AUOps
+import TreeOps as TOps
+import StoreOps as StOps
+import ExecOps as ExOps
+import ProfOps as PfOps
+import QueueOps as QOps
+import SeedOps as SdOps
+import ReportOps as RpOps
+import PatternOps as PtOps
+import PlanOps as PlOps
+import HistoryOps as HsOps
+
+STAGES = ["ingest", "search", "evaluate", "autest"]
+
+def ingestGene(task):
+    ''' Create the folders of a gene and its normalized copy of the
+        alignment. Returns the state which is passed through the stages. '''
+    ali, gene, settings = task
+    programs = settings["programs"]
+    mlcalc = settings["mlcalc"]
+
+    print(ali)
+    ali = os.path.abspath(ali)
+    if ali.split(".")[-1] not in ["fasta", "fa", "phy", "nex"]:
+        print(ali + " was skipped because the file ending is not supported. Supported File endings: 'fasta', 'nex', 'phy'")
+        return None
+
+    log = ["#!/bin/bash", "# " + gene]
+
+    ### Create a clear file system
+    geneDir = os.path.join(settings["root"], "output", gene)
+    scratchDir = os.path.join(geneDir, "00_scratch")
+    os.mkdir(geneDir)
+    os.mkdir(geneDir + "/01_input")
+
+    ## one normalized FASTA copy of the alignment, the input is not modified
+    try:
+        with PfOps.measure("step", "normalize alignment"):
+            names, length = IOOps.Inp().normalizeAlignment(ali, geneDir + "/01_input/" + gene + ".fasta")
+    except (ValueError, IndexError) as e:
+        print(ali + " was skipped because it could not be read: " + str(e))
+        shutil.rmtree(geneDir)
+        return None
+    log.append("# " + ali + " -> " + geneDir + "/01_input/" + gene + ".fasta (" + str(len(names)) + " sequences, " + str(length) + " sites)")
+    os.mkdir(geneDir + "/02_output_" + mlcalc)
+    os.mkdir(scratchDir)
+    os.mkdir(geneDir + "/03_output_Evaluation")
+
+    if("CONSEL" in programs):
+        os.mkdir(geneDir + "/03a_output_CONSEL")
+
+    if("IQTree" in programs):
+        os.mkdir(geneDir + "/03b_output_IQTree")
+
+    if("IQTree2" in programs):
+        os.mkdir(geneDir + "/03c_output_IQTree2")
+
+    if("Native" in programs):
+        os.mkdir(geneDir + "/03d_output_Native")
+
+    if(settings["replicates"] > 1):
+        os.mkdir(geneDir + "/04_output_Replicates")
+
+    return {"gene": gene,
+            "ali": geneDir + "/01_input/" + gene + ".fasta",
+            "names": names,
+            "geneDir": geneDir,
+            "scratchDir": scratchDir,
+            "settings": settings,
+            "log": log,
+            "au_values": {},
+            "runtimes": {},
+            ## the seed of every program call, for the results store
+            "seeds": [],
+            "profile": []}
+
+def ingest(task):
+    ''' Run ingestGene() as the first stage '''
+    with PfOps.measure("stage", "ingest"):
+        state = ingestGene(task)
+    records = PfOps.collect(task[1], "ingest")
+    if state is not None:
+        state["profile"] = records
+    return state
+
+def inScratch(stage, function, state):
+    ''' Run a stage of a gene inside its scratch directory, so that several
+        genes can be processed at the same time. A failed external program
+        or a report which cannot be read skips the gene. '''
+    gene = state["gene"]
+    cwd = os.getcwd()
+    os.chdir(state["scratchDir"])
+    ExOps.TIMEOUT = state["settings"]["timeout"]
+    try:
+        with PfOps.measure("stage", stage):
+            result = function(state)
+    except ExOps.CommandError as e:
+        print("Error: " + gene + " was skipped because " + str(e) + ", see " + os.path.join(state["geneDir"], e.log_path))
+        moveLogs(state)
+        result = None
+    except RpOps.ReportError as e:
+        print("Error: " + gene + " was skipped because the report " + str(e))
+        moveLogs(state)
+        result = None
+    finally:
+        os.chdir(cwd)
+        ## the records of this stage must not end up with the next gene
+        records = PfOps.collect(gene, stage)
+    if result is not None:
+        result["profile"] = result["profile"] + records
+    return result
+
+def moveLogs(state):
+    ## the output of every external program
+    if os.path.isdir(os.path.join(state["scratchDir"], ExOps.LOG_DIR)):
+        shutil.move(os.path.join(state["scratchDir"], ExOps.LOG_DIR), os.path.join(state["geneDir"], ExOps.LOG_DIR))
+
+def searchGene(state):
+    ''' Calculate the ML trees and find the hypothesis tree closest to the
+        unconstrained tree '''
+    settings = state["settings"]
+    constraints = settings["constraints"]
+    mlcalc = settings["mlcalc"]
+    gene = state["gene"]
+    geneDir = state["geneDir"]
+    threadNumber = settings["threads"]["search"]
+    log = state["log"]
+    seeds = SdOps.treeSeeds(settings["seed"], gene, mlcalc, len(constraints))
+
+    if(mlcalc == "RAxML"):
+        log = log + ["\n",
+                    "# Calculate ML-Trees with RAxML"]
+
+        ### Calculate the ML-Trees with RAxML
+        log = log + FOps.raxml(state["ali"], constraints, settings["model"], gene, settings["outgroup"], str(threadNumber), settings["raxml_path"], settings["raxmlVersion"], settings["cache"], set(state["names"]),
+                               settings["reuse_model"], seeds, settings.get("raxmlFeatures", {}).get("tree_constraint", True))
+
+    elif(mlcalc == "IQTree"):
+        log = log + ["\n",
+                    "# Calculate ML-Trees with IQTree"]
+
+        ### Calculate the ML-Trees with IQTree
+        log = log + FOps.iqtree_mltree(state["ali"], constraints, gene, str(threadNumber), settings["iqtree_path"], settings["cache"], set(state["names"]),
+                                       settings["reuse_model"], seeds)
+
+    else:
+        print("Error: The Program " + mlcalc + " is not supported to run ML Tree calculation use" +
+              " 'RAxML' or 'IQTree' instead.")
+        return None
+
+    ### Find Tree which has the smallest euclidic distance to
+    ### to the unconstraint tree
+    trees = []
+    with open(gene + '_COMBINED.tre', "r") as multitree:
+        for tree in multitree:
+            trees.append(tree.strip())
+    with PfOps.measure("step", "findBestTree"):
+        distances = TOps.distanceMatrices(trees)
+        best_tree = FOps.findBestTree(trees, distances)
+    trees = trees[1:]
+
+    if(mlcalc == "RAxML"):
+        log.append(ExOps.move("RAxML_*", geneDir + "/02_output_RAxML/"))
+    else:
+        log.append(ExOps.move(gene + "_IQTree*", geneDir + "/02_output_IQTree/"))
+
+    ## the fitted model of the unconstrained search for the evaluation
+    modelFile = None
+    if(settings["reuse_model"]):
+        modelFile = geneDir + "/02_output_" + mlcalc + "/" + FOps.modelPath(gene, mlcalc, settings["raxmlVersion"])
+
+    place = ["hypo" + str(i) for i in range(len(constraints))]
+    state["seeds"] = state["seeds"] + [{"gene": gene, "step": (["unconst"] + place)[i], "program": mlcalc, "seed": seeds[i]} for i in range(len(seeds))]
+    state.update({"log": log,
+                  "modelFile": modelFile,
+                  "best_tree": best_tree,
+                  ## the line for the best tree file
+                  "treeLine": gene + place[best_tree] + " " + trees[best_tree] + "\n",
+                  "distances": TOps.writeDistances(distances, gene, ["unconst"] + place)})
+    return state
+
+def evaluateGene(state):
+    ''' Optimize the model once and calculate the site likelihoods of all
+        trees, which every AU test of the gene uses '''
+    settings = state["settings"]
+    gene = state["gene"]
+    program = FOps.evaluator(settings["programs"])
+    threadNumber = str(settings["threads"]["evaluate"])
+    seed = SdOps.seed(settings["seed"], gene, "evaluate", program)
+    state["seeds"].append({"gene": gene, "step": "evaluate", "program": program, "seed": seed})
+
+    start = time.time()
+    if(program == "RAxML"):
+        path = settings["raxml_path"]
+        state["log"] = state["log"] + ["\n",
+                                       "# Calculate the site likelihoods with RAxML"]
+        ## only a model of RAxML can be reused by RAxML
+        modelFile = state["modelFile"] if settings["mlcalc"] == "RAxML" else None
+        state["log"] = state["log"] + FOps.sitelh(state["ali"], settings["model"], gene, settings["mlcalc"], threadNumber,
+                                                  path, settings["raxmlVersion"], state["geneDir"], settings["cache"], modelFile, seed)
+        model = settings["model"]
+        trees = gene + "_COMBINED.tre"
+    else:
+        path = settings[{"IQTree": "iqtree_path", "IQTree2": "iqtree2_path"}[program]]
+        state["log"] = state["log"] + ["\n",
+                                       "# Optimize the model and calculate the site likelihoods with " + program]
+        model = "GTR+I+G"
+        if(state["modelFile"] and settings["mlcalc"] == "IQTree"):
+            model = RpOps.readIQTreeModel(state["modelFile"]) or model
+        state["log"] = state["log"] + FOps.iqtree_evaluate(state["ali"], path, gene, settings["mlcalc"], threadNumber,
+                                                           settings["raxmlVersion"], state["geneDir"], settings["cache"], model, seed)
+        ## without a fitted model the AU tests of IQ-TREE optimize it again
+        model = RpOps.readIQTreeModel(gene + "_Eval.iqtree") or "GTR+I+G"
+        trees = FOps.evaluatedTreesPath(gene)
+
+    matrix = AUOps.readSiteLH(FOps.sitelhPath(gene))
+    if(matrix.shape[0] != len(settings["constraints"]) + 1):
+        print("Error: " + gene + " was skipped because the site likelihoods of " + program + " contain " + str(matrix.shape[0]) +
+              " instead of " + str(len(settings["constraints"]) + 1) + " trees")
+        return None
+
+    ## the AU tests of FAAUTeC resample the site patterns
+    with PfOps.measure("step", "compress site patterns"):
+        patterns, weights, index, source = PtOps.compressSiteLH(matrix, state["ali"])
+        PtOps.writePatterns(FOps.patternPath(gene), patterns, weights, index)
+    if source is None:
+        state["log"].append("# the alignment does not have the " + str(matrix.shape[1]) + " sites of the site likelihoods, "
+                            "their identical columns are used as site patterns")
+    state["log"].append("# " + str(matrix.shape[1]) + " sites in " + str(patterns.shape[1]) + " site patterns -> " + FOps.patternPath(gene))
+
+    state.update({"evaluation": {"program": program,
+                                 "version": settings["versions"].get(path, path),
+                                 "model": model,
+                                 "trees": int(matrix.shape[0]),
+                                 "sites": int(matrix.shape[1]),
+                                 "patterns": int(patterns.shape[1]),
+                                 "runtime": round(time.time() - start,3),
+                                 "treeFile": trees,
+                                 "loglik": [float(value) for value in matrix.sum(axis=1)]}})
+    return state
+
+def testGene(state):
+    ''' Run the AU tests of all programs on the shared evaluation '''
+    settings = state["settings"]
+    constraints = settings["constraints"]
+    programs = settings["programs"]
+    cache = settings["cache"]
+    threadNumber = settings["threads"]["autest"]
+    gene = state["gene"]
+    geneDir = state["geneDir"]
+    ali = state["ali"]
+    log = state["log"]
+    au_values = state["au_values"]
+    runtimes = state["runtimes"]
+    evaluation = state["evaluation"]
+    sitelh = FOps.sitelhPath(gene)
+    seeds = dict([(program, SdOps.seed(settings["seed"], gene, "autest", program)) for program in programs])
+    state["seeds"] = state["seeds"] + [{"gene": gene, "step": "autest", "program": program, "seed": seeds[program]} for program in programs]
+
+    ### AU Test by CONSEL
+    if("CONSEL" in programs):
+        print("AU Test by CONSEL")
+        log = log + ["\n",
+                    "# Calculate AU-Test with CONSEL"]
+
+        stepLog, runtime, au_consel = CaOps.cachedTest(cache, [settings["consel_path"]], ["CONSEL", seeds["CONSEL"]],
+                                                       [sitelh], gene + "_CONSEL.consel",
+                                                       lambda: FOps.consel(settings["consel_path"], gene, None, seeds["CONSEL"]),
+                                                       lambda report: {"au": RpOps.au(RpOps.readConsel(report, len(constraints) + 1))})
+        log = log + stepLog
+        runtimes.update({"CONSEL":runtime})
+        au_values.update({"CONSEL":au_consel})
+
+        log.append(ExOps.move(gene + "_CONSEL*", geneDir + "/03a_output_CONSEL/"))
+
+    # AU Test by IQTree
+    if("IQTree" in programs):
+        print("AU Test by IQTree")
+        log = log + ["\n",
+                    "# Calculate AU-Test with IQTree"]
+
+        stepLog, runtime, au_iqtree = CaOps.cachedTest(cache, [settings["iqtree_path"]], ["AU", evaluation["model"], "10000", seeds["IQTree"]],
+                                                       [ali, evaluation["treeFile"]], gene + "_IQTree.iqtree",
+                                                       lambda: FOps.iqtree_autest(ali, settings["iqtree_path"], gene, settings["mlcalc"], str(threadNumber), settings["raxmlVersion"], geneDir,
+                                                                                  evaluation["model"], evaluation["treeFile"], None, seeds["IQTree"]),
+                                                       lambda report: {"au": RpOps.au(RpOps.readIQTree(report, len(constraints) + 1))})
+        log = log + stepLog
+        runtimes.update({"IQTree":runtime})
+        au_values.update({"IQTree":au_iqtree})
+
+        log.append(ExOps.move(gene + "_IQTree*", geneDir + "/03b_output_IQTree/"))
+
+
+    # AU Test by IQTree2
+    if("IQTree2" in programs):
+        print("AU Test by IQTree2")
+        log = log + ["\n",
+                     "# Calculate AU-Test with IQTree"]
+
+        stepLog, runtime, au_iqtree2 = CaOps.cachedTest(cache, [settings["iqtree2_path"]], ["AU", evaluation["model"], "10000", seeds["IQTree2"]],
+                                                        [ali, evaluation["treeFile"]], gene + "_IQTree.iqtree",
+                                                        lambda: FOps.iqtree_autest(ali, settings["iqtree2_path"], gene, settings["mlcalc"], str(threadNumber), settings["raxmlVersion"], geneDir,
+                                                                                   evaluation["model"], evaluation["treeFile"], None, seeds["IQTree2"]),
+                                                        lambda report: {"au": RpOps.au(RpOps.readIQTree(report, len(constraints) + 1))})
+        log = log + stepLog
+        runtimes.update({"IQTree2":runtime})
+        au_values.update({"IQTree2":au_iqtree2})
+
+        log.append(ExOps.move(gene + "_IQTree*", geneDir + "/03c_output_IQTree2/"))
+
+    # AU Test by the native implementation
+    if("Native" in programs):
+        print("AU Test by Native")
+        log = log + ["\n",
+                     "# Calculate AU-Test with the native implementation"]
+
+        stepLog, runtime, au_native = CaOps.cachedTest(cache, [], ["Native", "patterns", settings["bootstrap_number"], seeds["Native"]],
+                                                       [sitelh], gene + "_Native.au",
+                                                       lambda: FOps.native_autest(gene, str(threadNumber), settings["bootstrap_number"], None, seeds["Native"]),
+                                                       lambda report: {"au": AUOps.readAU(report)})
+        log = log + stepLog
+        runtimes.update({"Native":runtime})
+        au_values.update({"Native":au_native})
+
+        log.append(ExOps.move(gene + "_Native*", geneDir + "/03d_output_Native/"))
+
+    if(settings["replicates"] > 1):
+        log = log + ["\n",
+                     "# Repeat the AU-Tests " + str(settings["replicates"]) + " times"]
+        replicateLog, replicates = replicateTests(state)
+        log = log + replicateLog
+        state.update({"replicates": replicates})
+        log.append(ExOps.move(gene + "_rep*", geneDir + "/04_output_Replicates/"))
+
+    log.append(ExOps.move(gene + "_Eval*", geneDir + "/03_output_Evaluation/"))
+    if glob.glob("RAxML*"):
+        log.append(ExOps.move("RAxML*", geneDir + "/03_output_Evaluation/"))
+
+    state.update({"log": log, "au_values": au_values, "runtimes": runtimes})
+    return state
+
+def replicateTests(state):
+    ''' Run the AU test of every program settings["replicates"] times with
+        its own seed on the trees and site likelihoods of the shared
+        evaluation. The replicates of all programs run at the same time.
+        Returns the log and one record per replicate and hypothesis. '''
+    settings = state["settings"]
+    constraints = settings["constraints"]
+    evaluation = state["evaluation"]
+    gene = state["gene"]
+    ali = state["ali"]
+
+    tasks = [(program, k, SdOps.seed(settings["seed"], gene, "autest", program, k)) for k in range(1, settings["replicates"] + 1) for program in settings["programs"]]
+    workers, threadNumber = SOps.splitThreads(settings["threads"]["autest"], len(tasks), len(tasks))
+
+    def run(task):
+        program, k, seed = task
+        prefix = gene + "_rep" + str(k)
+        start = time.time()
+        if(program == "CONSEL"):
+            log = FOps.consel(settings["consel_path"], gene, prefix, seed)
+            au = RpOps.au(RpOps.readConsel(prefix + "_CONSEL.consel", len(constraints) + 1))
+        elif(program == "Native"):
+            log = FOps.native_autest(gene, str(threadNumber), settings["bootstrap_number"], prefix, seed)
+            au = AUOps.readAU(prefix + "_Native.au")
+        else:
+            path = settings[{"IQTree": "iqtree_path", "IQTree2": "iqtree2_path"}[program]]
+            ## IQTree and IQTree2 write files of the same name
+            prefix = prefix + "_" + program
+            log = FOps.iqtree_autest(ali, path, gene, settings["mlcalc"], str(threadNumber), settings["raxmlVersion"], state["geneDir"],
+                                     evaluation["model"], evaluation["treeFile"], prefix, seed)
+            au = RpOps.au(RpOps.readIQTree(prefix + "_IQTree.iqtree", len(constraints) + 1))
+        runtime = round(time.time() - start,3)
+        return log, [{"gene": gene, "hypothesis": i, "program": program, "replicate": k, "seed": seed, "p_value": au[i], "runtime": runtime}
+                     for i in range(len(constraints))]
+
+    log = []
+    records = []
+    for replicateLog, replicateRecords in SOps.runThreads(run, tasks, workers):
+        log = log + replicateLog
+        records = records + replicateRecords
+    return log, records
+
+def finishGene(state):
+    ''' Collect the results of a gene and remove its scratch directory '''
+    settings = state["settings"]
+    constraints = settings["constraints"]
+    programs = settings["programs"]
+    mlcalc = settings["mlcalc"]
+    gene = state["gene"]
+    geneDir = state["geneDir"]
+    au_values = state["au_values"]
+    runtimes = state["runtimes"]
+
+    ## the artifacts which have to exist for a finished gene
+    files = [FOps.unconstTreePath(".", gene, mlcalc, settings["raxmlVersion"])] + [FOps.hypoTreePath(".", gene, mlcalc, settings["raxmlVersion"], i) for i in range(len(constraints))]
+    files.append("03_output_Evaluation/" + FOps.sitelhPath(gene))
+    if("CONSEL" in programs):
+        files.append("03a_output_CONSEL/" + gene + "_CONSEL.consel")
+    if("IQTree" in programs):
+        files.append("03b_output_IQTree/" + gene + "_IQTree.iqtree")
+    if("IQTree2" in programs):
+        files.append("03c_output_IQTree2/" + gene + "_IQTree.iqtree")
+    if("Native" in programs):
+        files.append("03d_output_Native/" + gene + "_Native.au")
+
+    ## one record per hypothesis and program for the results store; the
+    ## log-likelihoods of all programs are those of the shared evaluation
+    loglik = state["evaluation"]["loglik"]
+    records = []
+    for program in programs:
+        for i in range(len(constraints)):
+            p_value = au_values[program]["au"][i]
+            records.append({"gene": gene,
+                            "hypothesis": i,
+                            "program": program,
+                            "p_value": p_value,
+                            "significant": p_value <= settings["alpha_level"],
+                            "closest": i == state["best_tree"],
+                            "loglik": loglik[i + 1],
+                            "unconst_loglik": loglik[0],
+                            "runtime": runtimes[program]})
+
+    with open(geneDir + "/" + gene + "_log.sh","w") as logFile:
+        for line in state["log"]:
+            logFile.write(line + "\n")
+
+    moveLogs(state)
+    ## constraint files and the combined tree file
+    shutil.rmtree(state["scratchDir"])
+
+    return {"gene": gene, "treeLine": state["treeLine"], "records": records, "evaluation": state["evaluation"], "replicates": state.get("replicates", []), "seeds": state["seeds"],
+            "distances": state["distances"], "files": files, "history": HsOps.geneRuns(state)}
+
+def processGene(task):
+    ''' Run all stages of a gene one after another in this process and
+        write its output folder. Returns the result for the summary or None
+        if the gene was skipped. '''
+    state = ingest(task)
+    for stage, function in [("search", searchGene), ("evaluate", evaluateGene), ("autest", testGene)]:
+        if state is None:
+            return None
+        state = inScratch(stage, function, state)
+    if state is None:
+        return None
+    with PfOps.measure("stage", "write"):
+        result = finishGene(state)
+    PfOps.writeGene(state["profile"] + PfOps.collect(result["gene"], "write"), os.path.join(state["geneDir"], result["gene"] + "_profile.json"))
+    return result
+
+def work(root, poll=QOps.POLL):
+    ''' Worker of the queue of the run in root: take genes from the queue
+        and process them until no gene is left '''
+    os.chdir(root)
+    ## the stages change the working directory
+    queuePath = os.path.join(root, QOps.QUEUE)
+    queue = QOps.openQueue(queuePath)
+    settings = QOps.settings(queue)
+    if settings is None:
+        print("Error: the queue in " + root + " contains no run")
+        return
+    worker = QOps.workerName()
+    while True:
+        unit = QOps.claim(queue, worker)
+        if unit is None:
+            if QOps.unfinished(queue) == 0:
+                break
+            ## the genes of other workers are taken over when their
+            ## heartbeat stops
+            time.sleep(poll)
+            continue
+        gene, ali = unit
+        ## leftovers of a worker which was lost
+        if os.path.isdir(os.path.join(settings["root"], "output", gene)):
+            shutil.rmtree(os.path.join(settings["root"], "output", gene))
+        try:
+            with QOps.Heartbeat(queuePath, gene, worker):
+                result = processGene((ali, gene, settings))
+        except Exception as e:
+            ## an unexpected error only fails this gene, the worker goes on
+            os.chdir(root)
+            print("Error: " + gene + " failed: " + traceback.format_exc())
+            QOps.fail(queue, gene, worker, type(e).__name__ + ": " + str(e))
+            continue
+        if not QOps.complete(queue, gene, worker, result):
+            print(gene + " was taken over by another worker, its result is ignored")
+    queue.close()
+
+def coordinate(tasks, settings, local_workers, merge, poll=QOps.POLL):
+    ''' Put the genes into the queue of the run, start local_workers
+        workers and pass every result to merge() as soon as it is there.
+        A local worker which died is started again up to
+        QOps.MAX_ATTEMPTS times; after that the genes which are left are
+        given up. '''
+    queue = QOps.openQueue(QOps.QUEUE)
+    QOps.submit(queue, settings, [(ali, gene) for ali, gene, taskSettings in tasks])
+    print("Queued " + str(len(tasks)) + " genes in " + os.path.abspath(QOps.QUEUE) + ", start more workers with: faautec_worker_CLI.py " + settings["root"])
+
+    def startWorker():
+        worker = multiprocessing.Process(target=work, args=(settings["root"], poll))
+        worker.start()
+        return worker
+
+    def mergeAll():
+        for gene, result, error in QOps.collect(queue):
+            if error:
+                print("Error: " + gene + " was skipped because " + error)
+            merge(result)
+
+    workers = [startWorker() for i in range(local_workers)]
+    restarts = 0
+    while True:
+        mergeAll()
+        if QOps.unfinished(queue) == 0:
+            break
+        for i in range(len(workers)):
+            ## a worker only ends by itself when the queue is empty
+            if not workers[i].is_alive() and restarts < QOps.MAX_ATTEMPTS * local_workers:
+                print("Warning: a local worker stopped with exit code " + str(workers[i].exitcode) + ", starting a new one")
+                workers[i] = startWorker()
+                restarts = restarts + 1
+        if workers and not any([worker.is_alive() for worker in workers]):
+            QOps.abandon(queue, "the local workers stopped " + str(restarts) + " times")
+        time.sleep(poll)
+    mergeAll()
+    for worker in workers:
+        worker.join()
+    queue.close()
+
+def stageThreads(jobs, stage_jobs, threadNumber, geneNumber):
+    ''' Number of genes which every stage runs at the same time and the
+        threads of each of them '''
+    ## every stage splits the threads between the genes it runs at the
+    ## same time; SchedOps.runPipeline() keeps the calls of all stages
+    ## together within threadNumber
+    try:
+        limits = SOps.stageLimits(jobs, stage_jobs, STAGES)
+    except ValueError as e:
+        print("Error: --stage_jobs: " + str(e))
+        sys.exit()
+    threads = {}
+    for stage in STAGES:
+        limits[stage], threads[stage] = SOps.splitThreads(threadNumber, limits[stage], geneNumber)
+    return limits, threads
+
+def planRun(tasks, settings, jobs, stage_jobs, threadNumber, runtimeModel):
+    ''' Plan the order of the tasks and set the threads of the stages in
+        settings; with stage_jobs "auto" the number of genes per stage is
+        chosen by the plan '''
+    auto = stage_jobs == "auto"
+    limits, threads = stageThreads(jobs, None if auto else stage_jobs, threadNumber, len(tasks))
+    settings.update({"threads": threads})
+    runPlan = PlOps.plan(tasks, settings, limits, STAGES, runtimeModel, threadNumber, auto)
+    settings.update({"threads": runPlan["threads"]})
+    return runPlan
+
+def stageLines(runPlan):
+    return ["stage " + stage + ": " + str(runPlan["limits"][stage]) + " concurrent genes, " + str(runPlan["threads"][stage]) + " threads per gene" for stage in STAGES]
 
 def faautec(alignment,
             constraint_path,
@@ -22,9 +587,23 @@ def faautec(alignment,
             raxml_path,
             alpha_level,
             outgroup,
-            latex):
-
-    if(not COps.checkPrerequisites(au_inference, iqtree2_path, consel_path, mlcalc)):
+            latex,
+            jobs=1,
+            cache_dir=False,
+            cache_size=5000,
+            resume=False,
+            bootstrap_number=10000,
+            timeout=None,
+            stage_jobs=None,
+            reuse_model=False,
+            coordinator=False,
+            local_workers=1,
+            replicates=1,
+            seed=SdOps.SEED,
+            dry_run=False):
+
+    ## a dry run neither reads nor writes the output folder
+    if(not COps.checkPrerequisites(au_inference, iqtree2_path, consel_path, mlcalc, resume or dry_run)):
         sys.exit()
 
     overallLog = ["alignment: " + str(alignment),
@@ -39,22 +618,36 @@ def faautec(alignment,
                   "raxml_path: " + str(raxml_path),
                   "alpha_level:" + str(alpha_level),
                   "outgroup:" + str(outgroup),
-                  "latex: " + str(latex)]
-
-    FOps.commandline("mkdir output/")
-    FOps.commandline("mkdir output/SUMMARY")
-
-    constraints = FOps.readConstraints(constraint_path)
-    place = ["hypo" + str(i) for i in range(len(constraints))]
+                  "latex: " + str(latex),
+                  "jobs: " + str(jobs),
+                  "cache_dir: " + str(cache_dir),
+                  "cache_size: " + str(cache_size),
+                  "resume: " + str(resume),
+                  "bootstrap_number: " + str(bootstrap_number),
+                  "timeout: " + str(timeout),
+                  "stage_jobs: " + str(stage_jobs),
+                  "reuse_model: " + str(reuse_model),
+                  "coordinator: " + str(coordinator),
+                  "local_workers: " + str(local_workers),
+                  "replicates: " + str(replicates),
+                  "seed: " + str(seed)]
+
+    constraints = FOps.indexConstraints(FOps.readConstraints(constraint_path))
     programs = au_inference.split(";")
     raxmlVersion = "standard"
+    raxmlFeatures = {}
+    versions = {}
 
-    if(mlcalc == "RAxML" or "CONSEL" in programs):
+    if(mlcalc == "RAxML" or FOps.evaluator(programs) == "RAxML"):
         raxmlVersionNumber, raxmlVersion = COps.checkRAxMLVersion(raxml_path)
         if(not raxmlVersionNumber):
             print("The RAxML version: '" + raxml_path + "' is not supported")
             sys.exit()
         overallLog.append("RAxML Version: " + raxmlVersionNumber)
+        versions.update({raxml_path:raxmlVersionNumber})
+        if(mlcalc == "RAxML"):
+            raxmlFeatures = COps.checkRAxMLFeatures(raxml_path, raxmlVersion)
+            overallLog.append("RAxML searches under constraint trees: " + str(raxmlFeatures["tree_constraint"]))
 
     if(mlcalc == "IQTree" or "IQTree" in programs):
         iqtreeVersionNumber = COps.checkIQTreeVersion(iqtree_path)
@@ -62,6 +655,7 @@ def faautec(alignment,
             print("The IQTree version: '" + iqtree_path + "' is not supported")
             sys.exit()
         overallLog.append("IQTree Version: " + iqtreeVersionNumber)
+        versions.update({iqtree_path:iqtreeVersionNumber})
 
     if("IQTree2" in programs):
         iqtreeVersionNumber = COps.checkIQTreeVersion(iqtree2_path)
@@ -69,219 +663,157 @@ def faautec(alignment,
             print("The IQTree version: '" + iqtree2_path + "' is not supported")
             sys.exit()
         overallLog.append("IQTree2 Version: " + iqtreeVersionNumber)
-
-    with open("output/SUMMARY/log.txt","w") as logFile:
-        for line in overallLog:
-            logFile.write(line + "\n")
-
-    treeFile = open("output/SUMMARY/raxml_hypoTreeShortestDistUnconstTree.tre","w")
-    auFile = open("output/SUMMARY/au_runtime_table.csv","w")
-
-    auFile.write("gene," + ','.join([','.join([program + "_hypo" + str(i) for program in programs]) for i in range(len(constraints))]) + "," + ','.join(["runtime_" + program for program in programs]) + "\n")
-
-    au_values = {}
-    runtimes = {}
+        versions.update({iqtree2_path:iqtreeVersionNumber})
 
     alis = [i for i in os.listdir(alignment) if i.split(".")[-1]=="fasta" or i.split(".")[-1]=="fa" or i.split(".")[-1]=="phy" or i.split(".")[-1]=="nex"]
 
-    colored = 0
-    for ali in alis:
-        print(ali)
-        gene = ali.split(".")[0]
-        ali = alignment + ali.strip()
-        if ali.split(".")[-1] == "fasta" or ali.split(".")[-1] == "fa":
-            pass
-        elif ali.split(".")[-1] == "phy":
-            ali = IOOps.Inp().phylip2fasta(ali)
-        elif ali.split(".")[-1] == "nex":
-            ali = IOOps.Inp().nexus2fasta(ali)
-        else:
-            print(ali + " was skipped because the file ending is not supported. Supported File endings: 'fasta', 'nex', 'phy'")
-            continue
-
-        COps.checkAlignmentFile(ali)
-
-        log = ["#!/bin/bash", "# " + gene]
-
-        ### Create a clear file system
-        os.mkdir("output/" + gene)
-        os.mkdir("output/" + gene + "/01_input")
-        os.mkdir("output/" + gene + "/02_output_" + mlcalc)
-
-        if("CONSEL" in programs):
-            os.mkdir("output/" + gene + "/03a_output_CONSEL")
-
-        if("IQTree" in programs):
-            os.mkdir("output/" + gene + "/03b_output_IQTree")
-
-        if("IQTree2" in programs):
-            log.append(FOps.commandline("mkdir output/" + gene + "/03c_output_IQTree2"))
-
-        log.append(FOps.commandline("cp " + ali + " output/" + gene + "/01_input/"))
-
-        if(mlcalc == "RAxML"):
-            log = log + ["\n",
-                        "# Calculate ML-Trees with RAxML"]
-
-            ### Calculate the ML-Trees with RAxML
-            log = log + FOps.raxml(ali, constraints, model, gene, outgroup, str(threadNumber), raxml_path, raxmlVersion)
-
-            ### Find Tree which has the smallest euclidic distance to
-            ### to the unconstraint tree
-            trees = []
-            with open(gene + '_COMBINED.tre', "r") as multitree:
-                for tree in multitree:
-                    trees.append(tree.strip())
-            best_tree = FOps.findBestTree(trees)
-            trees = trees[1:]
-
-            log.append(FOps.commandline("mv RAxML_* output/" + gene + "/02_output_RAxML/"))
-
-        elif(mlcalc == "IQTree"):
-            log = log + ["\n",
-                        "# Calculate ML-Trees with IQTree"]
-
-            ### Calculate the ML-Trees with IQTree
-            log = log + FOps.iqtree_mltree(ali, constraints, gene, str(threadNumber),iqtree_path)
-
-            ### Find Tree which has the smallest euclidic distance to
-            ### to the unconstraint tree
-            trees = []
-            with open(gene + '_COMBINED.tre', "r") as multitree:
-                for tree in multitree:
-                    trees.append(tree.strip())
-            best_tree = FOps.findBestTree(trees)
-            trees = trees[1:]
-
-            log.append(FOps.commandline("mv " + gene + "_IQTree* output/" + gene + "/02_output_IQTree/"))
+    settings = {"root": os.getcwd(),
+                "constraints": constraints,
+                "programs": programs,
+                "mlcalc": mlcalc,
+                "model": model,
+                "alpha_level": alpha_level,
+                "outgroup": outgroup,
+                "threads": {},
+                "raxml_path": raxml_path,
+                "raxmlVersion": raxmlVersion,
+                "raxmlFeatures": raxmlFeatures,
+                "iqtree_path": iqtree_path,
+                "iqtree2_path": iqtree2_path,
+                "consel_path": consel_path,
+                "cache": None,
+                "versions": versions,
+                "reuse_model": reuse_model,
+                "replicates": replicates,
+                "seed": seed,
+                "bootstrap_number": bootstrap_number,
+                "timeout": timeout}
+
+    ## the runtimes of earlier runs predict those of this run
+    history = HsOps.openHistory(cache_dir)
+    runtimeModel = HsOps.fit(history, HsOps.programVersions(settings), model, PlOps.COEFFICIENTS)
+
+    if(dry_run):
+        runPlan = planRun([(os.path.join(alignment, ali.strip()), ali.split(".")[0], settings) for ali in alis], settings, jobs, stage_jobs, threadNumber, runtimeModel)
+        for line in overallLog + stageLines(runPlan) + PlOps.report(runPlan) + PlOps.commandGraph(runPlan):
+            print(line)
+        return
+
+    if not os.path.isdir("output/SUMMARY"):
+        os.makedirs("output/SUMMARY")
+
+    ## skip the genes which are already finished and remove the
+    ## leftovers of genes which were interrupted
+    store = StOps.openStore()
+    manifest = RsOps.openManifest(store, RsOps.fingerprint(settings))
+    if(not manifest):
+        print("The output folder was created with different settings, please rename or remove it before running FAAUTeC")
+        sys.exit()
+    genes = [ali.split(".")[0] for ali in alis]
+    finished = RsOps.finishedGenes(manifest, dict([(gene, "output/" + gene) for gene in genes]), len(constraints) + 1)
+    finished = dict([(gene, result) for gene, result in finished.items() if gene in StOps.genes(store)])
+    StOps.keepGenes(store, finished)
+    RsOps.keepGenes(store, manifest, finished)
+    for gene in genes:
+        if gene not in finished and os.path.isdir("output/" + gene):
+            shutil.rmtree("output/" + gene)
+    if(resume):
+        print("Resuming: " + str(len(finished)) + " of " + str(len(alis)) + " genes are already finished")
+        overallLog.append("finished genes: " + str(len(finished)))
+
+    cache = None
+    if(cache_dir):
+        cache = CaOps.ResultCache(cache_dir, cache_size, versions)
+    settings.update({"cache": cache})
+
+    tasks = [(os.path.join(alignment, ali.strip()), ali.split(".")[0], settings) for ali in alis if ali.split(".")[0] not in finished]
+
+    ## the largest genes are started first, so that they do not delay the
+    ## end of the run
+    runPlan = planRun(tasks, settings, jobs, stage_jobs, threadNumber, runtimeModel)
+    tasks = runPlan["tasks"]
+    limits = runPlan["limits"]
+    PlOps.writePlan(runPlan, "output/SUMMARY/plan.csv")
+    print("Estimated wall time: " + str(round(runPlan["planned_s"], 1)) + " s, see output/SUMMARY/plan.csv")
+
+    with open("output/SUMMARY/log.txt","a") as logFile:
+        for line in overallLog + stageLines(runPlan) + PlOps.report(runPlan):
+            logFile.write(line + "\n")
 
-        else:
-            print("Error: The Program " + mlcalc + " is not supported to run ML Tree calculation use" +
-                  " 'RAxML' or 'IQTree' instead.")
-            break
+    treeFile = open("output/SUMMARY/raxml_hypoTreeShortestDistUnconstTree.tre","w")
+    distanceFile = open("output/SUMMARY/tree_distances.csv","w")
+
+    StOps.writeTable(store, "output/SUMMARY/au_runtime_table.csv", programs, len(constraints))
+    distanceFile.write("gene,metric,tree,unconst," + ','.join(["hypo" + str(i) for i in range(len(constraints))]) + "\n")
+
+    ## rebuild the summary of the finished genes
+    for gene in genes:
+        if gene in finished:
+            treeFile.write(finished[gene]["treeLine"])
+            distanceFile.writelines(finished[gene].get("distances", []))
+
+    ## the result writing stage, it runs in this process
+    progress = {"done": len(finished), "genes": set(), "start": time.time()}
+    def record(result):
+        StOps.recordGene(store, result["gene"], result["records"], result["evaluation"], result.get("replicates"), result.get("seeds"))
+        HsOps.recordRuns(history, result.get("history"))
+        StOps.writeTable(store, "output/SUMMARY/au_runtime_table.csv", programs, len(constraints))
+        if(replicates > 1):
+            StOps.writeReplicates(store, "output/SUMMARY/au_replicates.csv", programs, len(constraints))
+        treeFile.write(result["treeLine"])
+        distanceFile.writelines(result["distances"])
+        treeFile.flush()
+        distanceFile.flush()
+        RsOps.recordGene(store, manifest, result)
+        progress["genes"].add(result["gene"])
+
+    def printProgress():
+        ## the rest of the estimated work at the speed of the work so far
+        left = PlOps.remaining(runPlan, progress["genes"], time.time() - progress["start"])
+        print(str(progress["done"]) + " / " + str(int(len(alis))) + ", about " + str(int(round(left))) + " s left")
+
+    def write(state):
+        progress["done"] = progress["done"] + 1
+        if state is not None:
+            with PfOps.measure("stage", "write"):
+                result = finishGene(state)
+                record(result)
+            PfOps.writeGene(state["profile"] + PfOps.collect(result["gene"], "write"), os.path.join(state["geneDir"], result["gene"] + "_profile.json"))
+        printProgress()
+
+    ## the results of the workers of the queue are already written
+    def merge(result):
+        progress["done"] = progress["done"] + 1
+        if result is not None:
+            record(result)
+        printProgress()
+
+    stages = [("ingest", ingest),
+              ("search", functools.partial(inScratch, "search", searchGene)),
+              ("evaluate", functools.partial(inScratch, "evaluate", evaluateGene)),
+              ("autest", functools.partial(inScratch, "autest", testGene))]
+    if(coordinator):
+        coordinate(tasks, settings, local_workers, merge)
+    else:
+        ## the stages share the threads of --thread_number
+        SOps.runPipeline(stages, tasks, limits, write, PlOps.budgetThreads(settings["threads"]), threadNumber)
 
-        ## write the best tree to the best tree file
-        treeFile.write(gene + place[best_tree] + " " + trees[best_tree])
-
-        ### AU Test by CONSEL
-        if("CONSEL" in programs):
-            print("AU Test by CONSEL")
-            log = log + ["\n",
-                        "# Calculate AU-Test with CONSEL"]
-
-            start = time.time()
-            log = log + FOps.consel(ali, consel_path, model, gene, mlcalc, str(threadNumber), raxml_path, raxmlVersion)
-            runtimes.update({"CONSEL":round(time.time() - start,3)})
-
-            ## Save the AU Test values to a variable
-            au_consel = [0] * (len(constraints) + 1)
-            with open(gene + "_CONSEL.consel") as consel:
-                for line in consel.readlines()[3:len(constraints)+4]:
-                    au_consel[int(line.split()[2]) - 1] = float(line.split()[4])
-            au_consel = au_consel[1:]
-
-            ## mark values below significance level
-            for i in range(len(au_consel)):
-                if au_consel[i] <= alpha_level:
-                    au_consel[i] = str(au_consel[i]) + "*"
-
-            ## mark the tree with the smallest euclidic distance
-            au_consel[best_tree] = str(au_consel[best_tree]) + "s"
-
-            au_values.update({"CONSEL":au_consel})
-
-
-            log.append(FOps.commandline("mv " + gene + "_CONSEL* output/" + gene + "/03a_output_CONSEL/"))
-            log.append(FOps.commandline("mv RAxML* output/" + gene + "/03a_output_CONSEL/"))
-
-        # AU Test by IQTree
-        if("IQTree" in programs):
-            print("AU Test by IQTree")
-            log = log + ["\n",
-                        "# Calculate AU-Test with IQTree"]
-            start = time.time()
-            log = log + FOps.iqtree_autest(ali, iqtree_path, gene, mlcalc, str(threadNumber), raxmlVersion)
-            runtimes.update({"IQTree":round(time.time() - start,3)})
-
-            au_iqtree = []
-            with open(gene + "_IQTree.iqtree","r") as iqtree_out:
-                for line in iqtree_out:
-                    if line.strip() == "-------------------------------------------------------------------------":
-                        break
-                    else:
-                        pass
-                for line in iqtree_out:
-                    try:
-                        au_iqtree.append(float(line.split()[11]))
-                    except:
-                        break
-            au_iqtree = au_iqtree[1:]
-
-            ## mark values below significance level
-            for i in range(len(au_iqtree)):
-                if au_iqtree[i] <= alpha_level:
-                    au_iqtree[i] = str(au_iqtree[i]) + "*"
-
-            ## mark the tree with the smallest euclidic distance
-            au_iqtree[best_tree] = str(au_iqtree[best_tree]) + "s"
-
-            au_values.update({"IQTree":au_iqtree})
-
-            log.append(FOps.commandline("mv " + gene + "_IQTree* output/" + gene + "/03b_output_IQTree/"))
-
-
-        # AU Test by IQTree2
-        if("IQTree2" in programs):
-            print("AU Test by IQTree2")
-            log = log + ["\n",
-                         "# Calculate AU-Test with IQTree"]
-            start = time.time()
-            log = log + FOps.iqtree_autest(ali, iqtree2_path, gene, mlcalc, str(threadNumber), raxmlVersion)
-            runtimes.update({"IQTree2":round(time.time() - start,3)})
-
-            au_iqtree2 = []
-            with open(gene + "_IQTree.iqtree","r") as iqtree2_out:
-                for line in iqtree2_out:
-                    if line.strip() == "-------------------------------------------------------------------------":
-                        break
-                    else:
-                        pass
-                for line in iqtree2_out:
-                    try:
-                        au_iqtree2.append(float(line.split()[11]))
-                    except:
-                        break
-            au_iqtree2 = au_iqtree2[1:]
-
-            ## mark values below significance level
-            for i in range(len(au_iqtree2)):
-                if au_iqtree2[i] <= alpha_level:
-                    au_iqtree2[i] = str(au_iqtree2[i]) + "*"
-
-            ## mark the tree with the smallest euclidic distance
-            au_iqtree2[best_tree] = str(au_iqtree2[best_tree]) + "s"
-
-            au_values.update({"IQTree2":au_iqtree2})
-
-            log.append(FOps.commandline("mv " + gene + "_IQTree* output/" + gene + "/03c_output_IQTree2/"))
-
-
-        auFile.write(gene + ''.join(["," + str(au_values[program][i]) for i in range(len(constraints)) for program in programs]) + ''.join(["," + str(runtimes[program]) for program in programs]) + "\n")
-
-        colored = colored + 1
-
-        with open("output/" + gene + "/" + gene + "_log.sh","w") as logFile:
-            for line in log:
-                logFile.write(line + "\n")
-
-        os.remove(gene + "_COMBINED.tre")
-        os.remove("hypo.txt")
-        os.remove("hypo_rem.txt")
-        print(str(colored) + " / " + str(int(len(alis))))
+    treeFile.close()
+    distanceFile.close()
 
+    ## profile of all finished genes, including those of earlier runs
+    report = PfOps.writeSummary(PfOps.readGenes([os.path.join("output", gene, gene + "_profile.json") for gene in genes]), "output/SUMMARY")
+    with open("output/SUMMARY/log.txt","a") as logFile:
+        for line in report:
+            print(line)
+            logFile.write(line + "\n")
 
-    treeFile.close()
-    auFile.close()
+    if(cache):
+        print("Removed " + str(cache.evict()) + " entries from the cache")
 
     if(latex):
-        IOOps.Outp().createLatex("output/SUMMARY/au_runtime_table.csv", latex)
+        header, rows = StOps.table(store, programs, len(constraints))
+        IOOps.Outp().latexTable(header, rows, "output/SUMMARY/au_runtime_table.tex")
+    store.close()
+    if(history):
+        history.close()
@@ -1,297 +1,495 @@
-#!/usr/bin/env python3.7
-''' Support operations of FAAUTeC '''
-
-import os
-import subprocess
-import dendropy
-import random
-import string
-from Bio import SeqIO
-from Bio.Nexus import Nexus
-from ete3 import Tree
-
-def findBestTree(treeList):
-    tns = dendropy.TaxonNamespace()
-    rank = []
-    unconst = dendropy.Tree.get_from_string(
-            treeList[0],
-            "newick",
-            taxon_namespace=tns)
-    unconst.encode_bipartitions()
-    for tree in treeList[1:]:
-        hypo = dendropy.Tree.get_from_string(
-                tree,
-                "newick",
-                taxon_namespace=tns)
-        hypo.encode_bipartitions()
-        rank.append(dendropy.calculate.treecompare.euclidean_distance(unconst, hypo))
-    return rank.index(min(rank))
-
-
-def readConstraints(constraint_path):
-    constraints_tmp = []
-
-    ## put all constraint trees in one list
-    with open(constraint_path) as constFile:
-        for line in constFile:
-            constraints_tmp.append(line.strip())
-        constraints_tmp = ''.join(constraints_tmp).split(";")[:-1]
-
-    ## deroot the trees
-    constraints = []
-    for const in constraints_tmp:
-        tree = dendropy.Tree.get_from_string(const + ";", "newick")
-        tree.deroot()
-        constraints.append(tree)
-
-    return constraints
-
-def removableTaxa(alignment_path, allTaxa, format):
-    Taxa = allTaxa.copy()
-    if format == "nex":
-        format = "nexus"
-    elif format == "phy":
-        format == "phylip"
-
-    if(format in ["fasta","nexus","phylip"]):
-        for seq_record in SeqIO.parse(alignment_path, format):
-            try:
-                Taxa.remove(seq_record.id)
-            except:
-                pass
-        for seq in Taxa:
-            try:
-                allTaxa.remove(seq)
-            except:
-                pass
-    else:
-        print("'" + alignment_path + "' is not in a supported format")
-    return allTaxa
-
-def removeTaxa(constraint_path, allTaxa, tree):
-    tree = Tree(tree)
-    tree.prune(allTaxa)
-    return(tree.write(format=9))
-
-## Main Function
-def removeGenesFromConstTree(alignment_path, constraint_path, output_path):
-    if not output_path:
-        new_constraint_path = open(''.join(constraint_path.split(".")[:-1]) + "_new." + constraint_path.split(".")[-1], "w")
-    else:
-        new_constraint_path = open(output_path, "w")
-    with open(constraint_path, "r") as const:
-        ## For each tree in tree file find the Taxa which are not part of the alignment
-        for tree in const.readlines():
-            stayTaxa = tree.strip().replace("(","").replace(")","").replace(";","").split(",")
-            allTaxa = stayTaxa.copy()
-            ## Find the Taxa which are part of all alignmentfiles
-            #try:
-            #    for ali in os.listdir(alignment_path):
-            #        ali = alignment_path + "/" + ali
-            #        stayTaxa = removableTaxa(ali, stayTaxa, ali.split(".")[-1])
-            #except:
-            stayTaxa = removableTaxa(alignment_path, stayTaxa, alignment_path.split(".")[-1])
-            ## Print all removed Taxa
-            print("removed Taxa:")
-            i = 0
-            for taxa in allTaxa:
-                if taxa not in stayTaxa:
-                    i = i + 1
-                    print(taxa)
-            print("Number removed Taxa: " + str(i))
-
-            ## Write new constraint tree to file
-            new_constraint_path.write(removeTaxa(constraint_path, stayTaxa, tree) + "\n")
-    new_constraint_path.close()
-
-def iqtree_autest(alignment, iqtree2_path, gene_name, mlcalc, threadNumber, raxml_version):
-    log = []
-    if(mlcalc == "RAxML" and raxml_version == "standard"):
-        unconstTree = "output/" + gene_name + "/02_output_RAxML/RAxML_bestTree.withoutConstraints_" + gene_name
-    elif(mlcalc == "RAxML" and raxml_version == "ng"):
-        unconstTree = "output/" + gene_name + "/02_output_RAxML/RAxML_withoutConstraints_" + gene_name + ".raxml.bestTree"
-    elif(mlcalc == "IQTree"):
-        unconstTree = "output/" + gene_name + "/02_output_IQTree/" + gene_name + "_IQTree_unconst.treefile"
-    else:
-        return False # should never happen
-
-    log.append(commandline(iqtree2_path + \
-                           " -s " + alignment + \
-                           " -m GTR+I+G " + \
-                           " -z " + gene_name + "_COMBINED.tre " + \
-                           " -te " + unconstTree + \
-                           " -zb 10000 " + \
-                           " -au -pre " + gene_name + "_IQTree " + \
-                           " -quiet " + \
-                           " -nt " + threadNumber)
-              )
-
-    return log
-
-def iqtree_mltree(alignment, constraints, gene_name, threadNumber, iqtree_path):
-    log = []
-    log.append(commandline(iqtree_path + \
-                           " -s " + alignment + \
-                           " -m GTR+I+G " + \
-                           " -pre " + gene_name + "_IQTree_unconst " + \
-                           " -quiet " + \
-                           " -nt " + threadNumber)
-               )
-
-    for i in range(len(constraints)):
-        with open("hypo.txt","w") as hypo:
-            hypo.write(constraints[i].as_string(schema="newick", suppress_rooting=True))
-        removeGenesFromConstTree(alignment, "hypo.txt", "hypo_rem.txt")
-        log.append(commandline(iqtree_path + \
-                               " -s "+ alignment + \
-                               " -m GTR+I+G " + \
-                               " -g hypo_rem.txt " + \
-                               " -pre " + gene_name + "_IQTree_hypo" + str(i) + \
-                               " -quiet -nt " + threadNumber)
-                  )
-    log.append(commandline("cat " + gene_name + "_IQTree_unconst.treefile " + ''.join([gene_name + "_IQTree_hypo" + str(i) + ".treefile " for i in range(len(constraints))]) + "> " + gene_name + "_COMBINED.tre"))
-    return log
-
-def raxml(alignment, constraints, model, gene_name, outgroup_name, threadNumber, raxml_path, raxml_version):
-    log = []
-    if (raxml_version == "standard"):
-        command_prep = raxml_path + \
-                       " -s " + alignment + \
-                       " -n withoutConstraints_" + gene_name + \
-                       " -m " + model + \
-                       " -p " + ''.join(random.sample(string.digits, 5)) + \
-                       " -f d " + \
-                       " -w " + os.getcwd() + \
-                       " -T " + threadNumber + \
-                       " --silent "
-        if outgroup_name:
-            command_prep += " -o " + outgroup_name
-        log.append(commandline(command_prep))
-    else:
-        log.append(commandline(raxml_path + \
-                               " --msa " + alignment + \
-                               " --prefix RAxML_withoutConstraints_" + gene_name + \
-                               " --model " + model + \
-                               " --seed " + ''.join(random.sample(string.digits, 5)) + \
-                               "--threads " + threadNumber)
-                  )
-    for i in range(len(constraints)):
-        with open("hypo.txt","w") as hypo:
-            hypo.write(constraints[i].as_string(schema="newick", suppress_rooting=True))
-        removeGenesFromConstTree(alignment, "hypo.txt", "hypo_rem.txt")
-        if (raxml_version == "standard"):
-            command_prep = raxml_path + \
-                           " -s " + alignment + \
-                           " -n hypothesis" + str(i) + "_" + gene_name + \
-                           " -m " + model + \
-                           " -g hypo_rem.txt " + \
-                           " -p " + ''.join(random.sample(string.digits, 5)) + \
-                           " -f d " + \
-                           " -w " + os.getcwd() + \
-                           " -T " + threadNumber + \
-                           " --silent"
-            if outgroup_name:
-                command_prep += " -o " + outgroup_name
-            log.append(commandline(command_prep))
-
-        else:
-            #commandline(command)
-            try:
-                command = raxml_path + \
-                          " --msa " + alignment + \
-                          " --prefix RAxML_hypothesis" + str(i) + "_" + gene_name + \
-                          " --model " + model + \
-                          " --tree-constraint hypo_rem.txt " + \
-                          " --seed " + ''.join(random.sample(string.digits, 5)) + \
-                          " --threads " + threadNumber
-                raxmlOut = subprocess.check_output(command, shell = True).decode('utf-8').strip()
-            except:
-                command = raxml_path + \
-                          " --msa " + alignment + \
-                          " --prefix RAxML_hypothesis" + str(i) + "_" + gene_name + \
-                          " --model " + model + \
-                          " --evaluate --tree hypo_rem.txt " + \
-                          " --seed " + ''.join(random.sample(string.digits, 5)) + \
-                          " --threads " + threadNumber
-                raxmlOut = subprocess.check_output(command, shell = True).decode('utf-8').strip()
-
-            log.append(command)
-            del(raxmlOut)
-            del(command)
-
-
-    if (raxml_version == "standard"):
-        log.append(commandline("cat RAxML_bestTree.withoutConstraints_" + gene_name + ''.join([" RAxML_bestTree.hypothesis" + str(i) + "_" + gene_name for i in range(len(constraints))]) + " > " + gene_name + "_COMBINED.tre"))
-    else:
-        log.append(commandline("cat RAxML_withoutConstraints_" + gene_name + ".raxml.bestTree" + ''.join([" RAxML_hypothesis" + str(i) + "_" + gene_name + ".raxml.bestTree" for i in range(len(constraints))]) + " > " + gene_name + "_COMBINED.tre"))
-
-    return log
-
-def consel(alignment, consel_path, model, gene_name, mlcalc, threadNumber, raxml_path, raxml_version):
-    log = []
-    if os.path.isfile(alignment+".reduced"):  # Prefer the reduced file (i.e., no invariable columns) if it exists
-        alignment = alignment+".reduced"
-    if(mlcalc == "RAxML"):
-        if (raxml_version == "standard"):
-            log.append(commandline(raxml_path + \
-                                   " -s " + alignment + \
-                                   " -n " + gene_name + ".trees.sitelh " + \
-                                   " -m "+ model + \
-                                   " -f g " + \
-                                   " -t output/" + gene_name + "/02_output_RAxML/RAxML_bestTree.withoutConstraints_" + gene_name + \
-                                   " -z " + gene_name + "_COMBINED.tre " + \
-                                   " -p " + ''.join(random.sample(string.digits, 5)) + \
-                                   " -w " + os.getcwd() + \
-                                   " -T " + threadNumber + \
-                                   " --silent"
-                                   )
-                       )
-        else:
-            log.append(commandline(raxml_path + \
-                                   " --msa " + alignment + \
-                                   " --prefix RAxML_" + gene_name + \
-                                   " --model "+ model + \
-                                   " --sitelh " + \
-                                   " --tree " + gene_name + "_COMBINED.tre " + \
-                                   " --seed " + ''.join(random.sample(string.digits, 5)) + \
-                                   " --threads " + threadNumber)
-                      )
-            log.append(commandline("mv RAxML_" + gene_name + ".raxml.siteLH RAxML_perSiteLLs." + gene_name + ".trees.sitelh"))
-    else:
-        if (raxml_version == "standard"):
-            log.append(commandline(raxml_path + \
-                                   " -s " + alignment + \
-                                   " -n " + gene_name + ".trees.sitelh " + \
-                                   " -m "+ model + \
-                                   " -f g " + \
-                                   " -t output/" + gene_name + "/02_output_IQTree/" + gene_name + "_IQTree_unconst.treefile " + \
-                                   " -z " + gene_name + "_COMBINED.tre " + \
-                                   " -p " + ''.join(random.sample(string.digits, 5)) + \
-                                   " -w " + os.getcwd() + \
-                                   " -T " + threadNumber + \
-                                   " --silent"
-                                   )
-                      )
-        else:
-            log.append(commandline(raxml_path + \
-                                   " --msa " + alignment + \
-                                   " --prefix RAxML_" + gene_name + \
-                                   " --model "+ model + \
-                                   " --sitelh " + \
-                                   " --tree " + gene_name + "_COMBINED.tre " + \
-                                   " --seed " + ''.join(random.sample(string.digits, 5)) + \
-                                   "--threads " + threadNumber)
-                      )
-            log.append(commandline("mv RAxML_" + gene_name + ".raxml.siteLH RAxML_perSiteLLs." + gene_name + ".trees.sitelh"))
-    log.append("\n## CONSEL")
-    log.append(commandline("mv RAxML_perSiteLLs." + gene_name + ".trees.sitelh RAxML_perSiteLLs_" + gene_name + ".trees.sitelh"))
-    log.append(commandline(consel_path + "/seqmt --puzzle RAxML_perSiteLLs_" + gene_name + ".trees.sitelh " + gene_name + "_CONSEL.mt"))
-    log.append(commandline(consel_path + "/makermt " + gene_name + "_CONSEL.mt"))
-    log.append(commandline(consel_path + "/consel " + gene_name + "_CONSEL.rmt"))
-    log.append(commandline(consel_path + "/catpv " + gene_name + "_CONSEL.pv > " + gene_name + "_CONSEL.consel"))
-
-    return log
-
-def commandline(command):
-    os.system(command)
-    return command
+#!/usr/bin/env python3.7
+''' Support operations of FAAUTeC '''
+
+import os
+
+import IOOps as IOOps
+import SchedOps as SOps
+import CacheOps as CaOps
+import AUOps as AUOps
+import TreeOps as TOps
+import ExecOps as ExOps
+import ProfOps as PfOps
+import SeedOps as SdOps
+import ReportOps as RpOps
+import PatternOps as PtOps
+
+def findBestTree(treeList, distances=None):
+    ''' Index of the hypothesis tree with the smallest euclidean distance
+        to the unconstrained tree, which is the first tree of treeList '''
+    if distances is None:
+        distances = TOps.distanceMatrices(treeList)
+    rank = list(distances["euclidean"][0, 1:])
+    return rank.index(min(rank))
+
+def readConstraints(constraint_path):
+    ## dendropy is only needed here, so it is not loaded on every start
+    import dendropy
+
+    constraints_tmp = []
+
+    ## put all constraint trees in one list
+    with open(constraint_path) as constFile:
+        for line in constFile:
+            constraints_tmp.append(line.strip())
+        constraints_tmp = ''.join(constraints_tmp).split(";")[:-1]
+
+    ## deroot the trees
+    constraints = []
+    for const in constraints_tmp:
+        tree = dendropy.Tree.get_from_string(const + ";", "newick")
+        tree.deroot()
+        constraints.append(tree)
+
+    return constraints
+
+def parseNewick(newick):
+    ## nested lists of taxon names, branch lengths, inner node labels
+    ## and comments are dropped
+    stack = [[]]
+    i = 0
+    while i < len(newick):
+        char = newick[i]
+        if char == "(":
+            stack.append([])
+            i = i + 1
+        elif char == ")":
+            if len(stack) == 1:
+                raise ValueError("unbalanced parentheses in the tree " + newick)
+            node = stack.pop()
+            stack[-1].append(node)
+            i = i + 1
+            while i < len(newick) and newick[i] not in ",();":
+                i = i + 1
+        elif char == ":":
+            while i < len(newick) and newick[i] not in ",();":
+                i = i + 1
+        elif char == "[":
+            i = newick.index("]", i) + 1
+        elif char == "'":
+            end = newick.index("'", i + 1)
+            stack[-1].append(newick[i:end + 1])
+            i = end + 1
+        elif char in ",; \t\r\n":
+            i = i + 1
+        else:
+            end = i
+            while end < len(newick) and newick[end] not in ",():;[":
+                end = end + 1
+            stack[-1].append(newick[i:end].strip())
+            i = end
+    if len(stack) != 1 or len(stack[0]) != 1:
+        raise ValueError("unbalanced parentheses in the tree " + newick)
+    return stack[0][0]
+
+def treeTaxa(node):
+    if isinstance(node, str):
+        return set([node.strip("'")])
+    return set().union(*[treeTaxa(child) for child in node])
+
+def pruneTree(node, taxa):
+    ## remove all leaves which are not in taxa and the inner nodes
+    ## which are left with a single child
+    if isinstance(node, str):
+        if node.strip("'") in taxa:
+            return node
+        return None
+    children = [child for child in [pruneTree(child, taxa) for child in node] if child is not None]
+    if len(children) == 0:
+        return None
+    if len(children) == 1:
+        return children[0]
+    return children
+
+def writeNewick(node):
+    if isinstance(node, str):
+        return node
+    return "(" + ",".join([writeNewick(child) for child in node]) + ")"
+
+def indexConstraints(constraints):
+    ## parse every constraint tree once per run and remember its taxa
+    index = []
+    for const in constraints:
+        tree = parseNewick(const.as_string(schema="newick", suppress_rooting=True))
+        index.append({"newick": writeNewick(tree) + ";", "tree": tree, "taxa": treeTaxa(tree)})
+    return index
+
+def pruneConstraint(constraint, taxa):
+    ## newick string of the constraint tree restricted to taxa
+    if constraint["taxa"].issubset(taxa):
+        return constraint["newick"], 0
+    removed = len(constraint["taxa"] - taxa)
+    tree = pruneTree(constraint["tree"], taxa)
+    if tree is None:
+        return ";", removed
+    return writeNewick(tree) + ";", removed
+
+def unconstTreePath(gene_dir, gene_name, mlcalc, raxml_version):
+    if(mlcalc == "RAxML" and raxml_version == "standard"):
+        return gene_dir + "/02_output_RAxML/RAxML_bestTree.withoutConstraints_" + gene_name
+    elif(mlcalc == "RAxML" and raxml_version == "ng"):
+        return gene_dir + "/02_output_RAxML/RAxML_withoutConstraints_" + gene_name + ".raxml.bestTree"
+    elif(mlcalc == "IQTree"):
+        return gene_dir + "/02_output_IQTree/" + gene_name + "_IQTree_unconst.treefile"
+    return False # should never happen
+
+def hypoTreePath(gene_dir, gene_name, mlcalc, raxml_version, i):
+    if(mlcalc == "RAxML" and raxml_version == "standard"):
+        return gene_dir + "/02_output_RAxML/RAxML_bestTree.hypothesis" + str(i) + "_" + gene_name
+    elif(mlcalc == "RAxML" and raxml_version == "ng"):
+        return gene_dir + "/02_output_RAxML/RAxML_hypothesis" + str(i) + "_" + gene_name + ".raxml.bestTree"
+    elif(mlcalc == "IQTree"):
+        return gene_dir + "/02_output_IQTree/" + gene_name + "_IQTree_hypo" + str(i) + ".treefile"
+    return False # should never happen
+
+def iqtree_autest(alignment, iqtree2_path, gene_name, mlcalc, threadNumber, raxml_version, gene_dir=None, model="GTR+I+G", trees=None, prefix=None, seed=None):
+    ## with the model and the trees of the shared evaluation, IQ-TREE only
+    ## runs the bootstrap and does not optimize the parameters again;
+    ## replicates of the test write to their own prefix
+    log = []
+    if not prefix:
+        prefix = gene_name
+    if not gene_dir:
+        gene_dir = "output/" + gene_name
+    unconstTree = unconstTreePath(gene_dir, gene_name, mlcalc, raxml_version)
+    if not unconstTree:
+        return False # should never happen
+
+    command = [iqtree2_path,
+               "-s", alignment,
+               "-m", model,
+               "-z", trees or gene_name + "_COMBINED.tre",
+               "-te", unconstTree,
+               "-zb", "10000",
+               "-au", "-pre", prefix + "_IQTree",
+               "-quiet",
+               "-nt", threadNumber]
+    if trees:
+        command.append("-blfix")
+    if seed is not None:
+        command = command + ["-seed", seed]
+    log.append(ExOps.run(command, "autest_" + os.path.basename(iqtree2_path) + prefix[len(gene_name):]))
+
+    return log
+
+def writeConstraintFiles(alignment, constraints, taxa=None):
+    ## every hypothesis gets its own constraint file, so that the
+    ## searches can run at the same time; returns the files and the log
+    ## lines with the number of removed taxa for the gene log
+    with PfOps.measure("step", "prune constraints"):
+        if taxa is None:
+            taxa = set([name for name, seq in IOOps.Inp().readAlignment(alignment)])
+        constFiles = []
+        log = []
+        for i in range(len(constraints)):
+            newick, removed = pruneConstraint(constraints[i], taxa)
+            log.append("# hypothesis " + str(i) + ": removed Taxa: " + str(removed))
+            with open("hypo" + str(i) + "_rem.txt","w") as hypo:
+                hypo.write(newick + "\n")
+            constFiles.append("hypo" + str(i) + "_rem.txt")
+    return constFiles, log
+
+def runSearches(searches, threadNumber):
+    ## run the unconstrained and all constrained searches as one batch,
+    ## each search gets its share of the threads
+    workers, searchThreads = SOps.splitThreads(int(threadNumber), len(searches), len(searches))
+    return SOps.runThreads(lambda search: search(str(searchThreads)), searches, workers)
+
+def modelPath(gene_name, mlcalc, raxml_version):
+    ## the file with the fitted model of the unconstrained search
+    if(mlcalc == "RAxML" and raxml_version == "standard"):
+        return "RAxML_binaryModelParameters.withoutConstraints_" + gene_name
+    elif(mlcalc == "RAxML" and raxml_version == "ng"):
+        return "RAxML_withoutConstraints_" + gene_name + ".raxml.bestModel"
+    elif(mlcalc == "IQTree"):
+        return gene_name + "_IQTree_unconst.iqtree"
+    return False # should never happen
+
+def iqtree_mltree(alignment, constraints, gene_name, threadNumber, iqtree_path, cache=None, taxa=None, reuse_model=False, seeds=None):
+    constFiles, constLog = writeConstraintFiles(alignment, constraints, taxa)
+    ## one seed for the unconstrained search and one per hypothesis
+    if seeds is None:
+        seeds = SdOps.treeSeeds(SdOps.SEED, gene_name, "IQTree", len(constraints))
+    unconstFiles = [gene_name + "_IQTree_unconst.treefile"]
+    if reuse_model:
+        unconstFiles.append(modelPath(gene_name, "IQTree", None))
+
+    def unconst(threads):
+        def run():
+            return ExOps.run([iqtree_path,
+                              "-s", alignment,
+                              "-m", "GTR+I+G",
+                              "-pre", gene_name + "_IQTree_unconst",
+                              "-seed", seeds[0],
+                              "-quiet",
+                              "-nt", threads],
+                             "mltree_unconst")
+        ## with reuse_model the model file is stored as well, so the
+        ## entries with and without it need their own keys
+        return CaOps.cachedRun(cache, [iqtree_path], ["mltree", "GTR+I+G", seeds[0], reuse_model], [alignment], unconstFiles, run)
+
+    def hypothesis(i):
+        def search(threads):
+            def run():
+                return ExOps.run([iqtree_path,
+                                  "-s", alignment,
+                                  "-m", model,
+                                  "-g", constFiles[i],
+                                  "-pre", gene_name + "_IQTree_hypo" + str(i),
+                                  "-seed", seeds[i + 1],
+                                  "-quiet", "-nt", threads],
+                                 "mltree_hypo" + str(i))
+            return CaOps.cachedRun(cache, [iqtree_path], ["mltree", model, seeds[i + 1]], [alignment, constFiles[i]], [gene_name + "_IQTree_hypo" + str(i) + ".treefile"], run)
+        return search
+
+    model = "GTR+I+G"
+    if reuse_model:
+        ## the hypotheses only search the topology with the parameters of
+        ## the unconstrained tree, so that search has to finish first
+        log = constLog + runSearches([unconst], threadNumber)
+        model = RpOps.readIQTreeModel(unconstFiles[1]) or model
+        log = log + runSearches([hypothesis(i) for i in range(len(constraints))], threadNumber)
+    else:
+        log = constLog + runSearches([unconst] + [hypothesis(i) for i in range(len(constraints))], threadNumber)
+    log.append(ExOps.concat([gene_name + "_IQTree_unconst.treefile"] + [gene_name + "_IQTree_hypo" + str(i) + ".treefile" for i in range(len(constraints))], gene_name + "_COMBINED.tre"))
+    return log
+
+def raxml(alignment, constraints, model, gene_name, outgroup_name, threadNumber, raxml_path, raxml_version, cache=None, taxa=None, reuse_model=False, seeds=None, tree_constraint=True):
+    constFiles, constLog = writeConstraintFiles(alignment, constraints, taxa)
+    ## one seed for the unconstrained search and one per hypothesis
+    if seeds is None:
+        seeds = SdOps.treeSeeds(SdOps.SEED, gene_name, "RAxML", len(constraints))
+    workDir = os.getcwd()
+    modelFile = modelPath(gene_name, "RAxML", raxml_version)
+    ## the options which fix the model to that of the unconstrained search
+    fixedModel = []
+    if reuse_model and raxml_version == "standard":
+        fixedModel = ["-R", modelFile]
+    elif reuse_model:
+        fixedModel = ["--opt-model", "off"]
+
+    def unconst(threads):
+        def run():
+            if (raxml_version == "standard"):
+                command = [raxml_path,
+                           "-s", alignment,
+                           "-n", "withoutConstraints_" + gene_name,
+                           "-m", model,
+                           "-p", seeds[0],
+                           "-f", "d",
+                           "-w", workDir,
+                           "-T", threads,
+                           "--silent"]
+                if outgroup_name:
+                    command = command + ["-o", outgroup_name]
+                return ExOps.run(command, "mltree_unconst")
+            else:
+                return ExOps.run([raxml_path,
+                                  "--msa", alignment,
+                                  "--prefix", "RAxML_withoutConstraints_" + gene_name,
+                                  "--model", model,
+                                  "--seed", seeds[0],
+                                  "--threads", threads],
+                                 "mltree_unconst")
+        if (raxml_version == "standard"):
+            bestTree = "RAxML_bestTree.withoutConstraints_" + gene_name
+        else:
+            bestTree = "RAxML_withoutConstraints_" + gene_name + ".raxml.bestTree"
+        ## with reuse_model the model file is stored as well, so the
+        ## entries with and without it need their own keys
+        if reuse_model:
+            return CaOps.cachedRun(cache, [raxml_path], ["mltree", model, outgroup_name, seeds[0], reuse_model], [alignment], [bestTree, modelFile], run)
+        return CaOps.cachedRun(cache, [raxml_path], ["mltree", model, outgroup_name, seeds[0], reuse_model], [alignment], [bestTree], run)
+
+    def hypothesis(i):
+        def search(threads):
+            def run():
+                if (raxml_version == "standard"):
+                    command = [raxml_path,
+                               "-s", alignment,
+                               "-n", "hypothesis" + str(i) + "_" + gene_name,
+                               "-m", model,
+                               "-g", constFiles[i],
+                               "-p", seeds[i + 1],
+                               "-f", "d",
+                               "-w", workDir,
+                               "-T", threads,
+                               "--silent"] + fixedModel
+                    if outgroup_name:
+                        command = command + ["-o", outgroup_name]
+                    return ExOps.run(command, "mltree_hypo" + str(i))
+
+                if tree_constraint:
+                    return ExOps.run([raxml_path,
+                                      "--msa", alignment,
+                                      "--prefix", "RAxML_hypothesis" + str(i) + "_" + gene_name,
+                                      "--model", hypoModel,
+                                      "--tree-constraint", constFiles[i],
+                                      "--seed", seeds[i + 1],
+                                      "--threads", threads] + fixedModel,
+                                     "mltree_hypo" + str(i))
+                ## versions without --tree-constraint (found by
+                ## CheckOps.checkRAxMLFeatures()) evaluate the constraint
+                ## tree instead
+                return ExOps.run([raxml_path,
+                                  "--msa", alignment,
+                                  "--prefix", "RAxML_hypothesis" + str(i) + "_" + gene_name,
+                                  "--model", hypoModel,
+                                  "--evaluate", "--tree", constFiles[i],
+                                  "--seed", seeds[i + 1],
+                                  "--threads", threads] + fixedModel,
+                                 "mltree_hypo" + str(i))
+            if (raxml_version == "standard"):
+                bestTree = "RAxML_bestTree.hypothesis" + str(i) + "_" + gene_name
+            else:
+                bestTree = "RAxML_hypothesis" + str(i) + "_" + gene_name + ".raxml.bestTree"
+            if reuse_model:
+                return CaOps.cachedRun(cache, [raxml_path], ["mltree", model, outgroup_name, seeds[i + 1]], [alignment, constFiles[i], modelFile], [bestTree], run)
+            return CaOps.cachedRun(cache, [raxml_path], ["mltree", model, outgroup_name, seeds[i + 1]], [alignment, constFiles[i]], [bestTree], run)
+        return search
+
+    ## RAxML-NG reads the fitted model from the model file
+    hypoModel = model
+    if reuse_model and raxml_version == "ng":
+        hypoModel = modelFile
+    if reuse_model:
+        ## the hypotheses only search the topology with the parameters of
+        ## the unconstrained tree, so that search has to finish first
+        log = constLog + runSearches([unconst], threadNumber)
+        log = log + runSearches([hypothesis(i) for i in range(len(constraints))], threadNumber)
+    else:
+        log = constLog + runSearches([unconst] + [hypothesis(i) for i in range(len(constraints))], threadNumber)
+
+    if (raxml_version == "standard"):
+        log.append(ExOps.concat(["RAxML_bestTree.withoutConstraints_" + gene_name] + ["RAxML_bestTree.hypothesis" + str(i) + "_" + gene_name for i in range(len(constraints))], gene_name + "_COMBINED.tre"))
+    else:
+        log.append(ExOps.concat(["RAxML_withoutConstraints_" + gene_name + ".raxml.bestTree"] + ["RAxML_hypothesis" + str(i) + "_" + gene_name + ".raxml.bestTree" for i in range(len(constraints))], gene_name + "_COMBINED.tre"))
+
+    return log
+
+def sitelh(alignment, model, gene_name, mlcalc, threadNumber, raxml_path, raxml_version, gene_dir=None, cache=None, model_file=None, seed=None):
+    ## per site log-likelihoods of all trees in the combined tree file,
+    ## written to <gene>_Eval.sitelh; with model_file the parameters of
+    ## the unconstrained search are used instead of being optimized again
+    log = []
+    if not gene_dir:
+        gene_dir = "output/" + gene_name
+    if os.path.isfile(alignment+".reduced"):  # Prefer the reduced file (i.e., no invariable columns) if it exists
+        alignment = alignment+".reduced"
+    unconstTree = unconstTreePath(gene_dir, gene_name, mlcalc, "standard")
+    if seed is None:
+        seed = SdOps.seed(SdOps.SEED, gene_name, "evaluate", "RAxML")
+
+    def run():
+        log = []
+        if (raxml_version == "standard"):
+            log.append(ExOps.run([raxml_path,
+                                  "-s", alignment,
+                                  "-n", gene_name + ".trees.sitelh",
+                                  "-m", model,
+                                  "-f", "g",
+                                  "-t", unconstTree,
+                                  "-z", gene_name + "_COMBINED.tre",
+                                  "-p", seed,
+                                  "-w", os.getcwd(),
+                                  "-T", threadNumber,
+                                  "--silent"] + (["-R", model_file] if model_file else []),
+                                 "evaluate"))
+        else:
+            log.append(ExOps.run([raxml_path,
+                                  "--msa", alignment,
+                                  "--prefix", "RAxML_" + gene_name,
+                                  "--model", model_file or model,
+                                  "--sitelh",
+                                  "--tree", gene_name + "_COMBINED.tre",
+                                  "--seed", seed,
+                                  "--threads", threadNumber] + (["--opt-model", "off"] if model_file else []),
+                                 "evaluate"))
+            log.append(ExOps.rename("RAxML_" + gene_name + ".raxml.siteLH", "RAxML_perSiteLLs." + gene_name + ".trees.sitelh"))
+        return '\n'.join(log)
+
+    ## the site likelihoods only depend on the alignment and the trees
+    log.append(CaOps.cachedRun(cache, [raxml_path], ["sitelh", model, raxml_version, seed], [alignment, gene_name + "_COMBINED.tre"] + ([model_file] if model_file else []),
+                               ["RAxML_perSiteLLs." + gene_name + ".trees.sitelh"], run))
+    log.append(ExOps.rename("RAxML_perSiteLLs." + gene_name + ".trees.sitelh", sitelhPath(gene_name)))
+
+    return log
+
+def sitelhPath(gene_name):
+    ## the site likelihoods of the shared evaluation, used by all AU tests
+    return gene_name + "_Eval.sitelh"
+
+def patternPath(gene_name):
+    ## the site likelihoods of the shared evaluation as site patterns
+    return gene_name + "_Eval.patterns.bin"
+
+def evaluatedTreesPath(gene_name):
+    return gene_name + "_Eval.trees"
+
+def evaluator(programs):
+    ## the program of the shared evaluation: IQ-TREE if one of its AU tests
+    ## is selected, so that it can reuse the fitted model, RAxML otherwise
+    for program in ["IQTree", "IQTree2"]:
+        if program in programs:
+            return program
+    return "RAxML"
+
+def iqtree_evaluate(alignment, iqtree_path, gene_name, mlcalc, threadNumber, raxml_version, gene_dir=None, cache=None, model="GTR+I+G", seed=None):
+    ## optimize GTR+I+G once on the unconstrained tree, unless model already
+    ## fixes its parameters, and evaluate all trees; writes the site
+    ## likelihoods, the trees with their branch lengths and the model to
+    ## <gene>_Eval.*
+    log = []
+    if not gene_dir:
+        gene_dir = "output/" + gene_name
+    unconstTree = unconstTreePath(gene_dir, gene_name, mlcalc, raxml_version)
+    if seed is None:
+        seed = SdOps.seed(SdOps.SEED, gene_name, "evaluate", "IQTree")
+
+    def run():
+        return ExOps.run([iqtree_path,
+                          "-s", alignment,
+                          "-m", model,
+                          "-z", gene_name + "_COMBINED.tre",
+                          "-te", unconstTree,
+                          "-wsl",
+                          "-pre", gene_name + "_Eval",
+                          "-seed", seed,
+                          "-quiet",
+                          "-nt", threadNumber],
+                         "evaluate")
+
+    log.append(CaOps.cachedRun(cache, [iqtree_path], ["evaluate", model, seed], [alignment, gene_name + "_COMBINED.tre"],
+                               [sitelhPath(gene_name), evaluatedTreesPath(gene_name), gene_name + "_Eval.iqtree"], run))
+
+    return log
+
+def consel(consel_path, gene_name, prefix=None, seed=None):
+    ## AU test on the site likelihoods of the shared evaluation; replicates
+    ## of the test write to their own prefix
+    log = ["\n## CONSEL"]
+    if not prefix:
+        prefix = gene_name
+    step = "consel" + prefix[len(gene_name):]
+    makermt = [os.path.join(consel_path, "makermt")]
+    if seed is not None:
+        makermt = makermt + ["-s", seed]
+    makermt.append(prefix + "_CONSEL.mt")
+    log.append(ExOps.run([os.path.join(consel_path, "seqmt"), "--puzzle", sitelhPath(gene_name), prefix + "_CONSEL.mt"], step))
+    log.append(ExOps.run(makermt, step))
+    log.append(ExOps.run([os.path.join(consel_path, "consel"), prefix + "_CONSEL.rmt"], step))
+    log.append(ExOps.run([os.path.join(consel_path, "catpv"), prefix + "_CONSEL.pv"], step, prefix + "_CONSEL.consel"))
+
+    return log
+
+def native_autest(gene_name, threadNumber, replicates, prefix=None, seed=None):
+    ## AU test on the site likelihoods of the shared evaluation
+    log = ["\n## Native AU test"]
+    if not prefix:
+        prefix = gene_name
+    with PfOps.measure("step", "native AU test"):
+        matrix, weights, index = PtOps.openPatterns(patternPath(gene_name))
+        result = AUOps.auTest(matrix, weights, replicates=replicates, seed=seed, workers=int(threadNumber))
+        AUOps.writeReport(result, prefix + "_Native.au")
+    log.append("# AUOps.auTest(" + patternPath(gene_name) + ", replicates=" + str(replicates) + ", seed=" + str(seed) + ", workers=" + threadNumber + ") > " + prefix + "_Native.au")
+    return log
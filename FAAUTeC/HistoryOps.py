@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+''' Runtime history of FAAUTeC
+
+    The measured runtime of every stage and AU test program of a finished
+    gene is kept with the features of its alignment (taxa, sites, site
+    patterns, trees), the threads, the program version and the model in
+    the SQLite database HISTORY in the folder of --cache_dir; without
+    --cache_dir nothing is kept. For every kind of call and program,
+    log(seconds) is fitted as a linear function of log(units) of
+    PlanOps.COST_UNITS and log(threads). The difference to the fixed cost
+    model is fitted on standardised features with a ridge penalty of
+    PRIOR_WEIGHT, so the cost model counts like PRIOR_WEIGHT runs whatever
+    the scale of the features, and every further gene moves the
+    predictions towards the measured runtimes.
+'''
+
+import os
+import math
+import time
+import sqlite3
+import numpy as np
+
+import PlanOps as PlOps
+import FAAUTeCOps as FOps
+
+HISTORY = "history.sqlite"
+
+COLUMNS = ["recorded", "gene", "kind", "program", "version", "model", "taxa", "sites", "patterns", "trees", "replicates", "threads", "units", "seconds"]
+
+## weight of the fixed cost model in number of runs, see fitRuns()
+PRIOR_WEIGHT = 2.0
+
+## number of runs of the same version and model from which on the runs of
+## other versions and models are left out of a fit
+MIN_RUNS = 5
+
+## number of most recent runs per kind and program which are fitted
+MAX_RUNS = 2000
+
+def openHistory(cache_dir):
+    ''' Open the history in cache_dir and create its table if necessary;
+        None without cache_dir or if it cannot be opened, then the fixed
+        cost model is used '''
+    if not cache_dir:
+        return None
+    history_path = os.path.join(cache_dir, HISTORY)
+    try:
+        os.makedirs(os.path.dirname(history_path), exist_ok=True)
+        connection = sqlite3.connect(history_path, timeout=30)
+        connection.execute("CREATE TABLE IF NOT EXISTS runs ("
+                           "recorded REAL, "
+                           "gene TEXT, "
+                           "kind TEXT NOT NULL, "
+                           "program TEXT NOT NULL, "
+                           "version TEXT, "
+                           "model TEXT, "
+                           "taxa INTEGER, "
+                           "sites INTEGER, "
+                           "patterns INTEGER, "
+                           "trees INTEGER, "
+                           "replicates INTEGER, "
+                           "threads INTEGER, "
+                           "units REAL, "
+                           "seconds REAL)")
+        connection.execute("CREATE INDEX IF NOT EXISTS runs_kind ON runs (kind, program)")
+        connection.commit()
+    except (OSError, sqlite3.Error) as e:
+        print("Warning: the runtime history " + history_path + " cannot be used: " + str(e))
+        return None
+    return connection
+
+def recordRuns(connection, runs):
+    ''' Add the runs of a gene, see FAAUTeCMain.finishGene() '''
+    if connection is None or not runs:
+        return
+    try:
+        with connection:
+            connection.executemany("INSERT INTO runs (" + ','.join(COLUMNS) + ") VALUES (" + ','.join(["?"] * len(COLUMNS)) + ")",
+                                   [tuple([time.time()] + [run[column] for column in COLUMNS[1:]]) for run in runs])
+    except sqlite3.Error as e:
+        print("Warning: runs of " + runs[0]["gene"] + " were not added to the runtime history: " + str(e))
+
+def programVersions(settings):
+    ''' Versions of the programs of a run by program name '''
+    versions = settings["versions"]
+    return {"RAxML": versions.get(settings["raxml_path"]),
+            "IQTree": versions.get(settings["iqtree_path"]),
+            "IQTree2": versions.get(settings["iqtree2_path"])}
+
+def geneRuns(state):
+    ''' The measured runs of a finished gene: the stages ingest and search,
+        the evaluation and every AU test program with its replicates. A
+        stage which restored results from the cache is left out. '''
+    settings = state["settings"]
+    evaluation = state["evaluation"]
+    programs = settings["programs"]
+    profile = state["profile"]
+    scan = {"taxa": len(state["names"]), "sites": evaluation["sites"], "patterns": evaluation["patterns"]}
+    units = PlOps.kindUnits(PlOps.calls(state["gene"], scan, settings))
+    cached = set([entry["stage"] for entry in profile if entry["kind"] == "cache"])
+    walls = dict([(entry["stage"], entry["wall_s"]) for entry in profile if entry["kind"] == "stage"])
+
+    measured = [("ingest", "ingest", "FAAUTeC", walls.get("ingest")),
+                ("search", "search", settings["mlcalc"], walls.get("search")),
+                ("evaluate", "evaluate", FOps.evaluator(programs), evaluation["runtime"])]
+    replicates = dict([((record["program"], record["replicate"]), record["runtime"]) for record in state.get("replicates", [])])
+    for program in programs:
+        seconds = state["runtimes"][program] + sum([runtime for (name, k), runtime in replicates.items() if name == program])
+        measured.append(("autest", program, program, seconds))
+
+    versions = programVersions(settings)
+    runs = []
+    for stage, kind, program, seconds in measured:
+        if seconds is None or stage in cached or (kind, program) not in units:
+            continue
+        runs.append({"gene": state["gene"], "kind": kind, "program": program, "version": versions.get(program), "model": settings["model"],
+                     "taxa": scan["taxa"], "sites": scan["sites"], "patterns": scan["patterns"], "trees": len(settings["constraints"]) + 1,
+                     "replicates": settings["bootstrap_number"], "threads": settings["threads"][stage],
+                     "units": units[(kind, program)], "seconds": seconds})
+    return runs
+
+def fitRuns(runs, prior):
+    ''' Weights of log(seconds) = w0 + w1 * log(units) + w2 * log(threads)
+        for runs of (units, threads, seconds). The difference to prior is
+        fitted on the centred features divided by their standard deviation,
+        where every weight has the same scale as the mean, so the penalty
+        PRIOR_WEIGHT counts like that many runs which agree with prior. '''
+    x = np.array([[1.0, math.log(units), math.log(threads)] for units, threads, seconds in runs])
+    y = np.array([math.log(seconds) for units, threads, seconds in runs])
+    prior = np.asarray(prior, dtype=float)
+    mean = x[:, 1:].mean(axis=0)
+    scale = x[:, 1:].std(axis=0)
+    ## a feature which does not vary leaves its weight at the prior
+    scale[scale < 1e-9] = 1.0
+    z = np.column_stack([np.ones(len(x)), (x[:, 1:] - mean) / scale])
+    delta = np.linalg.solve(z.T @ z + PRIOR_WEIGHT * np.eye(3), z.T @ (y - x @ prior))
+    ## back to the weights of the features which were not standardised
+    slopes = delta[1:] / scale
+    return prior + np.concatenate([[delta[0] - slopes @ mean], slopes])
+
+def fit(connection, versions, model, coefficients):
+    ''' Fit the runs of every kind and program. versions are the versions
+        of the programs of this run by program name; runs of the same
+        version and model are preferred. Returns the weights by (kind,
+        program). '''
+    fitted = {}
+    if connection is None:
+        return fitted
+    try:
+        pairs = connection.execute("SELECT DISTINCT kind, program FROM runs").fetchall()
+        for kind, program in pairs:
+            if kind not in coefficients:
+                continue
+            rows = connection.execute("SELECT version, model, units, threads, seconds FROM runs "
+                                      "WHERE kind = ? AND program = ? AND units > 0 AND threads > 0 AND seconds > 0 "
+                                      "ORDER BY recorded DESC LIMIT ?", (kind, program, MAX_RUNS)).fetchall()
+            same = [row for row in rows if row[0] == versions.get(program) and row[1] == model]
+            if len(same) >= MIN_RUNS:
+                rows = same
+            if rows:
+                ## the fixed cost model: linear in the units and the threads
+                fitted[(kind, program)] = fitRuns([row[2:] for row in rows], [math.log(coefficients[kind]), 1.0, -1.0])
+    except sqlite3.Error as e:
+        print("Warning: the runtime history cannot be read: " + str(e))
+    return fitted
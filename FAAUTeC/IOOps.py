@@ -8,11 +8,10 @@ Custom operations input and output processes
 #####################
 
 import os
+import re
 import datetime
 
 from csv import DictReader
-from Bio.Nexus import Nexus
-from Bio import SeqIO
 
 try:
     from StringIO import StringIO ## for Python 2
@@ -50,40 +49,177 @@ class Inp:
     def __init__(self):
         pass
 
-    def phylip2fasta(self, path_to_phy):
-        ''' This function convert a PHYLIP file to FASTA file. '''
-        phylipFile = open(path_to_phy, "r")
-        alignment = phylipFile.readlines()
-        phylipFile.close()
-        path_to_fasta = path_to_phy.replace(".phy",".fasta")
+    def readAlignment(self, path_to_file):
+        ''' This generator yields the (name, sequence) pairs of a FASTA,
+            PHYLIP or NEXUS file. The file is read line by line and only
+            the current sequence is held in memory, except for interleaved
+            PHYLIP and NEXUS files which have to be collected first. '''
+        ending = path_to_file.split(".")[-1]
+        if ending in ["fasta", "fa"]:
+            return self.readFasta(path_to_file)
+        elif ending == "phy":
+            return self.readPhylip(path_to_file)
+        elif ending == "nex":
+            return self.readNexus(path_to_file)
+        raise ValueError("'" + path_to_file + "' is not in a supported format")
 
+    def readFasta(self, path_to_fasta):
+        name = None
+        seq = []
+        with open(path_to_fasta, "r") as fasta:
+            for line in fasta:
+                line = line.strip()
+                if line.startswith(">"):
+                    if name is not None:
+                        yield name, ''.join(seq)
+                    name = line[1:].split()[0] if line[1:].strip() else ""
+                    seq = []
+                elif line:
+                    seq.append(line.replace(" ", ""))
+        if name is not None:
+            yield name, ''.join(seq)
+
+    def readPhylip(self, path_to_phy):
+        ''' Sequential PHYLIP files are streamed; a sequence may wrap over
+            several lines until it has as many characters as the alignment.
+            If the first sequence is shorter than the alignment, the file is
+            read as interleaved unless it is a valid wrapped sequential
+            file. '''
+        with open(path_to_phy, "r") as phylip:
+            header = phylip.readline().split()
+            taxNumber, charNumber = int(header[0]), int(header[1])
+            lines = (line.strip() for line in phylip)
+            lines = (line for line in lines if line)
+
+            first = next(lines, None)
+            if first is None:
+                return
+            name, seq = self.splitPhylip(first)
+            if len(seq) >= charNumber:
+                yield name, seq
+                for name, seq in self.sequentialPhylip(lines, charNumber):
+                    yield name, seq
+                return
+
+            ## a wrapped sequential file is only known after its last line
+            rest = list(lines)
+            records = list(self.sequentialPhylip(iter([first] + rest), charNumber))
+            if len(records) == taxNumber and all([len(seq) == charNumber for name, seq in records]):
+                for name, seq in records:
+                    yield name, seq
+                return
+
+            ## interleaved: the first block carries the names
+            if len(rest) < taxNumber - 1:
+                raise ValueError("'" + path_to_phy + "' contains less than " + str(taxNumber) + " sequences")
+            names = [name]
+            seqs = [[seq]]
+            for line in rest[:taxNumber - 1]:
+                name, seq = self.splitPhylip(line)
+                names.append(name)
+                seqs.append([seq])
+            for i, line in enumerate(rest[taxNumber - 1:]):
+                seqs[i % taxNumber].append(line.replace(" ", ""))
+            for i in range(taxNumber):
+                yield names[i], ''.join(seqs[i])
+
+    def splitPhylip(self, line):
+        ''' The name and the sequence of the first line of a taxon '''
+        name, seq = line.split(None, 1) if len(line.split()) > 1 else (line, "")
+        return name, seq.replace(" ", "")
+
+    def sequentialPhylip(self, lines, charNumber):
+        ''' Yields the (name, sequence) pairs of sequential PHYLIP lines;
+            the lines after the name are added to a sequence until it has
+            charNumber characters '''
+        for line in lines:
+            name, seq = self.splitPhylip(line)
+            while len(seq) < charNumber:
+                line = next(lines, None)
+                if line is None:
+                    break
+                seq = seq + line.replace(" ", "")
+            yield name, seq
+
+    def readNexus(self, path_to_nex):
+        ''' Reads the MATRIX command of the DATA or CHARACTERS block.
+            Comments in square brackets and quoted names are supported.
+            In a sequential matrix a sequence may wrap over several lines
+            until it has NCHAR characters. '''
+        interleaved = False
+        inMatrix = False
+        charNumber = None
+        order = []
+        seqs = {}
+        name = None
+        seq = []
+        with open(path_to_nex, "r") as nexus:
+            for line in nexus:
+                while "[" in line and "]" in line:
+                    line = line[:line.index("[")] + line[line.index("]") + 1:]
+                line = line.strip()
+                if not line:
+                    continue
+                if not inMatrix:
+                    nchar = re.search(r"nchar\s*=\s*(\d+)", line.lower())
+                    if nchar:
+                        charNumber = int(nchar.group(1))
+                    if line.lower().startswith("format") and "interleave" in line.lower():
+                        interleaved = "interleave=no" not in line.lower().replace(" ", "")
+                    if line.lower().startswith("matrix"):
+                        inMatrix = True
+                    continue
+                end = line.endswith(";")
+                line = line.rstrip(";").strip()
+                if line and not interleaved and name is not None and charNumber and len(''.join(seq)) < charNumber:
+                    ## continuation of a wrapped sequence
+                    seq.append(line.replace(" ", ""))
+                elif line:
+                    if not interleaved and name is not None:
+                        yield name, ''.join(seq)
+                    if line.startswith("'"):
+                        name = line[1:line.index("'", 1)]
+                        rest = line[line.index("'", 1) + 1:]
+                    else:
+                        name, rest = line.split(None, 1) if len(line.split()) > 1 else (line, "")
+                    rest = rest.replace(" ", "")
+                    if interleaved:
+                        if name not in seqs:
+                            order.append(name)
+                            seqs[name] = []
+                        seqs[name].append(rest)
+                    else:
+                        seq = [rest]
+                if end:
+                    break
+        if not interleaved and name is not None:
+            yield name, ''.join(seq)
+        for name in order:
+            yield name, ''.join(seqs[name])
+
+    def normalizeAlignment(self, path_to_file, path_to_fasta):
+        ''' This function reads an alignment in a single pass, removes all
+            sequences which only consist of gaps and writes the rest to a
+            FASTA file. Returns the names of the written sequences and the
+            length of the alignment. '''
+        names = []
+        length = None
+        phylip = path_to_file.split(".")[-1] == "phy"
         with open(path_to_fasta, "w") as fasta:
-            for ali in alignment[1:]:
-                ali = ali.split()
-                fasta.write(">" + ali[0] + "\n")
-                fasta.write(ali[1].replace("N","-") + "\n")
-        return path_to_fasta
-
-    def nexus2fasta(self, path_to_file):
-        ''' This function convert a NEXUS file to FASTA file. '''
-        try:
-            aln = Nexus.Nexus()
-            aln.read(path_to_file)
-            matrix = aln.matrix
-            path_to_file = path_to_file.replace(".nex",".fasta")
-        except Nexus.NexusError as e:
-            print(e)
-            raise
-        except Exception as e:
-            msg = 'ERROR: %s:\n %s' % ('Parsing of '
-            '.nex-file unsuccessful', e)
-            warnings.warn(msg)
-            raise Exception
-        with open(path_to_file, 'w') as fasta:
-            for m in matrix:
-                fasta.write('>' + str(m) + '\n')
-                fasta.write(str(matrix[m]) + '\n')
-        return path_to_file
+            for name, seq in self.readAlignment(path_to_file):
+                if phylip:
+                    seq = seq.replace("N","-")
+                if length is None:
+                    length = len(seq)
+                elif len(seq) != length:
+                    raise ValueError("'" + path_to_file + "': the sequence of " + name + " has " + str(len(seq)) +
+                                     " characters instead of " + str(length))
+                if seq.replace("-","") == "":
+                    continue
+                fasta.write(">" + name + "\n")
+                fasta.write(seq + "\n")
+                names.append(name)
+        return names, length
 
 
 class Outp:
@@ -108,29 +244,48 @@ class Outp:
                 for line in tree:
                     multiTree.write(line)
 
-    def edit_num(self, value):
+    def edit_num(self, value, significant=False, closest=False):
         try:
-            postSigns = ''.join(list(filter(lambda x: x not in "0123456789.-e", value)))
-            postSigns = postSigns.replace("s","\\textsuperscript{s}").replace("*","\\textsuperscript{*}")
+            postSigns = ""
+            if significant:
+                postSigns = postSigns + "\\textsuperscript{*}"
+            if closest:
+                postSigns = postSigns + "\\textsuperscript{s}"
             preSigns = ""
-            value = round(float(value.replace("s","").replace("*","")),3)
+            value = round(float(value),3)
             if value < 0.001:
                 value = 0.001
                 preSigns = preSigns + "<"
             value = preSigns + str(value) + postSigns
-            if "*" in str(value):
+            if significant:
                 return "\\textbf{" + str(value) + "}"
             return value
         except:
-            return str(value)
+            return str(value).replace("_"," ")
 
+    def readCell(self, cell):
+        ''' Split a cell of the csv table into its value and the
+        significance and closest tree marks '''
+        try:
+            return (float(cell.replace("s","").replace("*","")), "*" in cell, "s" in cell)
+        except ValueError:
+            return cell
 
     def createLatex(self, csv, output):
         '''
         This function converts the csv table output to a latex table
         It is optional but creates a more fancy look to present the data
         '''
+        with open(csv, "r") as csvFile:
+            header = csvFile.readline().strip().split(",")
+            rows = [[self.readCell(cell) for cell in line.strip().split(",")] for line in csvFile.readlines()]
+        self.latexTable(header, rows, output)
 
+    def latexTable(self, header, rows, output):
+        '''
+        Write a latex table; p-value cells are tuples of the value, the
+        significance flag and the closest tree flag
+        '''
         latexFile = open(output, "w")
         latexFile.write("\\documentclass[a4paper]{article}\n")
         latexFile.write("\\usepackage[T1]{fontenc}\n")
@@ -142,19 +297,17 @@ class Outp:
         latexFile.write("\\begin{document}\n")
         latexFile.write("%\\footnotesize\n")
         latexFile.write("%\\rowcolors{1}{white}{black!20}\n")
-        with open(csv, "r") as csvFile:
-            line = csvFile.readline()
-            colNum = len(line.split(","))
-            latexFile.write("\\begin{longtable}{|" + ('m{' + str(round(1/colNum,3)) + '\\textwidth}|') * (colNum) + "}\n")
-            latexFile.write("\\caption[]{\\textsuperscript{s}tree with lowest distance to unconstraint tree; \\textsuperscript{*}p-value $\\leq$ 0.01\n}\\\\\n")
-            latexFile.write("\\toprule\n")
-            latexFile.write('&'.join([str(i) for i in line.strip().replace("_"," ").split(",")]) + "\\\\\n")
-            latexFile.write("\\midrule\n")
-            latexFile.write("\\endhead\n")
-            latexFile.write("\\bottomrule\n")
-            latexFile.write("\\endfoot\n")
-            for line in csvFile.readlines():
-                latexFile.write('&'.join([self.edit_num(str(i)) for i in line.strip().replace("_"," ").split(",")]) + "\\\\\n")
+        colNum = len(header)
+        latexFile.write("\\begin{longtable}{|" + ('m{' + str(round(1/colNum,3)) + '\\textwidth}|') * (colNum) + "}\n")
+        latexFile.write("\\caption[]{\\textsuperscript{s}tree with lowest distance to unconstraint tree; \\textsuperscript{*}p-value $\\leq$ 0.01\n}\\\\\n")
+        latexFile.write("\\toprule\n")
+        latexFile.write('&'.join([str(i).replace("_"," ") for i in header]) + "\\\\\n")
+        latexFile.write("\\midrule\n")
+        latexFile.write("\\endhead\n")
+        latexFile.write("\\bottomrule\n")
+        latexFile.write("\\endfoot\n")
+        for row in rows:
+            latexFile.write('&'.join([self.edit_num(*cell) if isinstance(cell, tuple) else self.edit_num(cell) for cell in row]) + "\\\\\n")
         latexFile.write("\\bottomrule\n")
         latexFile.write("\\end{longtable}\n")
         latexFile.write("\\end{document}\n")
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+''' Site patterns of FAAUTeC
+
+    An alignment is held as a uint8 matrix of taxa x sites, and identical
+    columns are collapsed into site patterns weighted by their number of
+    sites. The site likelihoods of identical columns are identical, so the
+    AU tests can resample the patterns with their weights instead of all
+    sites, which are many more for alignments with many identical columns
+    (e.g. plastomes).
+
+    The patterns of an evaluation are stored once in a binary file, which
+    every AU test and replicate maps into memory instead of reading it:
+    a header of MAGIC and the numbers of trees, patterns and sites as
+    little-endian int64, followed by the weights of the patterns, the
+    pattern of every site and the trees x patterns matrix of site
+    log-likelihoods, all little-endian and in C order.
+'''
+
+import os
+import numpy as np
+
+import IOOps as IOOps
+
+def encode(sequences):
+    ''' uint8 matrix of taxa x sites of the upper-case characters '''
+    return np.vstack([np.frombuffer(seq.upper().encode("ascii"), dtype=np.uint8) for seq in sequences])
+
+def compress(matrix):
+    ''' Collapse the identical columns of matrix. Returns the patterns in
+        the order of their first site, the number of sites of every pattern
+        and the pattern of every site. '''
+    columns = np.ascontiguousarray(matrix.T)
+    ## every column as one opaque value, which np.unique compares at once
+    keys = columns.view(np.dtype((np.void, columns.dtype.itemsize * columns.shape[1]))).ravel()
+    unique, first, inverse, weights = np.unique(keys, return_index=True, return_inverse=True, return_counts=True)
+    order = np.argsort(first)
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    return matrix[:, first[order]], weights[order].astype(float), rank[inverse.ravel()]
+
+def sitePatterns(alignment_path):
+    ''' Patterns, weights and site index of an alignment; a .reduced file
+        of RAxML is read as PHYLIP '''
+    if alignment_path.endswith(".reduced"):
+        sequences = IOOps.Inp().readPhylip(alignment_path)
+    else:
+        sequences = IOOps.Inp().readAlignment(alignment_path)
+    return compress(encode([seq for name, seq in sequences]))
+
+def compressSiteLH(matrix, alignment_path=None):
+    ''' Collapse the columns of a trees x sites matrix of site likelihoods
+        into the site patterns of the alignment, or of the .reduced copy
+        of it if RAxML evaluated that one. If neither has the number of
+        sites of the matrix, its own identical columns are collapsed.
+        Returns the matrix, the weights, the pattern of every site and the
+        alignment whose patterns were used, None for its own columns. '''
+    if alignment_path:
+        for path in [alignment_path, alignment_path + ".reduced"]:
+            if not os.path.isfile(path):
+                continue
+            patterns, weights, index = sitePatterns(path)
+            if len(index) == matrix.shape[1]:
+                ## the first site of every pattern
+                first = np.unique(index, return_index=True)[1]
+                return matrix[:, first], weights, index, path
+    patterns, weights, index = compress(matrix)
+    return patterns, weights, index, None
+
+## first bytes of a pattern file, with the version of the layout
+MAGIC = b"FAAUSLH1"
+HEADER_SIZE = len(MAGIC) + 3 * 8
+
+def writePatterns(pattern_path, matrix, weights, index=None):
+    ''' Store a compressed site likelihood matrix with its weights and the
+        pattern of every site; without index every column is one site '''
+    treeNumber, columns = matrix.shape
+    if index is None:
+        index = np.arange(columns)
+    with open(pattern_path, "wb") as patternFile:
+        patternFile.write(MAGIC)
+        patternFile.write(np.array([treeNumber, columns, len(index)], dtype="<i8").tobytes())
+        patternFile.write(np.ascontiguousarray(weights, dtype="<f8").tobytes())
+        patternFile.write(np.ascontiguousarray(index, dtype="<i8").tobytes())
+        patternFile.write(np.ascontiguousarray(matrix, dtype="<f8").tobytes())
+
+def openPatterns(pattern_path):
+    ''' Map a file written by writePatterns() read-only into memory.
+        Returns the matrix, the weights and the pattern of every site;
+        matrix[:, index] are the site likelihoods of all sites. '''
+    with open(pattern_path, "rb") as patternFile:
+        header = patternFile.read(HEADER_SIZE)
+    if len(header) != HEADER_SIZE or header[:len(MAGIC)] != MAGIC:
+        raise ValueError(pattern_path + " is no pattern file of FAAUTeC")
+    treeNumber, columns, siteNumber = [int(i) for i in np.frombuffer(header[len(MAGIC):], dtype="<i8")]
+    size = HEADER_SIZE + 8 * (columns + siteNumber + treeNumber * columns)
+    if os.path.getsize(pattern_path) != size:
+        raise ValueError(pattern_path + " has " + str(os.path.getsize(pattern_path)) + " instead of " + str(size) + " bytes")
+    weights = np.memmap(pattern_path, dtype="<f8", mode="r", offset=HEADER_SIZE, shape=(columns,))
+    index = np.memmap(pattern_path, dtype="<i8", mode="r", offset=HEADER_SIZE + 8 * columns, shape=(siteNumber,))
+    matrix = np.memmap(pattern_path, dtype="<f8", mode="r", offset=HEADER_SIZE + 8 * (columns + siteNumber), shape=(treeNumber, columns))
+    return matrix, weights, index
@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+''' Planning operations of FAAUTeC
+
+    Before a run every alignment is scanned for its number of taxa, sites
+    and site patterns. Every program call of a gene gets a cost from a
+    simple model (COST_UNITS) and COEFFICIENTS, the seconds per unit of
+    every kind of call. The genes are started longest first, so a large
+    alignment does not end up as the last gene of the run, and the wall
+    time of the run is estimated by simulating the stages of the pipeline.
+    With a model fitted to the runtime history (HistoryOps.fit()) the
+    seconds of every kind of call are predicted from it instead, and with
+    --stage_jobs auto the number of genes per stage is chosen by the
+    estimated wall time.
+'''
+
+import csv
+import math
+import heapq
+
+import IOOps as IOOps
+import AUOps as AUOps
+import SeedOps as SdOps
+import PatternOps as PtOps
+import FAAUTeCOps as FOps
+
+## seconds per unit of COST_UNITS on one thread, rough values of RAxML 8,
+## IQ-TREE 1.6 and CONSEL on a current CPU
+COEFFICIENTS = {"ingest": 1e-7,
+                "search": 2e-6,
+                "evaluate": 5e-5,
+                "CONSEL": 2e-9,
+                "IQTree": 5e-5,
+                "IQTree2": 5e-5,
+                "Native": 1e-9}
+
+## number of scales and replicates of CONSEL's makermt
+CONSEL_REPLICATES = 10 * 10000
+
+## units of a program call from the taxa, sites, patterns and trees
+COST_UNITS = {"ingest": lambda scan, trees, replicates: scan["taxa"] * scan["sites"],
+              ## the likelihood of a tree costs taxa * patterns and a
+              ## search needs about taxa rounds of rearrangements
+              "search": lambda scan, trees, replicates: scan["taxa"] ** 2 * scan["patterns"],
+              "evaluate": lambda scan, trees, replicates: trees * scan["taxa"] * scan["patterns"],
+              "CONSEL": lambda scan, trees, replicates: CONSEL_REPLICATES * trees * scan["sites"],
+              "IQTree": lambda scan, trees, replicates: trees * scan["taxa"] * scan["patterns"],
+              "IQTree2": lambda scan, trees, replicates: trees * scan["taxa"] * scan["patterns"],
+              "Native": lambda scan, trees, replicates: len(AUOps.SCALES) * replicates * trees * scan["patterns"]}
+
+COLUMNS = ["order", "gene", "taxa", "sites", "patterns", "hypotheses", "ingest_s", "search_s", "evaluate_s", "autest_s", "total_s"]
+
+def scanGene(alignment_path):
+    ''' Number of taxa, sites and site patterns of an alignment; None if it
+        cannot be read, the ingest stage reports it then '''
+    try:
+        sequences = [seq for name, seq in IOOps.Inp().readAlignment(alignment_path)]
+        patterns, weights, index = PtOps.compress(PtOps.encode(sequences))
+    except (OSError, ValueError, IndexError):
+        return None
+    return {"taxa": len(sequences), "sites": len(index), "patterns": len(weights)}
+
+def calls(gene, scan, settings):
+    ''' The program calls of a gene in the order of the pipeline. Every call
+        has its stage, step, program, executable, seed, the steps it waits
+        for and the kind and units of its cost. '''
+    programs = settings["programs"]
+    mlcalc = settings["mlcalc"]
+    hypotheses = len(settings["constraints"])
+    trees = hypotheses + 1
+    seed = settings["seed"]
+    paths = {"RAxML": settings["raxml_path"], "IQTree": settings["iqtree_path"], "IQTree2": settings["iqtree2_path"],
+             "CONSEL": settings["consel_path"]}
+
+    def call(stage, step, program, kind, after, seed=None):
+        return {"gene": gene, "stage": stage, "step": step, "program": program, "path": paths.get(program),
+                "seed": seed, "after": after, "kind": kind,
+                "units": COST_UNITS[kind](scan, trees, settings["bootstrap_number"])}
+
+    graph = [call("ingest", "normalize alignment", "FAAUTeC", "ingest", [])]
+    seeds = SdOps.treeSeeds(seed, gene, mlcalc, hypotheses)
+    graph.append(call("search", "mltree_unconst", mlcalc, "search", ["normalize alignment"], seeds[0]))
+    ## with --reuse_model the hypotheses wait for the model of the
+    ## unconstrained search
+    after = ["mltree_unconst"] if settings["reuse_model"] else ["normalize alignment"]
+    for i in range(hypotheses):
+        graph.append(call("search", "mltree_hypo" + str(i), mlcalc, "search", after, seeds[i + 1]))
+    program = FOps.evaluator(programs)
+    graph.append(call("evaluate", "evaluate", program, "evaluate", ["mltree_unconst"] + ["mltree_hypo" + str(i) for i in range(hypotheses)],
+                      SdOps.seed(seed, gene, "evaluate", program)))
+    for program in programs:
+        graph.append(call("autest", "autest_" + program, program, program, ["evaluate"], SdOps.seed(seed, gene, "autest", program)))
+    if settings["replicates"] > 1:
+        for k in range(1, settings["replicates"] + 1):
+            for program in programs:
+                graph.append(call("autest", "autest_" + program + "_rep" + str(k), program, program, ["evaluate"],
+                                  SdOps.seed(seed, gene, "autest", program, k)))
+    return graph
+
+def kindUnits(graph):
+    ''' Units of the calls of a gene summed per kind and program '''
+    units = {}
+    for call in graph:
+        key = (call["kind"], call["program"])
+        units.update({key: units.get(key, 0) + call["units"]})
+    return units
+
+def predict(model, kind, program, units, threads):
+    ''' Seconds of calls of a kind and program with the given units and
+        threads, from the fitted model or else from COEFFICIENTS '''
+    if units <= 0:
+        return 0.0
+    if model and (kind, program) in model:
+        weights = model[(kind, program)]
+        return math.exp(weights[0] + weights[1] * math.log(units) + weights[2] * math.log(threads))
+    return COEFFICIENTS[kind] * units / threads
+
+def estimate(graph, threads, stages, model=None):
+    ''' Estimated wall time of every stage of a gene with its threads. The
+        seconds of each kind are shared by its calls by their units. '''
+    totals = kindUnits(graph)
+    seconds = {}
+    for call in graph:
+        key = (call["kind"], call["program"])
+        if key not in seconds:
+            seconds[key] = predict(model, call["kind"], call["program"], totals[key], threads[call["stage"]])
+        call["seconds"] = seconds[key] * call["units"] / totals[key] if totals[key] else 0.0
+    return [sum([call["seconds"] for call in graph if call["stage"] == stage]) for stage in stages]
+
+def simulate(durations, limits, stages, threads=None, threadNumber=None):
+    ''' Wall time of the pipeline of SchedOps.runPipeline() for tasks with
+        the given seconds per stage, started in the order of durations.
+        Every stage runs at most limits[stage] tasks at once and takes the
+        waiting tasks in the order in which they arrived. With threads and
+        threadNumber a task only starts when its threads are free. '''
+    waiting = [[] for stage in stages]
+    running = [0 for stage in stages]
+    waiting[0] = list(range(len(durations)))
+    need = [min(threads[stage], threadNumber) if threads and threadNumber else 0 for stage in stages]
+    free = threadNumber if threads and threadNumber else 0
+    events = []
+    now = 0.0
+    arrival = 0
+    while True:
+        for s in range(len(stages)):
+            while waiting[s] and running[s] < limits[stages[s]] and free >= need[s]:
+                task = waiting[s].pop(0)
+                running[s] = running[s] + 1
+                free = free - need[s]
+                arrival = arrival + 1
+                heapq.heappush(events, (now + durations[task][s], arrival, task, s))
+        if not events:
+            return now
+        now, order, task, s = heapq.heappop(events)
+        running[s] = running[s] - 1
+        free = free + need[s]
+        if s + 1 < len(stages):
+            waiting[s + 1].append(task)
+
+def longestFirst(durations):
+    ''' Order of the tasks by their total seconds, the longest first;
+        equal tasks keep their order '''
+    return sorted(range(len(durations)), key=lambda i: -sum(durations[i]))
+
+def budgetThreads(threads):
+    ''' Threads of a call of every stage in the budget of the run; the
+        ingest stage only uses the Python process of its gene '''
+    return dict(threads, ingest=1)
+
+def chooseLimits(graphs, threadNumber, stages, model=None, rounds=2):
+    ''' Number of genes per stage with the shortest estimated wall time.
+        Every stage splits threadNumber between its genes; the stages are
+        improved one after another, starting with one gene per stage.
+        Returns the limits and the threads per gene of every stage. '''
+    ## the estimates of a stage only depend on its own threads
+    cache = {}
+    def durations(threads):
+        for count in set(threads.values()):
+            if count not in cache:
+                cache[count] = [estimate(graph, dict([(stage, count) for stage in stages]), stages, model) for graph in graphs]
+        return [[cache[threads[stages[s]]][i][s] for s in range(len(stages))] for i in range(len(graphs))]
+    def wall(limits):
+        threads = dict([(stage, max(1, threadNumber // limits[stage])) for stage in stages])
+        seconds = durations(threads)
+        return simulate([seconds[i] for i in longestFirst(seconds)], limits, stages, budgetThreads(threads), threadNumber)
+
+    limits = dict([(stage, 1) for stage in stages])
+    best = wall(limits)
+    for r in range(rounds):
+        for stage in stages:
+            for limit in range(1, max(1, min(threadNumber, len(graphs))) + 1):
+                candidate = dict(limits)
+                candidate[stage] = limit
+                seconds = wall(candidate)
+                if seconds < best:
+                    best = seconds
+                    limits = candidate
+    return limits, dict([(stage, max(1, threadNumber // limits[stage])) for stage in stages])
+
+def plan(tasks, settings, limits, stages, model=None, threadNumber=None, choose=False):
+    ''' Scan the alignments of tasks and order them longest first. With
+        choose the limits of the stages are chosen as well. The stages
+        share threadNumber threads. Returns the ordered tasks, one row per
+        gene, the program calls, the limits and threads of the stages and
+        the estimated wall times of the given and of the planned order. '''
+    rows = []
+    graphs = []
+    for ali, gene, taskSettings in tasks:
+        scan = scanGene(ali)
+        if scan is None:
+            ## unreadable alignments fail at once in the ingest stage
+            rows.append({"gene": gene, "taxa": None, "sites": None, "patterns": None, "hypotheses": len(settings["constraints"])})
+            graphs.append([])
+            continue
+        rows.append({"gene": gene, "taxa": scan["taxa"], "sites": scan["sites"], "patterns": scan["patterns"],
+                     "hypotheses": len(settings["constraints"])})
+        graphs.append(calls(gene, scan, settings))
+
+    threads = settings["threads"]
+    if choose:
+        limits, threads = chooseLimits([graph for graph in graphs if graph], threadNumber, stages, model)
+    for i in range(len(rows)):
+        rows[i]["seconds"] = estimate(graphs[i], threads, stages, model)
+
+    order = longestFirst([row["seconds"] for row in rows])
+    return {"tasks": [tasks[i] for i in order],
+            "rows": [rows[i] for i in order],
+            "calls": [call for i in order for call in graphs[i]],
+            "stages": stages,
+            "limits": limits,
+            "threads": threads,
+            "learned": sorted(model.keys()) if model else [],
+            "given_s": simulate([row["seconds"] for row in rows], limits, stages, budgetThreads(threads), threadNumber),
+            "planned_s": simulate([rows[i]["seconds"] for i in order], limits, stages, budgetThreads(threads), threadNumber)}
+
+def remaining(runPlan, finished, elapsed):
+    ''' Estimated seconds until the genes which are not in finished are
+        done, from the share of the estimated work which took elapsed '''
+    total = sum([sum(row["seconds"]) for row in runPlan["rows"]])
+    done = sum([sum(row["seconds"]) for row in runPlan["rows"] if row["gene"] in finished])
+    if done <= 0 or total <= 0:
+        return runPlan["planned_s"]
+    return max(0.0, elapsed * (total - done) / done)
+
+def writePlan(runPlan, plan_path):
+    ''' Write the planned order of the genes and their estimates as csv '''
+    with open(plan_path, "w", newline="") as planFile:
+        writer = csv.writer(planFile)
+        writer.writerow(COLUMNS)
+        for i in range(len(runPlan["rows"])):
+            row = runPlan["rows"][i]
+            writer.writerow([i + 1, row["gene"], row["taxa"], row["sites"], row["patterns"], row["hypotheses"]] +
+                            [round(seconds, 3) for seconds in row["seconds"]] + [round(sum(row["seconds"]), 3)])
+
+def report(runPlan):
+    ''' Lines which describe the plan, for the log and --dry_run '''
+    lines = ["Plan of " + str(len(runPlan["rows"])) + " genes, longest first:"]
+    for i in range(len(runPlan["rows"])):
+        row = runPlan["rows"][i]
+        if row["taxa"] is None:
+            lines.append("  " + str(i + 1) + ". " + row["gene"] + ": alignment could not be read")
+            continue
+        lines.append("  " + str(i + 1) + ". " + row["gene"] + ": " + str(row["taxa"]) + " taxa, " + str(row["sites"]) + " sites, " +
+                     str(row["patterns"]) + " site patterns, " + str(row["hypotheses"]) + " hypotheses, estimated " +
+                     ', '.join([runPlan["stages"][s] + " " + str(round(row["seconds"][s], 1)) + " s" for s in range(len(runPlan["stages"]))]))
+    lines.append("Estimated wall time: " + str(round(runPlan["planned_s"], 1)) + " s (" + str(round(runPlan["given_s"], 1)) + " s in the order of the folder)")
+    if runPlan["learned"]:
+        lines.append("Runtimes learned from earlier runs: " + ', '.join([kind if kind == program else kind + " " + program for kind, program in runPlan["learned"]]))
+    return lines
+
+def commandGraph(runPlan):
+    ''' Lines of every program call of the plan with the calls it waits for '''
+    lines = ["Program calls:"]
+    for call in runPlan["calls"]:
+        lines.append("  " + call["gene"] + " " + call["stage"] + " " + call["step"] + ": " + call["program"] +
+                     ("" if call["path"] is None else " (" + str(call["path"]) + ")") +
+                     ("" if call["seed"] is None else ", seed " + str(call["seed"])) +
+                     ("" if not call["after"] else ", after " + ', '.join(call["after"])) +
+                     ", estimated " + str(round(call["seconds"], 2)) + " s")
+    return lines
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+''' Profiling operations of FAAUTeC
+
+    Every stage of a gene, every external program and the in-process steps
+    in between are recorded with their wall time, CPU time, peak memory and
+    block I/O. The records of a process are collected by the stage which
+    ran them and written per gene; the summary combines all genes.
+'''
+
+import os
+import csv
+import json
+import time
+import resource
+
+COLUMNS = ["gene", "stage", "kind", "name", "wall_s", "cpu_user_s", "cpu_system_s", "max_rss_kb", "read_bytes", "write_bytes"]
+
+## records of the current process which were not yet collected
+RECORDS = []
+
+## number of steps in the report of the slowest steps
+REPORT_STEPS = 5
+
+## ru_inblock and ru_oublock count blocks of 512 bytes
+BLOCK_SIZE = 512
+
+def record(kind, name, wall, cpu_user, cpu_system, max_rss_kb=None, read_blocks=0, write_blocks=0):
+    RECORDS.append({"kind": kind,
+                    "name": name,
+                    "wall_s": round(wall, 4),
+                    "cpu_user_s": round(cpu_user, 4),
+                    "cpu_system_s": round(cpu_system, 4),
+                    "max_rss_kb": max_rss_kb,
+                    "read_bytes": read_blocks * BLOCK_SIZE,
+                    "write_bytes": write_blocks * BLOCK_SIZE})
+
+def commandRecord(name, wall, usage):
+    ''' Record an external program from the resource usage of its process '''
+    record("command", name, wall, usage.ru_utime, usage.ru_stime, usage.ru_maxrss, usage.ru_inblock, usage.ru_oublock)
+
+class measure:
+    ''' Record the block of a with statement as one step. Steps measure the
+        calling thread, stages the whole process and its child processes. '''
+
+    def __init__(self, kind, name):
+        self.kind = kind
+        self.name = name
+
+    def usage(self):
+        if self.kind != "stage":
+            return resource.getrusage(getattr(resource, "RUSAGE_THREAD", resource.RUSAGE_SELF))
+        own = resource.getrusage(resource.RUSAGE_SELF)
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return [own.ru_utime + children.ru_utime, own.ru_stime + children.ru_stime,
+                own.ru_inblock + children.ru_inblock, own.ru_oublock + children.ru_oublock]
+
+    def __enter__(self):
+        self.first = len(RECORDS)
+        self.start = time.time()
+        self.before = self.usage()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        wall = time.time() - self.start
+        after = self.usage()
+        if self.kind != "stage":
+            record(self.kind, self.name, wall, after.ru_utime - self.before.ru_utime, after.ru_stime - self.before.ru_stime,
+                   None, after.ru_inblock - self.before.ru_inblock, after.ru_oublock - self.before.ru_oublock)
+        else:
+            ## the peak memory of the programs started in this stage
+            peaks = [entry["max_rss_kb"] for entry in RECORDS[self.first:] if entry["kind"] == "command"]
+            record(self.kind, self.name, wall, after[0] - self.before[0], after[1] - self.before[1],
+                   max(peaks) if peaks else None, after[2] - self.before[2], after[3] - self.before[3])
+        return False
+
+def collect(gene, stage):
+    ''' Remove the records of the current process and assign them to the
+        stage of a gene '''
+    records = RECORDS[:]
+    del RECORDS[:]
+    for entry in records:
+        entry.update({"gene": gene, "stage": stage})
+    return records
+
+def writeGene(records, profile_path):
+    with open(profile_path, "w") as profileFile:
+        json.dump(records, profileFile, indent=1)
+
+def readGenes(profile_paths):
+    records = []
+    for path in profile_paths:
+        if os.path.isfile(path):
+            with open(path) as profileFile:
+                records = records + json.load(profileFile)
+    return records
+
+def aggregate(records):
+    ''' Sum the records of all genes per stage and per step of a stage,
+        the slowest first '''
+    groups = {}
+    for entry in records:
+        if entry["kind"] == "stage":
+            key = (entry["stage"], "stage", "")
+        else:
+            key = (entry["stage"], entry["kind"], entry["name"])
+        group = groups.setdefault(key, {"stage": key[0], "kind": key[1], "name": key[2], "count": 0, "wall_s": 0.0,
+                                        "max_wall_s": 0.0, "cpu_s": 0.0, "max_rss_kb": None, "read_bytes": 0, "write_bytes": 0})
+        group["count"] = group["count"] + 1
+        group["wall_s"] = group["wall_s"] + entry["wall_s"]
+        group["max_wall_s"] = max(group["max_wall_s"], entry["wall_s"])
+        group["cpu_s"] = group["cpu_s"] + entry["cpu_user_s"] + entry["cpu_system_s"]
+        if entry["max_rss_kb"] is not None:
+            group["max_rss_kb"] = max(group["max_rss_kb"] or 0, entry["max_rss_kb"])
+        group["read_bytes"] = group["read_bytes"] + entry["read_bytes"]
+        group["write_bytes"] = group["write_bytes"] + entry["write_bytes"]
+
+    summary = sorted(groups.values(), key=lambda group: -group["wall_s"])
+    for group in summary:
+        group.update({"mean_wall_s": round(group["wall_s"] / group["count"], 4),
+                      "wall_s": round(group["wall_s"], 4),
+                      "cpu_s": round(group["cpu_s"], 4)})
+    return summary
+
+def writeSummary(records, summary_dir):
+    ''' Write all records as JSON and csv and the aggregated report.
+        Returns the report lines of the slowest stages and steps. '''
+    with open(os.path.join(summary_dir, "profile.json"), "w") as profileFile:
+        json.dump(records, profileFile, indent=1)
+    with open(os.path.join(summary_dir, "profile.csv"), "w") as profileFile:
+        writer = csv.DictWriter(profileFile, fieldnames=COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(records)
+
+    summary = aggregate(records)
+    columns = ["stage", "kind", "name", "count", "wall_s", "mean_wall_s", "max_wall_s", "cpu_s", "max_rss_kb", "read_bytes", "write_bytes"]
+    with open(os.path.join(summary_dir, "profile_summary.csv"), "w") as summaryFile:
+        writer = csv.DictWriter(summaryFile, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(summary)
+
+    report = ["Slowest stages:"]
+    for group in [group for group in summary if group["kind"] == "stage"]:
+        report.append("  " + group["stage"] + ": " + str(group["wall_s"]) + " s wall, " + str(group["cpu_s"]) + " s CPU over " +
+                      str(group["count"]) + " genes, slowest gene " + str(group["max_wall_s"]) + " s")
+    report.append("Slowest steps:")
+    for group in [group for group in summary if group["kind"] != "stage"][:REPORT_STEPS]:
+        report.append("  " + group["stage"] + " / " + group["name"] + ": " + str(group["wall_s"]) + " s wall, " + str(group["cpu_s"]) + " s CPU in " +
+                      str(group["count"]) + " calls" + (", peak memory " + str(group["max_rss_kb"]) + " KB" if group["max_rss_kb"] is not None else ""))
+    return report
@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+''' Work queue of FAAUTeC
+
+    A coordinator puts one unit per gene into a SQLite database in the
+    output folder of a run, and any number of workers on any number of
+    hosts which see the folder under the same path take units, process
+    them and put the results back. A worker keeps a heartbeat for the unit
+    it is running; a unit whose heartbeat is older than LEASE seconds is
+    taken over by the next free worker, so the genes of a lost worker are
+    not lost; a unit which was claimed MAX_ATTEMPTS times is given up.
+    The folder has to be on a file system with working POSIX locks (e.g.
+    NFSv4), which SQLite needs. The settings of the job are stored as JSON,
+    so a worker never runs code it reads from the shared folder.
+'''
+
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import threading
+
+import CacheOps as CaOps
+
+QUEUE = "output/SUMMARY/queue.sqlite"
+
+## seconds after which a unit without heartbeat is given to another worker
+LEASE = 120
+
+## seconds between two looks at the queue of an idle worker or coordinator
+POLL = 2
+
+## number of times a unit is claimed before it counts as failed
+MAX_ATTEMPTS = 3
+
+def openQueue(queue_path=QUEUE):
+    ''' Open the queue and create its tables if necessary '''
+    connection = sqlite3.connect(queue_path, timeout=60, isolation_level=None)
+    connection.execute("CREATE TABLE IF NOT EXISTS job (id INTEGER PRIMARY KEY, settings TEXT)")
+    connection.execute("CREATE TABLE IF NOT EXISTS units ("
+                       "gene TEXT PRIMARY KEY, "
+                       "alignment TEXT, "
+                       "status TEXT, "
+                       "worker TEXT, "
+                       "attempts INTEGER DEFAULT 0, "
+                       "heartbeat REAL, "
+                       "result TEXT, "
+                       "error TEXT)")
+    return connection
+
+def workerName():
+    return socket.gethostname() + ":" + str(os.getpid()) + ":" + uuid.uuid4().hex[:8]
+
+def dumpSettings(settings):
+    ''' JSON of the settings; the result cache is stored as its folder
+        and size and the taxa of the constraint trees as lists '''
+    cache = settings["cache"]
+    if cache is not None:
+        cache = {"cache_dir": cache.cache_dir,
+                 "max_size": cache.max_size / (1024.0 * 1024.0),
+                 "versions": cache.versions}
+    constraints = [dict(constraint, taxa=sorted(constraint["taxa"])) for constraint in settings["constraints"]]
+    return json.dumps(dict(settings, cache=cache, constraints=constraints))
+
+def loadSettings(text):
+    settings = json.loads(text)
+    if settings["cache"] is not None:
+        settings["cache"] = CaOps.ResultCache(**settings["cache"])
+    for constraint in settings["constraints"]:
+        constraint["taxa"] = set(constraint["taxa"])
+    return settings
+
+def submit(connection, settings, tasks):
+    ''' Replace the job and the units of the queue. tasks is a list of
+        (alignment, gene); units of an earlier job are dropped, their
+        workers lose the ownership and their results are ignored. '''
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        connection.execute("DELETE FROM job")
+        connection.execute("DELETE FROM units")
+        connection.execute("INSERT INTO job (id, settings) VALUES (1, ?)", (dumpSettings(settings),))
+        connection.executemany("INSERT INTO units (gene, alignment, status) VALUES (?, ?, 'pending')",
+                               [(gene, alignment) for alignment, gene in tasks])
+        connection.execute("COMMIT")
+    except sqlite3.Error:
+        connection.execute("ROLLBACK")
+        raise
+
+def settings(connection):
+    ''' The settings of the job, None if nothing was submitted '''
+    row = connection.execute("SELECT settings FROM job WHERE id = 1").fetchone()
+    if row is None:
+        return None
+    return loadSettings(row[0])
+
+def claim(connection, worker, lease=None, attempts=None):
+    ''' Take the next pending unit, or a running one whose worker stopped
+        sending heartbeats. A unit of a lost worker which was already
+        claimed attempts times is marked as failed instead. Returns (gene,
+        alignment) or None. '''
+    if lease is None:
+        lease = LEASE
+    if attempts is None:
+        attempts = MAX_ATTEMPTS
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        connection.execute("UPDATE units SET status = 'failed', error = ? "
+                           "WHERE status = 'running' AND heartbeat < ? AND attempts >= ?",
+                           ("its worker was lost " + str(attempts) + " times", time.time() - lease, attempts))
+        row = connection.execute("SELECT gene, alignment FROM units WHERE status = 'pending' "
+                                 "OR (status = 'running' AND heartbeat < ?) ORDER BY rowid LIMIT 1",
+                                 (time.time() - lease,)).fetchone()
+        if row is not None:
+            connection.execute("UPDATE units SET status = 'running', worker = ?, heartbeat = ?, "
+                               "attempts = attempts + 1 WHERE gene = ?", (worker, time.time(), row[0]))
+        connection.execute("COMMIT")
+    except sqlite3.Error:
+        connection.execute("ROLLBACK")
+        raise
+    if row is None:
+        return None
+    return row[0], row[1]
+
+def complete(connection, gene, worker, result):
+    ''' Store the result of a unit, None for a skipped gene. Returns False
+        if another worker took the unit over in the meantime. '''
+    status = "done" if result is not None else "failed"
+    cursor = connection.execute("UPDATE units SET status = ?, result = ?, heartbeat = ? "
+                                "WHERE gene = ? AND worker = ? AND status = 'running'",
+                                (status, json.dumps(result), time.time(), gene, worker))
+    return cursor.rowcount == 1
+
+def fail(connection, gene, worker, error):
+    ''' Mark a unit as failed with the error which stopped it. Returns
+        False if another worker took the unit over in the meantime. '''
+    cursor = connection.execute("UPDATE units SET status = 'failed', result = ?, error = ?, heartbeat = ? "
+                                "WHERE gene = ? AND worker = ? AND status = 'running'",
+                                (json.dumps(None), error, time.time(), gene, worker))
+    return cursor.rowcount == 1
+
+def abandon(connection, error):
+    ''' Mark all pending and running units as failed, e.g. when no worker
+        is left to process them '''
+    connection.execute("UPDATE units SET status = 'failed', error = ?, heartbeat = ? "
+                       "WHERE status IN ('pending', 'running')", (error, time.time()))
+
+def collect(connection):
+    ''' Results of the finished units which were not collected before, as
+        (gene, result, error); the result of a failed unit is None and its
+        error may say why. The units are marked as merged. '''
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        rows = connection.execute("SELECT gene, result, error FROM units "
+                                  "WHERE status IN ('done', 'failed') ORDER BY heartbeat").fetchall()
+        connection.executemany("UPDATE units SET status = 'merged' WHERE gene = ?", [(row[0],) for row in rows])
+        connection.execute("COMMIT")
+    except sqlite3.Error:
+        connection.execute("ROLLBACK")
+        raise
+    return [(gene, json.loads(result) if result is not None else None, error) for gene, result, error in rows]
+
+def unfinished(connection):
+    ''' Number of units which are pending or running '''
+    return connection.execute("SELECT COUNT(*) FROM units WHERE status IN ('pending', 'running')").fetchone()[0]
+
+class Heartbeat:
+    ''' Renew the lease of a unit in a background thread while the block of
+        a with statement runs '''
+
+    def __init__(self, queue_path, gene, worker, lease=None):
+        self.queue_path = queue_path
+        self.gene = gene
+        self.worker = worker
+        self.interval = (lease or LEASE) / 4.0
+        self.stop = threading.Event()
+
+    def beat(self):
+        ## the connection of the worker belongs to its main thread
+        connection = sqlite3.connect(self.queue_path, timeout=60)
+        while not self.stop.wait(self.interval):
+            with connection:
+                connection.execute("UPDATE units SET heartbeat = ? WHERE gene = ? AND worker = ?",
+                                   (time.time(), self.gene, self.worker))
+        connection.close()
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.beat, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop.set()
+        self.thread.join()
+        return False
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+''' Reports of IQ-TREE and CONSEL
+
+    The table of the tree tests in an .iqtree report and the table of
+    catpv in a .consel file are read into one record per tree with every
+    statistic the program reported; statistics which are missing are None.
+    The columns are found by their names, so versions with other or more
+    columns (e.g. p-WKH and p-WSH of IQ-TREE's -zw) are read correctly,
+    and reading stops at the end of the table. A report with another
+    number of trees than expected raises ReportError.
+'''
+
+from collections import namedtuple
+
+## one row of a tree test, ordered by the number of the tree
+FIELDS = ["tree", "logL", "deltaL", "obs", "bp", "pp", "kh", "sh", "wkh", "wsh", "elw", "np", "au"]
+TreeTest = namedtuple("TreeTest", FIELDS, defaults=[None] * len(FIELDS))
+
+## column names of the reports and their fields
+IQTREE_COLUMNS = {"logL": "logL", "deltaL": "deltaL", "bp-RELL": "bp", "p-KH": "kh", "p-SH": "sh",
+                  "p-WKH": "wkh", "p-WSH": "wsh", "c-ELW": "elw", "p-AU": "au"}
+CONSEL_COLUMNS = {"obs": "obs", "au": "au", "np": "np", "bp": "bp", "pp": "pp", "kh": "kh", "sh": "sh",
+                  "wkh": "wkh", "wsh": "wsh"}
+
+## GTR rates in the order of IQ-TREE's model string
+PAIRS = ["A-C", "A-G", "A-T", "C-G", "C-T", "G-T"]
+
+class ReportError(Exception):
+    ''' A report could not be read or does not contain the expected trees '''
+
+    def __init__(self, report_path, reason):
+        self.report_path = report_path
+        Exception.__init__(self, report_path + " " + reason)
+
+def _check(report_path, tests, treeNumber):
+    if not tests:
+        raise ReportError(report_path, "contains no tree test")
+    if treeNumber is not None and len(tests) != treeNumber:
+        raise ReportError(report_path, "contains " + str(len(tests)) + " instead of " + str(treeNumber) + " trees")
+    if sorted([test.tree for test in tests]) != list(range(1, len(tests) + 1)):
+        raise ReportError(report_path, "does not number its trees from 1 to " + str(len(tests)))
+    return sorted(tests, key=lambda test: test.tree)
+
+def readIQTree(report_path, treeNumber=None):
+    ''' Read the USER TREES table of an .iqtree report. Returns a list of
+        TreeTest, the first one is the unconstrained tree. '''
+    tests = []
+    with open(report_path) as report:
+        for line in report:
+            if line.startswith("Tree ") and "logL" in line:
+                header = line.split()[1:]
+                break
+        else:
+            raise ReportError(report_path, "contains no table of tree tests")
+        ## the line of dashes below the header
+        report.readline()
+        for line in report:
+            fields = line.split()
+            if not fields:
+                break
+            ## every test statistic is followed by its + or - sign
+            values = fields[1:3] + [fields[i] for i in range(3, len(fields), 2)]
+            if len(values) != len(header):
+                raise ReportError(report_path, "has a malformed line: " + line.strip())
+            try:
+                tests.append(TreeTest(tree=int(fields[0]), **dict([(IQTREE_COLUMNS[header[i]], float(values[i]))
+                                                                   for i in range(len(header)) if header[i] in IQTREE_COLUMNS])))
+            except ValueError:
+                raise ReportError(report_path, "has a malformed line: " + line.strip())
+    return _check(report_path, tests, treeNumber)
+
+def readConsel(report_path, treeNumber=None):
+    ''' Read the table of catpv. Returns a list of TreeTest ordered by the
+        number of the tree, the first one is the unconstrained tree. '''
+    tests = []
+    with open(report_path) as report:
+        for line in report:
+            if line.startswith("# rank"):
+                header = line.replace("|", " ").split()[1:]
+                break
+        else:
+            raise ReportError(report_path, "contains no table of tree tests")
+        for line in report:
+            fields = line.replace("|", " ").split()
+            if len(fields) < 2 or fields[0] != "#":
+                break
+            fields = fields[1:]
+            if len(fields) != len(header):
+                raise ReportError(report_path, "has a malformed line: " + line.strip())
+            try:
+                tests.append(TreeTest(tree=int(fields[header.index("item")]), **dict([(CONSEL_COLUMNS[header[i]], float(fields[i]))
+                                                                                     for i in range(len(header)) if header[i] in CONSEL_COLUMNS])))
+            except ValueError:
+                raise ReportError(report_path, "has a malformed line: " + line.strip())
+    return _check(report_path, tests, treeNumber)
+
+def au(tests):
+    ''' AU p-values of the hypotheses, without the unconstrained tree '''
+    return [test.au for test in tests[1:]]
+
+def readIQTreeModel(iqtree_path):
+    ''' The fitted GTR+I+G model of an IQ-TREE report with fixed parameters,
+        e.g. GTR{1.2,3.4,0.9,1.1,4.2}+F+I{0.12}+G{0.57}; None if the report
+        has no fitted model '''
+    rates = {}
+    pinv = None
+    alpha = None
+    with open(iqtree_path,"r") as iqtree_out:
+        for line in iqtree_out:
+            fields = line.split()
+            if len(fields) == 2 and fields[0][:-1] in PAIRS and fields[0][-1] == ":":
+                rates[fields[0][:-1]] = float(fields[1])
+            elif line.startswith("Proportion of invariable sites:"):
+                pinv = float(fields[-1])
+            elif line.startswith("Gamma shape alpha:"):
+                alpha = float(fields[-1])
+            elif line.startswith("MAXIMUM LIKELIHOOD TREE") or line.startswith("USER TREES"):
+                ## the model is described before the trees
+                break
+    if len(rates) != len(PAIRS) or pinv is None or alpha is None:
+        return None
+    ## IQ-TREE takes five rates relative to G-T
+    return ("GTR{" + ','.join([str(round(rates[pair] / rates["G-T"], 6)) for pair in PAIRS[:5]]) + "}+F" +
+            "+I{" + str(pinv) + "}+G{" + str(alpha) + "}")
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+''' Checkpoint operations of FAAUTeC
+
+    The fingerprint of a run and one record per finished gene are kept in
+    the tables run and manifest of the results store (StoreOps), so a
+    finished gene only adds its own row instead of rewriting all results.
+    A gene only counts as finished if all its trees and reports can be
+    read, so a file which was cut off by a crash is computed again.
+'''
+
+import os
+import json
+import hashlib
+
+import AUOps as AUOps
+import ReportOps as RpOps
+import FAAUTeCOps as FOps
+
+def fingerprint(settings):
+    ''' The settings which have to stay the same between a run and its
+        resumption: everything that changes the trees or p-values of a
+        gene, with a hash of the constraint trees instead of the trees '''
+    digest = hashlib.sha256()
+    for constraint in settings["constraints"]:
+        digest.update(constraint["newick"].encode("utf-8") + b"\0")
+    paths = {"RAxML": settings["raxml_path"], "IQTree": settings["iqtree_path"], "IQTree2": settings["iqtree2_path"],
+             "CONSEL": settings["consel_path"]}
+    return {"ml_inference": settings["mlcalc"],
+            "au_inference": settings["programs"],
+            "model": settings["model"],
+            "constraints": digest.hexdigest(),
+            "hypotheses": len(settings["constraints"]),
+            "alpha_level": settings["alpha_level"],
+            "outgroup": settings["outgroup"],
+            "reuse_model": settings["reuse_model"],
+            "replicates": settings["replicates"],
+            "seed": settings["seed"],
+            "bootstrap_number": settings["bootstrap_number"],
+            "versions": dict([(program, settings["versions"].get(path)) for program, path in sorted(paths.items())
+                              if program == settings["mlcalc"] or program in settings["programs"]])}
+
+def openManifest(connection, run):
+    ''' Read the manifest of an earlier run from the results store, or
+        start one for run. Returns False if the settings of the earlier run
+        differ from the current ones. '''
+    with connection:
+        connection.execute("CREATE TABLE IF NOT EXISTS run (id INTEGER PRIMARY KEY, fingerprint TEXT)")
+        connection.execute("CREATE TABLE IF NOT EXISTS manifest (gene TEXT PRIMARY KEY, result TEXT)")
+        row = connection.execute("SELECT fingerprint FROM run WHERE id = 1").fetchone()
+        if row is None:
+            connection.execute("INSERT INTO run (id, fingerprint) VALUES (1, ?)", (json.dumps(run, sort_keys=True),))
+        elif json.loads(row[0]) != json.loads(json.dumps(run)):
+            return False
+    genes = dict([(gene, json.loads(result)) for gene, result in connection.execute("SELECT gene, result FROM manifest")])
+    return {"run": run, "genes": genes}
+
+def recordGene(connection, manifest, result):
+    ''' Add a finished gene to the manifest; only its own row is written '''
+    manifest["genes"].update({result["gene"]:result})
+    with connection:
+        connection.execute("INSERT OR REPLACE INTO manifest (gene, result) VALUES (?, ?)", (result["gene"], json.dumps(result)))
+
+def keepGenes(connection, manifest, keep):
+    ''' Remove the genes which are not in keep from the manifest '''
+    manifest["genes"] = dict(keep)
+    with connection:
+        for (gene,) in connection.execute("SELECT gene FROM manifest").fetchall():
+            if gene not in keep:
+                connection.execute("DELETE FROM manifest WHERE gene = ?", (gene,))
+
+def checkArtifact(path, treeNumber):
+    ''' Read an artifact of a finished gene; raises ReportError or
+        ValueError if it is incomplete '''
+    if path.endswith(".consel"):
+        RpOps.readConsel(path, treeNumber)
+    elif path.endswith(".iqtree"):
+        RpOps.readIQTree(path, treeNumber)
+    elif path.endswith(".au"):
+        if len(AUOps.readAU(path)) != treeNumber - 1:
+            raise ValueError(path + " does not contain " + str(treeNumber - 1) + " p-values")
+    elif path.endswith(".sitelh"):
+        if AUOps.readSiteLH(path).shape[0] != treeNumber:
+            raise ValueError(path + " does not contain " + str(treeNumber) + " trees")
+    else:
+        with open(path) as treeFile:
+            newick = treeFile.read().strip()
+        if not newick.endswith(";"):
+            raise ValueError(path + " does not end with ';'")
+        FOps.parseNewick(newick)
+
+def finishedGenes(manifest, geneDirs, treeNumber):
+    ''' Return the genes of the manifest whose artifacts can all be read.
+        geneDirs maps a gene to its output folder, treeNumber is the
+        number of trees of a gene including the unconstrained one. '''
+    finished = {}
+    for gene, result in manifest["genes"].items():
+        if gene not in geneDirs:
+            continue
+        try:
+            for path in result["files"]:
+                checkArtifact(os.path.normpath(os.path.join(geneDirs[gene], path)), treeNumber)
+        except (RpOps.ReportError, ValueError, IOError) as e:
+            print(gene + " is computed again: " + str(e))
+            continue
+        finished.update({gene:result})
+    return finished
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+''' Scheduling operations of FAAUTeC '''
+
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+def splitThreads(threadNumber, jobs, taskNumber):
+    ''' Distribute the thread budget over the concurrently running tasks,
+        so that jobs * threads never exceeds threadNumber. '''
+    jobs = max(1, min(jobs, threadNumber, taskNumber))
+    return jobs, max(1, threadNumber // jobs)
+
+def stageLimits(jobs, spec, stages):
+    ''' Concurrency limit of every stage. All stages get jobs unless spec
+        sets them, e.g. "search=2,autest=4". '''
+    limits = dict([(stage, max(1, jobs)) for stage in stages])
+    if spec:
+        for part in spec.split(","):
+            try:
+                stage, limit = part.split("=")
+                stage = stage.strip()
+                limit = int(limit)
+            except ValueError:
+                raise ValueError("'" + part + "' is not of the form stage=number")
+            if stage not in limits:
+                raise ValueError("unknown stage '" + stage + "', the stages are: " + ', '.join(stages))
+            limits.update({stage: max(1, limit)})
+    return limits
+
+def runPipeline(stages, tasks, limits, write, threads=None, threadNumber=None):
+    ''' Pass every task through the stages, a list of (name, function).
+        The first function is called with the task, every later one with
+        the result of the one before; None ends the way of a task. Each
+        stage runs at most limits[name] calls at the same time in a pool of
+        processes, so the stages of different tasks overlap. With threads,
+        the threads of a call of every stage, a call only starts once its
+        threads are free in the budget of threadNumber threads shared by
+        all stages. write() is called in the current process with the last
+        result of every task, or None, in the order in which the tasks
+        finish. '''
+    if len(tasks) <= 1:
+        for task in tasks:
+            state = task
+            for name, function in stages:
+                if state is not None:
+                    state = function(state)
+            write(state)
+        return
+
+    with ProcessPoolExecutor(max_workers=sum([limits[name] for name, function in stages])) as pool:
+        asyncio.run(_pipeline(stages, tasks, limits, write, pool, threads, threadNumber))
+
+async def _pipeline(stages, tasks, limits, write, pool, threads, threadNumber):
+    loop = asyncio.get_running_loop()
+    ## one semaphore per stage is the queue in front of it
+    semaphores = dict([(name, asyncio.Semaphore(limits[name])) for name, function in stages])
+    ## the threads which are not used by a running call of any stage
+    budget = {"free": threadNumber}
+    released = asyncio.Condition()
+
+    async def run(name, function, state):
+        if not threads or not threadNumber:
+            return await loop.run_in_executor(pool, function, state)
+        need = min(threads[name], threadNumber)
+        async with released:
+            await released.wait_for(lambda: budget["free"] >= need)
+            budget["free"] = budget["free"] - need
+        try:
+            return await loop.run_in_executor(pool, function, state)
+        finally:
+            async with released:
+                budget["free"] = budget["free"] + need
+                released.notify_all()
+
+    async def passTask(task):
+        state = task
+        for name, function in stages:
+            async with semaphores[name]:
+                state = await run(name, function, state)
+            if state is None:
+                break
+        write(state)
+
+    await asyncio.gather(*[passTask(task) for task in tasks])
+
+def runThreads(function, tasks, workers):
+    ''' Call function(task) for every task with at most workers calls
+        running at the same time. Meant for functions that mostly wait on
+        an external program. The results keep the order of the tasks. '''
+    if workers <= 1:
+        return [function(task) for task in tasks]
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(function, tasks))
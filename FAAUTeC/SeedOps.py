@@ -0,0 +1,28 @@
+#!/usr/bin/env python
+''' Seeds of FAAUTeC
+
+    Every program call which draws random numbers gets its own seed. It is
+    derived from the seed of the run and the names of the call (gene, tree
+    or step, program and replicate), so a call gets the same seed in every
+    process, worker and resumption of a run, and different calls get
+    different seeds.
+'''
+
+import hashlib
+
+## seed of a run without --seed
+SEED = 1
+
+## RAxML, IQ-TREE and CONSEL accept positive 32 bit integers
+MAX_SEED = 2 ** 31 - 1
+
+def seed(run_seed, *names):
+    ''' The seed of the call described by names, e.g. seed(1, "gene1",
+        "hypo0", "RAxML") '''
+    digest = hashlib.sha256("\0".join([str(run_seed)] + [str(name) for name in names]).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % (MAX_SEED - 1) + 1
+
+def treeSeeds(run_seed, gene, program, constNumber):
+    ''' Seeds of the unconstrained search and of the searches of the
+        hypotheses '''
+    return [seed(run_seed, gene, "unconst", program)] + [seed(run_seed, gene, "hypo" + str(i), program) for i in range(constNumber)]
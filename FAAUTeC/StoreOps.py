@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+''' Results store of FAAUTeC
+
+    The p-values of all genes are kept in a SQLite database with one row
+    per gene, hypothesis and AU test program. The site likelihoods which
+    all AU tests of a gene used are described by one row per gene in the
+    table evaluations, and the p-values of repeated AU tests with their
+    seeds by the table replicates. The table seeds holds the seed of every
+    program call of a gene. The csv tables and the LaTeX export are
+    generated from it.
+'''
+
+import math
+import sqlite3
+
+STORE = "output/SUMMARY/results.sqlite"
+
+COLUMNS = ["gene", "hypothesis", "program", "p_value", "significant", "closest", "loglik", "unconst_loglik", "runtime"]
+
+EVALUATION_COLUMNS = ["gene", "program", "version", "model", "trees", "sites", "patterns", "runtime"]
+
+REPLICATE_COLUMNS = ["gene", "hypothesis", "program", "replicate", "seed", "p_value", "runtime"]
+
+SEED_COLUMNS = ["gene", "step", "program", "seed"]
+
+TABLES = ["results", "evaluations", "replicates", "seeds"]
+
+def openStore(store_path=STORE):
+    ''' Open the results store and create its table if necessary '''
+    connection = sqlite3.connect(store_path)
+    connection.execute("CREATE TABLE IF NOT EXISTS results ("
+                       "gene TEXT NOT NULL, "
+                       "hypothesis INTEGER NOT NULL, "
+                       "program TEXT NOT NULL, "
+                       "p_value REAL, "
+                       "significant INTEGER, "
+                       "closest INTEGER, "
+                       "loglik REAL, "
+                       "unconst_loglik REAL, "
+                       "runtime REAL, "
+                       "PRIMARY KEY (gene, hypothesis, program))")
+    connection.execute("CREATE TABLE IF NOT EXISTS evaluations ("
+                       "gene TEXT PRIMARY KEY, "
+                       "program TEXT, "
+                       "version TEXT, "
+                       "model TEXT, "
+                       "trees INTEGER, "
+                       "sites INTEGER, "
+                       "patterns INTEGER, "
+                       "runtime REAL)")
+    connection.execute("CREATE TABLE IF NOT EXISTS replicates ("
+                       "gene TEXT NOT NULL, "
+                       "hypothesis INTEGER NOT NULL, "
+                       "program TEXT NOT NULL, "
+                       "replicate INTEGER NOT NULL, "
+                       "seed INTEGER, "
+                       "p_value REAL, "
+                       "runtime REAL, "
+                       "PRIMARY KEY (gene, hypothesis, program, replicate))")
+    connection.execute("CREATE TABLE IF NOT EXISTS seeds ("
+                       "gene TEXT NOT NULL, "
+                       "step TEXT NOT NULL, "
+                       "program TEXT NOT NULL, "
+                       "seed INTEGER, "
+                       "PRIMARY KEY (gene, step, program))")
+    connection.commit()
+    return connection
+
+def recordGene(connection, gene, records, evaluation=None, replicates=None, seeds=None):
+    ''' Replace the rows of a gene in one transaction, so the store never
+        holds a partially written gene. '''
+    with connection:
+        for table in TABLES:
+            connection.execute("DELETE FROM " + table + " WHERE gene = ?", (gene,))
+        connection.executemany("INSERT INTO results (" + ','.join(COLUMNS) + ") VALUES (" + ','.join(["?"] * len(COLUMNS)) + ")",
+                               [tuple([record[column] for column in COLUMNS]) for record in records])
+        if evaluation:
+            connection.execute("INSERT INTO evaluations (" + ','.join(EVALUATION_COLUMNS) + ") VALUES (" + ','.join(["?"] * len(EVALUATION_COLUMNS)) + ")",
+                               tuple([gene] + [evaluation[column] for column in EVALUATION_COLUMNS[1:]]))
+        connection.executemany("INSERT INTO replicates (" + ','.join(REPLICATE_COLUMNS) + ") VALUES (" + ','.join(["?"] * len(REPLICATE_COLUMNS)) + ")",
+                               [tuple([record[column] for column in REPLICATE_COLUMNS]) for record in replicates or []])
+        connection.executemany("INSERT INTO seeds (" + ','.join(SEED_COLUMNS) + ") VALUES (" + ','.join(["?"] * len(SEED_COLUMNS)) + ")",
+                               [tuple([record[column] for column in SEED_COLUMNS]) for record in seeds or []])
+
+def genes(connection):
+    ''' Genes ordered by name, so the tables do not depend on the order
+        in which concurrent genes finished '''
+    return [row[0] for row in connection.execute("SELECT DISTINCT gene FROM results ORDER BY gene")]
+
+def keepGenes(connection, keep):
+    ''' Remove all genes which are not in keep '''
+    with connection:
+        for gene in genes(connection):
+            if gene not in keep:
+                for table in TABLES:
+                    connection.execute("DELETE FROM " + table + " WHERE gene = ?", (gene,))
+
+def table(connection, programs, constNumber):
+    ''' The summary as header and rows. Every p-value cell is a tuple of the
+        value, the significance flag and the closest tree flag. '''
+    header = ["gene"] + [program + "_hypo" + str(i) for i in range(constNumber) for program in programs] + ["runtime_" + program for program in programs] + ["runtime_evaluation"]
+    rows = []
+    for gene in genes(connection):
+        values = {}
+        runtimes = {}
+        for hypothesis, program, p_value, significant, closest, runtime in connection.execute(
+                "SELECT hypothesis, program, p_value, significant, closest, runtime FROM results WHERE gene = ?", (gene,)):
+            values.update({(hypothesis, program): (p_value, bool(significant), bool(closest))})
+            runtimes.update({program: runtime})
+        ## the evaluation which all programs share has its own runtime
+        evaluation = connection.execute("SELECT runtime FROM evaluations WHERE gene = ?", (gene,)).fetchone()
+        rows.append([gene] +
+                    [values.get((i, program), (None, False, False)) for i in range(constNumber) for program in programs] +
+                    [runtimes.get(program) for program in programs] +
+                    [evaluation[0] if evaluation else None])
+    return header, rows
+
+def writeTable(connection, csv_path, programs, constNumber):
+    ''' Write the summary as csv table; significant p-values are marked
+        with '*' and the tree closest to the unconstrained tree with 's' '''
+    header, rows = table(connection, programs, constNumber)
+    with open(csv_path, "w") as csvFile:
+        csvFile.write(','.join(header) + "\n")
+        for row in rows:
+            cells = [row[0]]
+            for cell in row[1:]:
+                if isinstance(cell, tuple):
+                    value, significant, closest = cell
+                    cells.append(str(value) + ("*" if significant else "") + ("s" if closest else ""))
+                else:
+                    cells.append(str(cell))
+            csvFile.write(','.join(cells) + "\n")
+
+def replicateSummary(connection, programs, constNumber):
+    ''' Number, mean, standard deviation, minimum and maximum of the
+        p-values of the replicates per gene, program and hypothesis '''
+    rows = []
+    for gene in genes(connection):
+        for program in programs:
+            for i in range(constNumber):
+                values = [row[0] for row in connection.execute("SELECT p_value FROM replicates WHERE gene = ? AND program = ? AND hypothesis = ? "
+                                                               "ORDER BY replicate", (gene, program, i))]
+                if not values:
+                    continue
+                mean = sum(values) / len(values)
+                sd = None
+                if len(values) > 1:
+                    sd = math.sqrt(sum([(value - mean) ** 2 for value in values]) / (len(values) - 1))
+                rows.append([gene, program, "hypo" + str(i), len(values), mean, sd, min(values), max(values)])
+    return rows
+
+def writeReplicates(connection, csv_path, programs, constNumber):
+    ''' Write the summary of the replicates as csv table '''
+    with open(csv_path, "w") as csvFile:
+        csvFile.write("gene,program,hypothesis,replicates,mean,sd,min,max\n")
+        for row in replicateSummary(connection, programs, constNumber):
+            csvFile.write(','.join([str(round(cell, 6)) if isinstance(cell, float) else str(cell) for cell in row]) + "\n")
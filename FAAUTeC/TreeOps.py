@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+''' Bipartition operations of FAAUTeC
+
+    Every tree is encoded as its set of splits. A split is an integer
+    bitmask over a taxon index shared by all trees, normalized so that the
+    first taxon is never part of it, which makes the encoding independent
+    of the rooting. Distances between all trees are then computed at once
+    on a trees x splits matrix of branch lengths.
+'''
+
+import numpy as np
+
+def readSplits(newick, taxonIndex):
+    ''' Return a dictionary split -> branch length of a newick tree.
+        Taxa which are not yet part of taxonIndex are added to it. '''
+    stack = [[]]
+    lengths = {}
+    i = 0
+
+    def readLength(i):
+        length = 0.0
+        ## comments like [&support=100] may stand before the length
+        while i < len(newick) and newick[i] == "[":
+            i = newick.index("]", i) + 1
+        if i < len(newick) and newick[i] == ":":
+            end = i + 1
+            while end < len(newick) and newick[end] not in ",();[":
+                end = end + 1
+            try:
+                length = float(newick[i + 1:end])
+            except ValueError:
+                length = 0.0
+            i = end
+        return length, i
+
+    while i < len(newick):
+        char = newick[i]
+        if char == "(":
+            stack.append([])
+            i = i + 1
+        elif char == ")":
+            mask = 0
+            for child in stack.pop():
+                mask = mask | child
+            i = i + 1
+            ## skip the label of the inner node
+            while i < len(newick) and newick[i] not in ",();:[":
+                i = i + 1
+            length, i = readLength(i)
+            stack[-1].append(mask)
+            lengths.update({len(lengths): (mask, length)})
+        elif char == "[":
+            i = newick.index("]", i) + 1
+        elif char in ",; \t\r\n":
+            i = i + 1
+        else:
+            if char == "'":
+                end = newick.index("'", i + 1) + 1
+                name = newick[i + 1:end - 1]
+            else:
+                end = i
+                while end < len(newick) and newick[end] not in ",():;[":
+                    end = end + 1
+                name = newick[i:end].strip()
+            if name not in taxonIndex:
+                taxonIndex.update({name: len(taxonIndex)})
+            mask = 1 << taxonIndex[name]
+            length, i = readLength(end)
+            stack[-1].append(mask)
+            lengths.update({len(lengths): (mask, length)})
+
+    allTaxa = 0
+    for mask in stack[0]:
+        allTaxa = allTaxa | mask
+    splits = {}
+    for mask, length in lengths.values():
+        ## the edge above the root is kept as the empty split
+        if mask & 1 or mask == allTaxa:
+            mask = allTaxa & ~mask
+        ## the two edges at a bifurcating root are one split when unrooted
+        splits.update({mask: splits.get(mask, 0.0) + length})
+    return splits
+
+def splitMatrix(treeList):
+    ''' Encode all trees over one taxon index. Returns the trees x splits
+        matrix of branch lengths, the presence matrix and a flag per split
+        which is True for splits that separate a single taxon or none. '''
+    taxonIndex = {}
+    trees = [readSplits(tree, taxonIndex) for tree in treeList]
+
+    columns = {}
+    for splits in trees:
+        for mask in splits:
+            if mask not in columns:
+                columns.update({mask: len(columns)})
+
+    lengths = np.zeros((len(trees), len(columns)))
+    present = np.zeros((len(trees), len(columns)), dtype=bool)
+    for i in range(len(trees)):
+        for mask, length in trees[i].items():
+            lengths[i, columns[mask]] = length
+            present[i, columns[mask]] = True
+
+    trivial = np.zeros(len(columns), dtype=bool)
+    for mask, column in columns.items():
+        size = bin(mask).count("1")
+        trivial[column] = size == 1 or size == len(taxonIndex) - 1 or mask == 0
+    return lengths, present, trivial
+
+def distanceMatrices(treeList):
+    ''' Euclidean, Robinson-Foulds and weighted Robinson-Foulds distances
+        between all pairs of trees, as trees x trees matrices. '''
+    lengths, present, trivial = splitMatrix(treeList)
+    diff = lengths[:, None, :] - lengths[None, :, :]
+    return {"euclidean": np.sqrt(np.sum(diff ** 2, axis=2)),
+            "rf": np.sum(present[:, None, ~trivial] != present[None, :, ~trivial], axis=2),
+            "wrf": np.sum(np.abs(diff), axis=2)}
+
+def writeDistances(distances, gene, names):
+    ''' Rows of the distance summary, one per metric and tree '''
+    rows = []
+    for metric in ["euclidean", "rf", "wrf"]:
+        for i in range(len(names)):
+            if metric == "rf":
+                values = [str(int(value)) for value in distances[metric][i]]
+            else:
+                values = [str(round(float(value), 6)) for value in distances[metric][i]]
+            rows.append(gene + "," + metric + "," + names[i] + "," + ','.join(values) + "\n")
+    return rows
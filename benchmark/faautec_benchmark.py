@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+''' Benchmark of FAAUTeC
+
+    Generates synthetic alignments and constraint sets for every
+    combination of the given numbers of taxa, sites, genes and hypotheses,
+    runs FAAUTeC on them with the stand-in programs of standins/ and
+    reports the time of every stage, the part of it which FAAUTeC spends
+    itself outside of the external programs, and the in-process steps.
+    Every run has to produce a p-value for every gene, program and
+    hypothesis. The scaling of these times with every varied dimension is
+    estimated as the exponent of a power law. With --baseline the times are compared to
+    an earlier benchmark.csv and the exit status is 1 if one of them got
+    slower by more than --tolerance.
+
+    Example: python3 benchmark/faautec_benchmark.py --taxa 8,32,128 --sites 1000 --genes 4
+'''
+
+import os
+import sys
+import csv
+import math
+import time
+import random
+import shutil
+import argparse
+import itertools
+import subprocess
+
+BENCHMARK_DIR = os.path.dirname(os.path.realpath(__file__))
+STANDINS = os.path.join(BENCHMARK_DIR, "standins")
+LAUNCHER = os.path.join(os.path.dirname(BENCHMARK_DIR), "scripts", "faautec_launcher_CLI.py")
+
+DIMENSIONS = ["taxa", "sites", "genes", "hypotheses"]
+
+## stages in the order in which a gene passes them
+STAGES = ["ingest", "search", "evaluate", "autest", "write"]
+
+## probability of a substitution on every branch of the simulated tree
+SUBSTITUTION_RATE = 0.05
+
+## share of the taxa which are missing from a gene, so the constraints
+## have to be pruned
+MISSING_TAXA = 0.1
+
+def evolve(sequence, taxa, rng, sequences):
+    ''' Split taxa in two random groups, mutate sequence on both branches
+        and continue until every taxon has its own sequence '''
+    if len(taxa) == 1:
+        sequences[taxa[0]] = sequence
+        return
+    split = rng.randint(1, len(taxa) - 1)
+    for group in [taxa[:split], taxa[split:]]:
+        child = ''.join([rng.choice("ACGT") if rng.random() < SUBSTITUTION_RATE else base for base in sequence])
+        evolve(child, group, rng, sequences)
+
+def writeAlignment(path, taxa, siteNumber, rng):
+    sequences = {}
+    evolve(''.join([rng.choice("ACGT") for i in range(siteNumber)]), rng.sample(taxa, len(taxa)), rng, sequences)
+    with open(path, "w") as outFile:
+        for taxon in taxa:
+            outFile.write(">" + taxon + "\n" + sequences[taxon] + "\n")
+
+def writeConstraints(path, taxa, hypothesisNumber, rng):
+    ''' Every hypothesis constrains one random clade and leaves the other
+        taxa free '''
+    with open(path, "w") as outFile:
+        for i in range(hypothesisNumber):
+            clade = rng.sample(taxa, rng.randint(2, max(2, len(taxa) - 2)))
+            rest = [taxon for taxon in taxa if taxon not in clade]
+            outFile.write("((" + ','.join(clade) + ")," + ','.join(rest) + ");\n")
+
+def writeInput(run_dir, config, rng):
+    ''' Alignments and constraints of one configuration '''
+    taxa = ["taxon" + str(i + 1).zfill(4) for i in range(config["taxa"])]
+    os.makedirs(os.path.join(run_dir, "input", "Alignment"))
+    os.makedirs(os.path.join(run_dir, "input", "Constraint"))
+    for gene in range(config["genes"]):
+        missing = rng.sample(taxa, min(int(len(taxa) * MISSING_TAXA), len(taxa) - 4))
+        writeAlignment(os.path.join(run_dir, "input", "Alignment", "gene" + str(gene + 1).zfill(4) + ".fasta"),
+                       [taxon for taxon in taxa if taxon not in missing], config["sites"], rng)
+    writeConstraints(os.path.join(run_dir, "input", "Constraint", "constraints.tre"), taxa, config["hypotheses"], rng)
+
+def readProfile(summary_path):
+    ''' Wall time per stage, time of the external programs per stage and
+        wall time per in-process step from profile_summary.csv '''
+    stages = {}
+    commands = {}
+    steps = {}
+    with open(summary_path) as summaryFile:
+        for row in csv.DictReader(summaryFile):
+            wall = float(row["wall_s"])
+            if row["kind"] == "stage":
+                stages[row["stage"]] = stages.get(row["stage"], 0) + wall
+            elif row["kind"] == "command":
+                commands[row["stage"]] = commands.get(row["stage"], 0) + wall
+            else:
+                steps[row["name"]] = steps.get(row["name"], 0) + wall
+    return stages, commands, steps
+
+def checkResults(run_dir, config, programs):
+    ''' Reasons why the summary of a run is wrong: every gene needs a
+        p-value between 0 and 1 for every program and hypothesis '''
+    table = os.path.join(run_dir, "output", "SUMMARY", "au_runtime_table.csv")
+    if not os.path.isfile(table):
+        return [table + " is missing"]
+    with open(table) as tableFile:
+        rows = list(csv.DictReader(tableFile))
+    problems = []
+    if len(rows) != config["genes"]:
+        problems.append(str(len(rows)) + " instead of " + str(config["genes"]) + " genes in " + table)
+    for row in rows:
+        for program in programs:
+            for i in range(config["hypotheses"]):
+                cell = row.get(program + "_hypo" + str(i)) or ""
+                try:
+                    value = float(cell.replace("*", "").replace("s", ""))
+                except ValueError:
+                    value = None
+                if value is None or not 0 <= value <= 1:
+                    problems.append(row["gene"] + " has no p-value of " + program + " for hypothesis " + str(i) + ": '" + cell + "'")
+    return problems
+
+def runConfig(config, args, run_dir):
+    ''' Run FAAUTeC on one configuration. Returns the measured times. '''
+    if os.path.isdir(run_dir):
+        shutil.rmtree(run_dir)
+    writeInput(run_dir, config, random.Random(str(args.seed) + str(sorted(config.items()))))
+
+    command = [sys.executable, LAUNCHER,
+               "-a", os.path.join(run_dir, "input", "Alignment") + "/",
+               "-c", os.path.join(run_dir, "input", "Constraint", "constraints.tre"),
+               "--ml_inference", args.ml_inference,
+               "--au_inference", args.au_inference,
+               "--path_raxml", os.path.join(STANDINS, "raxmlHPC"),
+               "--path_iqtree", os.path.join(STANDINS, "iqtree"),
+               "--path_iqtree2", os.path.join(STANDINS, "iqtree2"),
+               "--path_consel", STANDINS,
+               "--thread_number", str(args.thread_number),
+               "--jobs", str(args.jobs),
+               "--bootstrap_number", str(args.bootstrap_number),
+               "--seed", str(args.seed)]
+    start = time.time()
+    with open(os.path.join(run_dir, "faautec.log"), "w") as logFile:
+        ## the stand-ins must not end up in the probes of the user
+        env = dict(os.environ, XDG_CACHE_HOME=os.path.join(run_dir, "user_cache"))
+        status = subprocess.call(command, cwd=run_dir, stdout=logFile, stderr=subprocess.STDOUT, env=env)
+    total = time.time() - start
+    summary = os.path.join(run_dir, "output", "SUMMARY", "profile_summary.csv")
+    if status != 0 or not os.path.isfile(summary):
+        print("Error: FAAUTeC failed on " + configName(config) + ", see " + os.path.join(run_dir, "faautec.log"))
+        return None
+    ## a fast run is only worth reporting if its results are complete
+    problems = checkResults(run_dir, config, args.au_inference.split(";"))
+    if problems:
+        print("Error: wrong results of " + configName(config) + ":\n  " + "\n  ".join(problems))
+        return None
+
+    stages, commands, steps = readProfile(summary)
+    times = {"total_s": total}
+    for stage in STAGES:
+        times[stage + "_s"] = stages.get(stage, 0)
+        ## the time FAAUTeC spends itself in the stage
+        times[stage + "_overhead_s"] = max(0, stages.get(stage, 0) - commands.get(stage, 0))
+    for step, wall in steps.items():
+        times["step " + step + "_s"] = wall
+    return times
+
+def configName(config):
+    return '_'.join([dimension + str(config[dimension]) for dimension in DIMENSIONS])
+
+def scaling(rows, metrics):
+    ''' Exponent b of time ~ size^b for every varied dimension and metric,
+        the median over the groups in which only that dimension varies '''
+    curves = []
+    for dimension in DIMENSIONS:
+        if len(set([row[dimension] for row in rows])) < 2:
+            continue
+        others = [other for other in DIMENSIONS if other != dimension]
+        groups = {}
+        for row in rows:
+            groups.setdefault(tuple([row[other] for other in others]), []).append(row)
+        for metric in metrics:
+            exponents = []
+            for group in groups.values():
+                points = [(math.log(row[dimension]), math.log(row[metric])) for row in group if row.get(metric, 0) > 0]
+                if len(points) < 2:
+                    continue
+                meanX = sum([x for x, y in points]) / len(points)
+                meanY = sum([y for x, y in points]) / len(points)
+                variance = sum([(x - meanX) ** 2 for x, y in points])
+                if variance > 0:
+                    exponents.append(sum([(x - meanX) * (y - meanY) for x, y in points]) / variance)
+            if exponents:
+                exponents.sort()
+                curves.append({"dimension": dimension, "metric": metric, "exponent": round(exponents[len(exponents) // 2], 3),
+                               "values": ' '.join([str(row[dimension]) + ":" + str(round(row[metric], 4))
+                                                   for row in sorted(list(groups.values())[0], key=lambda row: row[dimension]) if metric in row])})
+    return curves
+
+def compare(rows, baseline_path, tolerance):
+    ''' Metrics which are slower than in the baseline by more than the
+        tolerance, as report lines '''
+    baseline = {}
+    with open(baseline_path) as baselineFile:
+        for row in csv.DictReader(baselineFile):
+            baseline[row["config"]] = row
+    slower = []
+    for row in rows:
+        if row["config"] not in baseline:
+            continue
+        for metric, value in row.items():
+            if metric in ["config"] + DIMENSIONS or not baseline[row["config"]].get(metric):
+                continue
+            before = float(baseline[row["config"]][metric])
+            ## times below 10 ms are too noisy to compare
+            if value > before * tolerance and value - before > 0.01:
+                slower.append(row["config"] + " " + metric + ": " + str(round(before, 4)) + " s -> " + str(round(value, 4)) + " s")
+    return slower
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of FAAUTeC with synthetic data and stand-in programs")
+    parser.add_argument('--taxa', type=str, default="8,32", help='comma separated numbers of taxa')
+    parser.add_argument('--sites', type=str, default="500,2000", help='comma separated alignment lengths')
+    parser.add_argument('--genes', type=str, default="4", help='comma separated numbers of genes')
+    parser.add_argument('--hypotheses', type=str, default="3", help='comma separated numbers of constraint trees')
+    parser.add_argument('--ml_inference', type=str, default="RAxML", help="'RAxML' or 'IQTree'")
+    parser.add_argument('--au_inference', type=str, default="CONSEL;IQTree;Native", help="AU test programs as for FAAUTeC")
+    parser.add_argument('--bootstrap_number', type=int, default=1000, help="replicates per scale of the 'Native' AU test")
+    parser.add_argument('--thread_number', type=int, default=1, help='threads of every run')
+    parser.add_argument('--jobs', type=int, default=1, help='genes processed at the same time')
+    parser.add_argument('--repeats', type=int, default=1, help='runs per configuration, the fastest one is reported')
+    parser.add_argument('--seed', type=int, default=1, help='seed of the synthetic data and of the runs')
+    parser.add_argument('--work_dir', type=str, default="benchmark_runs", help='folder of the runs and of the reports')
+    parser.add_argument('--keep', action='store_true', help='keep the output folders of the runs')
+    parser.add_argument('--baseline', type=str, default=None, help='benchmark.csv of an earlier benchmark to compare with')
+    parser.add_argument('--tolerance', type=float, default=1.25, help='ratio to the baseline above which a time counts as slower')
+    args = parser.parse_args()
+
+    work_dir = os.path.abspath(args.work_dir)
+    if not os.path.isdir(work_dir):
+        os.makedirs(work_dir)
+    values = dict([(dimension, [int(value) for value in getattr(args, dimension).split(",")]) for dimension in DIMENSIONS])
+
+    rows = []
+    for combination in itertools.product(*[values[dimension] for dimension in DIMENSIONS]):
+        config = dict(zip(DIMENSIONS, combination))
+        name = configName(config)
+        best = None
+        for repeat in range(args.repeats):
+            times = runConfig(config, args, os.path.join(work_dir, name))
+            if times is None:
+                sys.exit(2)
+            ## the fastest run is the least disturbed one
+            if best is None:
+                best = times
+            else:
+                best = dict([(metric, min(best.get(metric, value), value)) for metric, value in times.items()])
+        if not args.keep:
+            shutil.rmtree(os.path.join(work_dir, name))
+        row = {"config": name}
+        row.update(config)
+        row.update(best)
+        rows.append(row)
+        print(name + ": " + str(round(best["total_s"], 3)) + " s, " +
+              ', '.join([stage + " " + str(round(best[stage + "_s"], 3)) + " s (own " + str(round(best[stage + "_overhead_s"], 3)) + " s)" for stage in STAGES]))
+
+    metrics = ["total_s"] + [stage + "_overhead_s" for stage in STAGES]
+    metrics = metrics + sorted(set([metric for row in rows for metric in row if metric.startswith("step ")]))
+    columns = ["config"] + DIMENSIONS + ["total_s"] + [stage + suffix for stage in STAGES for suffix in ["_s", "_overhead_s"]] + metrics[len(STAGES) + 1:]
+    with open(os.path.join(work_dir, "benchmark.csv"), "w") as csvFile:
+        writer = csv.DictWriter(csvFile, fieldnames=columns, restval=0)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    curves = scaling(rows, metrics)
+    with open(os.path.join(work_dir, "scaling.csv"), "w") as csvFile:
+        writer = csv.DictWriter(csvFile, fieldnames=["dimension", "metric", "exponent", "values"])
+        writer.writeheader()
+        writer.writerows(curves)
+    if curves:
+        print("Scaling (time ~ size^exponent):")
+        for curve in curves:
+            print("  " + curve["dimension"] + " / " + curve["metric"] + ": " + str(curve["exponent"]) + "   " + curve["values"])
+    print("Wrote " + os.path.join(work_dir, "benchmark.csv") + " and " + os.path.join(work_dir, "scaling.csv"))
+
+    if args.baseline:
+        slower = compare(rows, args.baseline, args.tolerance)
+        if slower:
+            print("Slower than " + args.baseline + ":")
+            for line in slower:
+                print("  " + line)
+            sys.exit(1)
+        print("No time is slower than in " + args.baseline + " by more than a factor of " + str(args.tolerance))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+''' Stand-ins of RAxML, IQ-TREE and CONSEL for the benchmark of FAAUTeC
+
+    The executables of this folder take the arguments with which FAAUTeC
+    calls the real programs and write files of the same names and formats:
+    resolved trees with branch lengths which respect the constraint, site
+    log-likelihoods for every tree and site, IQ-TREE reports with a fitted
+    model and a table of p-values, and the CONSEL files and catpv table.
+    The numbers are made up but depend only on the input and the seed, so
+    a benchmark measures FAAUTeC and not the phylogenetic programs.
+'''
+
+import os
+import sys
+import math
+import random
+
+RAXML_VERSION = "This is RAxML version 8.2.12 released by Alexandros Stamatakis on May 2018."
+IQTREE_VERSION = "IQ-TREE multicore version 1.6.12 for Linux 64-bit built Aug 15 2019"
+IQTREE2_VERSION = "IQ-TREE multicore version 2.1.2 COVID-edition for Linux 64-bit built Oct 22 2020"
+
+PAIRS = ["A-C", "A-G", "A-T", "C-G", "C-T", "G-T"]
+
+def option(args, name, default=None):
+    if name in args and args.index(name) + 1 < len(args):
+        return args[args.index(name) + 1]
+    return default
+
+def readAlignment(path):
+    ''' Names and sequences of a FASTA or PHYLIP alignment '''
+    with open(path) as inFile:
+        text = inFile.read()
+    if text.startswith(">"):
+        names = []
+        sequences = []
+        for block in text[1:].split("\n>"):
+            lines = block.split("\n")
+            names.append(lines[0].strip())
+            sequences.append(''.join([line.strip() for line in lines[1:]]))
+        return names, sequences
+    lines = [line for line in text.split("\n") if line.strip()]
+    return [line.split()[0] for line in lines[1:]], [''.join(line.split()[1:]) for line in lines[1:]]
+
+def parseNewick(newick):
+    ''' Topology of a tree as nested lists of names; branch lengths and
+        support values are dropped '''
+    newick = newick.strip().rstrip(";")
+    pos = [0]
+
+    def node():
+        if newick[pos[0]] == "(":
+            children = []
+            pos[0] = pos[0] + 1
+            while True:
+                children.append(node())
+                if newick[pos[0]] == ",":
+                    pos[0] = pos[0] + 1
+                else:
+                    break
+            ## closing bracket
+            pos[0] = pos[0] + 1
+            skip()
+            return children
+        start = pos[0]
+        while pos[0] < len(newick) and newick[pos[0]] not in ",():":
+            pos[0] = pos[0] + 1
+        name = newick[start:pos[0]].strip()
+        skip()
+        return name
+
+    def skip():
+        ## label and branch length behind a node
+        while pos[0] < len(newick) and newick[pos[0]] not in ",()":
+            pos[0] = pos[0] + 1
+
+    return node()
+
+def leaves(tree):
+    if isinstance(tree, str):
+        return [tree]
+    return [leaf for child in tree for leaf in leaves(child)]
+
+def resolve(tree, rng, root=True):
+    ''' Join the children of multifurcations at random until the tree is
+        binary, with a trifurcation at the root '''
+    if isinstance(tree, str):
+        return tree
+    children = [resolve(child, rng, False) for child in tree]
+    while len(children) > (3 if root else 2):
+        i, j = sorted(rng.sample(range(len(children)), 2))
+        joined = [children[i], children[j]]
+        children = [children[k] for k in range(len(children)) if k not in (i, j)] + [joined]
+    return children
+
+def writeNewick(tree, rng):
+    if isinstance(tree, str):
+        return tree + ":" + str(round(rng.uniform(0.001, 0.2), 6))
+    return "(" + ','.join([writeNewick(child, rng) for child in tree]) + ")"
+
+def searchTree(taxa, constraint, rng):
+    ''' A random binary tree of taxa which respects the constraint; taxa
+        which the constraint does not contain are placed at random '''
+    if constraint is None:
+        tree = []
+    else:
+        tree = parseNewick(constraint)
+        if isinstance(tree, str):
+            tree = [tree]
+    present = set(leaves(tree))
+    tree = tree + [taxon for taxon in taxa if taxon not in present]
+    return writeNewick(resolve(tree, rng), rng) + ";"
+
+def addLengths(newick, rng):
+    return writeNewick(parseNewick(newick), rng) + ";"
+
+def readTrees(path):
+    with open(path) as inFile:
+        return [line.strip() for line in inFile if line.strip()]
+
+def siteLH(treeNumber, sequences, rng):
+    ''' Site log-likelihoods of all trees; the first tree is the best one
+        on average and the others differ by site-wise noise. Identical
+        columns get identical values, as with the real programs. '''
+    patterns = {}
+    for column in zip(*sequences):
+        if column not in patterns:
+            base = -rng.uniform(1, 8)
+            patterns[column] = [base] + [base - abs(rng.gauss(0, 0.002 * i)) + rng.gauss(0, 0.05) for i in range(1, treeNumber)]
+    columns = [patterns[column] for column in zip(*sequences)]
+    return [[values[i] for values in columns] for i in range(treeNumber)]
+
+def writeSiteLH(matrix, path, prefix):
+    with open(path, "w") as outFile:
+        outFile.write(str(len(matrix)) + " " + str(len(matrix[0])) + "\n")
+        for i in range(len(matrix)):
+            outFile.write(prefix + str(i + 1) + "\t" + ' '.join(["%.6f" % value for value in matrix[i]]) + "\n")
+
+def readSiteLH(path, header=1):
+    with open(path) as inFile:
+        for i in range(header):
+            inFile.readline()
+        return [[float(value) for value in line.split()[1:]] for line in inFile if line.strip()]
+
+def pValues(matrix):
+    ''' p-values of the normal approximation of the KH test against the
+        best tree '''
+    logliks = [sum(row) for row in matrix]
+    best = matrix[logliks.index(max(logliks))]
+    values = []
+    for row in matrix:
+        diffs = [b - r for b, r in zip(best, row)]
+        mean = sum(diffs) / len(diffs)
+        sd = math.sqrt(sum([(diff - mean) ** 2 for diff in diffs]) * len(diffs) / max(1, len(diffs) - 1))
+        values.append(1.0 if sd == 0 else math.erfc(sum(diffs) / (sd * math.sqrt(2))))
+    return values
+
+def raxml(args):
+    if "-v" in args:
+        print("\n" + RAXML_VERSION + "\n")
+        return 0
+    model_file = option(args, "-R")
+    if model_file and not os.path.isfile(model_file):
+        sys.stderr.write("The model file " + model_file + " does not exist\n")
+        return 1
+    name = option(args, "-n")
+    workDir = option(args, "-w", os.getcwd())
+    rng = random.Random(option(args, "-p", "1") + name)
+    taxa, sequences = readAlignment(option(args, "-s"))
+    siteNumber = len(sequences[0])
+
+    if option(args, "-f") == "g":
+        trees = readTrees(option(args, "-z"))
+        writeSiteLH(siteLH(len(trees), sequences, rng), os.path.join(workDir, "RAxML_perSiteLLs." + name), "tr")
+        with open(os.path.join(workDir, "RAxML_info." + name), "w") as info:
+            info.write("Evaluated " + str(len(trees)) + " trees on " + str(siteNumber) + " sites\n")
+        return 0
+
+    constraint = None
+    if option(args, "-g"):
+        with open(option(args, "-g")) as constFile:
+            constraint = constFile.read()
+    tree = searchTree(taxa, constraint, rng)
+    with open(os.path.join(workDir, "RAxML_bestTree." + name), "w") as outFile:
+        outFile.write(tree + "\n")
+    with open(os.path.join(workDir, "RAxML_info." + name), "w") as info:
+        info.write("Final GAMMA-based Score of best tree " + str(round(-siteNumber * rng.uniform(3, 5), 6)) + "\n")
+    with open(os.path.join(workDir, "RAxML_binaryModelParameters." + name), "wb") as outFile:
+        outFile.write(bytes(rng.getrandbits(8) for i in range(256)))
+    return 0
+
+def writeModel(report, rng):
+    report.write("SUBSTITUTION PROCESS\n--------------------\n\nModel of substitution: GTR+F+I+G4\n\nRate parameter R:\n\n")
+    for pair in PAIRS:
+        report.write("  " + pair + ": " + str(round(rng.uniform(0.5, 5), 4) if pair != "G-T" else 1.0) + "\n")
+    report.write("\nState frequencies: (empirical counts from alignment)\n\n")
+    for base in "ACGT":
+        report.write("  pi(" + base + ") = 0.25\n")
+    report.write("\nModel of rate heterogeneity: Invar+Gamma with 4 categories\n" +
+                 "Proportion of invariable sites: " + str(round(rng.uniform(0, 0.5), 4)) + "\n" +
+                 "Gamma shape alpha: " + str(round(rng.uniform(0.1, 2), 4)) + "\n\n")
+
+def iqtree(args, version):
+    if "-v" in args or "--version" in args:
+        print(version)
+        return 0
+    prefix = option(args, "-pre")
+    rng = random.Random(option(args, "-seed", "1") + prefix)
+    taxa, sequences = readAlignment(option(args, "-s"))
+    siteNumber = len(sequences[0])
+
+    if option(args, "-z") is None:
+        constraint = None
+        if option(args, "-g"):
+            with open(option(args, "-g")) as constFile:
+                constraint = constFile.read()
+        with open(prefix + ".treefile", "w") as outFile:
+            outFile.write(searchTree(taxa, constraint, rng) + "\n")
+        with open(prefix + ".iqtree", "w") as report:
+            report.write(version + "\n\n")
+            writeModel(report, rng)
+            report.write("BEST SCORE FOUND : " + str(round(-siteNumber * rng.uniform(3, 5), 4)) + "\n")
+        with open(prefix + ".log", "w") as log:
+            log.write(' '.join(args) + "\n")
+        return 0
+
+    trees = readTrees(option(args, "-z"))
+    matrix = siteLH(len(trees), sequences, rng)
+    logliks = [sum(row) for row in matrix]
+    au = pValues(matrix)
+    with open(prefix + ".iqtree", "w") as report:
+        report.write(version + "\n\n")
+        writeModel(report, rng)
+        report.write("USER TREES\n----------\n\nSee " + prefix + ".trees for trees with branch lengths.\n\n")
+        report.write("Tree      logL    deltaL  bp-RELL    p-KH     p-SH       c-ELW       p-AU\n")
+        report.write("-" * 73 + "\n")
+        for i in range(len(trees)):
+            report.write("%3d %.4f %7.4f  %.4f +  %.4f +  %.4f +   %.4f +   %.4f + \n" %
+                         (i + 1, logliks[i], max(logliks) - logliks[i], rng.random(), rng.random(), rng.random(), rng.random(), au[i]))
+        report.write("\ndeltaL  : logL difference from the maximal logl in the set.\n")
+    with open(prefix + ".trees", "w") as outFile:
+        for tree in trees:
+            outFile.write(addLengths(tree, rng) + "\n")
+    if "-wsl" in args:
+        writeSiteLH(matrix, prefix + ".sitelh", "Tree")
+    with open(prefix + ".log", "w") as log:
+        log.write(' '.join(args) + "\n")
+    return 0
+
+def consel(program, args):
+    ## the CONSEL programs pass the site log-likelihoods on in their own
+    ## files: .mt -> .rmt -> .pv -> table of catpv
+    if program == "seqmt":
+        with open(args[-2]) as inFile, open(args[-1], "w") as outFile:
+            outFile.write(inFile.read())
+    elif program == "makermt":
+        source = args[-1]
+        with open(source) as inFile, open(source[:-3] + ".rmt", "w") as outFile:
+            outFile.write("# seed " + str(option(args, "-s", "0")) + "\n" + inFile.read())
+    elif program == "consel":
+        source = args[-1]
+        ## the seed of makermt and the header of the site likelihoods
+        matrix = readSiteLH(source, 2)
+        logliks = [sum(row) for row in matrix]
+        with open(source[:-4] + ".pv", "w") as outFile:
+            for i, (loglik, p) in enumerate(zip(logliks, pValues(matrix))):
+                outFile.write(str(i + 1) + " " + repr(max(logliks) - loglik) + " " + repr(p) + "\n")
+    elif program == "catpv":
+        with open(args[-1]) as inFile:
+            rows = [line.split() for line in inFile if line.strip()]
+        rows.sort(key=lambda row: -float(row[2]))
+        print("")
+        print("# reading " + args[-1])
+        print("# rank item    obs     au     np |     bp     pp     kh     sh    wkh    wsh |")
+        for rank, row in enumerate(rows):
+            print("#    %d    %s   %.1f  %.3f  %.3f |  %.3f  %.3f  %.3f  %.3f  %.3f  %.3f |" %
+                  (rank + 1, row[0], float(row[1]), float(row[2]), float(row[2]), 0.5, 0.5, 0.5, 0.5, 0.5, 0.5))
+    return 0
+
+def main(program, args):
+    if program == "raxmlHPC":
+        return raxml(args)
+    if program == "iqtree":
+        return iqtree(args, IQTREE_VERSION)
+    if program == "iqtree2":
+        return iqtree(args, IQTREE2_VERSION)
+    return consel(program, args)
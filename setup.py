@@ -35,12 +35,13 @@ setup(
     license='BSD',
     entry_points={
         'console_scripts': [
-            'FAAUTeC = FAAUTeC.CLIOps:start_faautec'
+            'FAAUTeC = FAAUTeC.CLIOps:start_faautec',
+            'FAAUTeC-worker = FAAUTeC.CLIOps:start_worker'
         ],
     },
     packages=['FAAUTeC'], # So that the subfolder 'FAAUTeC' is read immediately.
     #packages = find_packages(),
-    install_requires=['biopython','dendropy','ete3'],
+    install_requires=['biopython','dendropy','numpy'],
     scripts=glob.glob('scripts/*'),
     test_suite='setup.my_test_suite',
     include_package_data=True,
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+''' Tests of the native AU test of AUOps and the site patterns of
+    PatternOps '''
+
+import os
+import unittest
+import numpy as np
+
+import helper
+import AUOps as AUOps
+import PatternOps as PtOps
+
+def siteLikelihoods(seed=0, sites=400):
+    ''' Three trees: the second one is a little better than the first, the
+        third one is clearly worse '''
+    rng = np.random.default_rng(seed)
+    base = rng.normal(-5.0, 1.0, sites)
+    return np.vstack([base, base + rng.normal(0.02, 0.2, sites), base + rng.normal(-0.1, 0.3, sites)])
+
+class AUTest(unittest.TestCase):
+
+    def testClearCase(self):
+        ## a tree which is worse at every site is always rejected
+        base = np.random.default_rng(1).normal(-5.0, 1.0, 300)
+        result = AUOps.auTest(np.vstack([base, base - 0.5]), replicates=1000, seed=1)
+        np.testing.assert_allclose(result["loglik"], [base.sum(), base.sum() - 150.0])
+        np.testing.assert_allclose(result["obs"], [-150.0, 150.0])
+        for statistic in ["au", "np", "bp", "kh", "sh"]:
+            self.assertEqual(list(result[statistic]), [1.0, 0.0])
+
+    def testSymmetricCase(self):
+        ## two trees which are better at the same number of sites by the
+        ## same amount are equally supported
+        base = np.random.default_rng(2).normal(-5.0, 1.0, 400)
+        shift = np.where(np.arange(400) % 2 == 0, 0.3, -0.3)
+        result = AUOps.auTest(np.vstack([base + shift, base - shift]), replicates=2000, seed=2)
+        self.assertAlmostEqual(result["bp"].sum(), 1.0)
+        self.assertAlmostEqual(result["au"][0], 0.5, delta=0.1)
+        self.assertAlmostEqual(result["au"][1], 0.5, delta=0.1)
+
+    def testRanking(self):
+        result = AUOps.auTest(siteLikelihoods(), replicates=2000, seed=3)
+        self.assertGreater(result["au"][1], 0.5)
+        self.assertLess(result["au"][2], 0.05)
+        self.assertTrue(np.all((result["au"] >= 0) & (result["au"] <= 1)))
+
+    def testSeed(self):
+        ## the same seed gives the same p-values for any number of workers
+        matrix = siteLikelihoods()
+        single = AUOps.auTest(matrix, replicates=2000, seed=4)
+        shared = AUOps.auTest(matrix, replicates=2000, seed=4, workers=2)
+        for statistic in single:
+            np.testing.assert_array_equal(single[statistic], shared[statistic])
+        other = AUOps.auTest(matrix, replicates=2000, seed=5)
+        self.assertFalse(np.array_equal(single["bp"], other["bp"]))
+
+    def testWeightedPatterns(self):
+        ## resampling weighted patterns estimates the same p-values as
+        ## resampling all sites
+        matrix = siteLikelihoods(6)[:, np.random.default_rng(6).integers(0, 60, 600)]
+        patterns, weights, index = PtOps.compress(matrix)
+        self.assertEqual(patterns.shape[1], len(np.unique(index)))
+        np.testing.assert_array_equal(patterns[:, index], matrix)
+        sites = AUOps.auTest(matrix, replicates=4000, seed=7)
+        weighted = AUOps.auTest(patterns, weights, replicates=4000, seed=7)
+        np.testing.assert_allclose(weighted["loglik"], sites["loglik"])
+        np.testing.assert_allclose(weighted["au"], sites["au"], atol=0.05)
+
+class FileTest(helper.FolderTest):
+
+    def testReadSiteLH(self):
+        path = os.path.join(self.dir, "a.sitelh")
+        with open(path, "w") as sitelh:
+            sitelh.write("2 3\ntr1\t-1.5 -2.25 -3\ntr2\t-1.25\n-2.5 -3.5\n")
+        np.testing.assert_array_equal(AUOps.readSiteLH(path), [[-1.5, -2.25, -3.0], [-1.25, -2.5, -3.5]])
+
+    def testReport(self):
+        path = os.path.join(self.dir, "a.au")
+        result = AUOps.auTest(siteLikelihoods(), replicates=1000, seed=8)
+        AUOps.writeReport(result, path)
+        self.assertEqual(AUOps.readAU(path), [round(float(value), 6) for value in result["au"][1:]])
+
+    def testPatternFile(self):
+        matrix = siteLikelihoods(9)[:, np.random.default_rng(9).integers(0, 50, 300)]
+        patterns, weights, index = PtOps.compress(matrix)
+        path = os.path.join(self.dir, "a.patterns.bin")
+        PtOps.writePatterns(path, patterns, weights, index)
+        mapped, mappedWeights, mappedIndex = PtOps.openPatterns(path)
+        np.testing.assert_array_equal(mapped, patterns)
+        np.testing.assert_array_equal(mappedWeights, weights)
+        np.testing.assert_array_equal(mappedIndex, index)
+        ## the workers map the file themselves
+        inMemory = AUOps.auTest(patterns, weights, replicates=2000, seed=10, workers=2)
+        fromFile = AUOps.auTest(mapped, mappedWeights, replicates=2000, seed=10, workers=2)
+        for statistic in inMemory:
+            np.testing.assert_array_equal(inMemory[statistic], fromFile[statistic])
+
+    def testSiteLHPatterns(self):
+        ## the patterns of the alignment, of the .reduced copy which RAxML
+        ## evaluated, or of the site likelihoods if neither has their sites
+        path = os.path.join(self.dir, "a.fasta")
+        with open(path, "w") as fasta:
+            fasta.write(">a\nAACGAA\n>b\nAACTAA\n")
+        matrix = np.array([[1.0, 1.0, 2.0, 3.0, 1.0, 1.0], [4.0, 4.0, 5.0, 6.0, 4.0, 4.0]])
+        patterns, weights, index, source = PtOps.compressSiteLH(matrix, path)
+        self.assertEqual(source, path)
+        np.testing.assert_array_equal(weights, [4, 1, 1])
+        np.testing.assert_array_equal(patterns[:, index], matrix)
+        with open(path + ".reduced", "w") as reduced:
+            reduced.write("2 2\na GG\nb TT\n")
+        patterns, weights, index, source = PtOps.compressSiteLH(matrix[:, [2, 2]], path)
+        self.assertEqual((source, list(weights)), (path + ".reduced", [2]))
+        patterns, weights, index, source = PtOps.compressSiteLH(matrix[:, :5], path)
+        self.assertIsNone(source)
+        np.testing.assert_array_equal(weights, [3, 1, 1])
+
+    def testBrokenPatternFile(self):
+        path = os.path.join(self.dir, "a.patterns.bin")
+        with open(path, "wb") as patternFile:
+            patternFile.write(b"no patterns")
+        with self.assertRaises(ValueError):
+            PtOps.openPatterns(path)
+        PtOps.writePatterns(path, np.zeros((2, 3)), np.ones(3))
+        with open(path, "ab") as patternFile:
+            patternFile.write(b"\0")
+        with self.assertRaises(ValueError):
+            PtOps.openPatterns(path)
+
+if __name__ == '__main__':
+    unittest.main()
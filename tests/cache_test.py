@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+''' Tests of the result cache of CacheOps '''
+
+import os
+import time
+import unittest
+
+import helper
+import CacheOps as CaOps
+import ProfOps as PfOps
+
+class CacheTest(helper.FolderTest):
+
+    chdir = True
+
+    def setUp(self):
+        helper.FolderTest.setUp(self)
+        self.cache = CaOps.ResultCache("cache", 1, {"raxmlHPC": "8.2.12"})
+        with open("input.fasta", "w") as inFile:
+            inFile.write(">a\nACGT\n")
+        self.runs = 0
+
+    def tearDown(self):
+        helper.FolderTest.tearDown(self)
+        PfOps.collect(None, None)
+
+    def search(self):
+        ## the stand-in of a program writes one output file
+        def program():
+            self.runs = self.runs + 1
+            with open("output.tre", "w") as outFile:
+                outFile.write("(a,b);\n")
+            return "ran"
+        return CaOps.cachedRun(self.cache, ["raxmlHPC"], ["mltree", "GTRGAMMA", 1], ["input.fasta"], ["output.tre"], program)
+
+    def testCachedRun(self):
+        self.assertEqual(self.search(), "ran")
+        os.remove("output.tre")
+        self.assertTrue(self.search().startswith("# restored from cache"))
+        self.assertEqual(self.runs, 1)
+        with open("output.tre") as outFile:
+            self.assertEqual(outFile.read(), "(a,b);\n")
+
+    def testKey(self):
+        key = self.cache.key(["raxmlHPC"], ["mltree", 1], ["input.fasta"])
+        self.assertEqual(key, self.cache.key(["raxmlHPC"], ["mltree", 1], ["input.fasta"]))
+        self.assertNotEqual(key, self.cache.key(["raxmlHPC"], ["mltree", 2], ["input.fasta"]))
+        ## another version of the program
+        other = CaOps.ResultCache("cache", 1, {"raxmlHPC": "8.2.13"})
+        self.assertNotEqual(key, other.key(["raxmlHPC"], ["mltree", 1], ["input.fasta"]))
+        ## another content of an input file
+        with open("input.fasta", "a") as inFile:
+            inFile.write(">b\nACGA\n")
+        self.assertNotEqual(key, self.cache.key(["raxmlHPC"], ["mltree", 1], ["input.fasta"]))
+
+    def testCachedTest(self):
+        def test():
+            with open("report.au", "w") as report:
+                report.write("0.25\n")
+            return ["ran"]
+        def parse(path):
+            with open(path) as report:
+                return {"au": [float(report.read())]}
+        log, runtime, values = CaOps.cachedTest(self.cache, [], ["Native", 1], ["input.fasta"], "report.au", test, parse)
+        self.assertEqual((log, values), (["ran"], {"au": [0.25]}))
+        os.remove("report.au")
+        log, cachedRuntime, values = CaOps.cachedTest(self.cache, [], ["Native", 1], ["input.fasta"], "report.au", test, parse)
+        ## the runtime of the test is restored with its values
+        self.assertEqual((cachedRuntime, values), (runtime, {"au": [0.25]}))
+        self.assertTrue(os.path.isfile("report.au"))
+
+    def testEvict(self):
+        ## the least recently used entries go first
+        for i in range(3):
+            with open("output.tre", "w") as outFile:
+                outFile.write("x" * 400000)
+            self.cache.store(self.cache.key([], [i], []), ["output.tre"])
+            time.sleep(0.01)
+        self.cache.fetch(self.cache.key([], [0], []), ["output.tre"])
+        self.assertEqual(self.cache.evict(), 1)
+        self.assertIsNone(self.cache.fetch(self.cache.key([], [1], []), ["output.tre"]))
+        self.assertIsNotNone(self.cache.fetch(self.cache.key([], [0], []), ["output.tre"]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+''' Tests of the pruning of the constraint trees of FAAUTeCOps '''
+
+import os
+import unittest
+
+import helper
+import FAAUTeCOps as FOps
+import ProfOps as PfOps
+
+CONSTRAINTS = "((a,b_c),(d,(e,f)));\n(a,(b_c,\n(d,e)),f);\n"
+
+class NewickTest(unittest.TestCase):
+
+    def testParse(self):
+        ## branch lengths, labels, comments and quotes
+        self.assertEqual(FOps.parseNewick("((a:0.1,'b c':0.2)90:0.3,[&x=1]d);"), [["a", "'b c'"], "d"])
+        self.assertEqual(FOps.treeTaxa(FOps.parseNewick("((a,'b c'),d);")), set(["a", "b c", "d"]))
+        self.assertEqual(FOps.writeNewick(FOps.parseNewick("((a:1,b:2):3,c);")), "((a,b),c)")
+
+    def testUnbalanced(self):
+        for newick in ["((a,b),(c", "(a,b));", "(a,b),(c,d);"]:
+            with self.assertRaises(ValueError):
+                FOps.parseNewick(newick)
+
+class PruneTest(helper.FolderTest):
+
+    def setUp(self):
+        helper.FolderTest.setUp(self)
+        self.constraints = FOps.indexConstraints(FOps.readConstraints(self.write("constraints.txt", CONSTRAINTS)))
+
+    def testIndex(self):
+        ## the trees are unrooted, so the root of the first tree is resolved
+        ## into a trifurcation
+        self.assertEqual([constraint["newick"] for constraint in self.constraints], ["((a,b_c),d,(e,f));", "(a,(b_c,(d,e)),f);"])
+        for constraint in self.constraints:
+            self.assertEqual(constraint["taxa"], set(["a", "b_c", "d", "e", "f"]))
+            self.assertEqual(FOps.writeNewick(constraint["tree"]) + ";", constraint["newick"])
+
+    def testPrune(self):
+        ## a gene with all taxa and more gets the tree unchanged
+        self.assertEqual(FOps.pruneConstraint(self.constraints[0], set(["a", "b_c", "d", "e", "f", "g"])), ("((a,b_c),d,(e,f));", 0))
+        ## a removed leaf takes the node with a single child left with it
+        self.assertEqual(FOps.pruneConstraint(self.constraints[0], set(["a", "b_c", "d", "e"])), ("((a,b_c),d,e);", 1))
+        self.assertEqual(FOps.pruneConstraint(self.constraints[1], set(["a", "d", "e", "f"])), ("(a,(d,e),f);", 1))
+        self.assertEqual(FOps.pruneConstraint(self.constraints[1], set(["g"])), (";", 5))
+        ## pruning does not change the index, which every gene shares
+        self.assertEqual(self.constraints[0]["newick"], "((a,b_c),d,(e,f));")
+
+    def testWriteConstraintFiles(self):
+        os.chdir(self.dir)
+        alignment = self.write("gene.fasta", ">a\nACGT\n>b_c\nACGT\n>d\nACGT\n>e\nACGT\n")
+        constFiles, log = FOps.writeConstraintFiles(alignment, self.constraints)
+        self.assertEqual(constFiles, ["hypo0_rem.txt", "hypo1_rem.txt"])
+        self.assertEqual(log, ["# hypothesis 0: removed Taxa: 1", "# hypothesis 1: removed Taxa: 1"])
+        with open("hypo1_rem.txt") as constFile:
+            self.assertEqual(constFile.read(), "(a,(b_c,(d,e)));\n")
+        PfOps.collect(None, None)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+''' Tests of the execution layer of ExecOps '''
+
+import os
+import sys
+import time
+import shlex
+import unittest
+
+import helper
+import ExecOps as ExOps
+import ProfOps as PfOps
+
+class ExecTest(helper.FolderTest):
+
+    chdir = True
+
+    def tearDown(self):
+        helper.FolderTest.tearDown(self)
+        PfOps.collect(None, None)
+
+    def testRun(self):
+        ## the command is logged as a shell line which repeats the call
+        command = ExOps.run([sys.executable, "-c", "print('tree 1')"], "step")
+        self.assertEqual(shlex.split(command), [sys.executable, "-c", "print('tree 1')"])
+        with open(os.path.join(ExOps.LOG_DIR, "step.log")) as logFile:
+            self.assertEqual(logFile.read().splitlines(), ["$ " + command, "tree 1"])
+        ## the standard output goes to its own file, as with '>'
+        command = ExOps.run([sys.executable, "-c", "print('tree 2')"], "step", "out.txt")
+        self.assertEqual(shlex.split(command)[-2:], [">", "out.txt"])
+        with open("out.txt") as outFile:
+            self.assertEqual(outFile.read(), "tree 2\n")
+        self.assertEqual([record["name"] for record in PfOps.collect(None, None) if record["kind"] == "command"], ["step", "step"])
+
+    def testExitCode(self):
+        with self.assertRaises(ExOps.CommandError) as error:
+            ExOps.run([sys.executable, "-c", "import sys; sys.exit(3)"], "step")
+        self.assertEqual(error.exception.returncode, 3)
+        self.assertEqual(error.exception.log_path, os.path.join(ExOps.LOG_DIR, "step.log"))
+        with self.assertRaises(ExOps.CommandError) as error:
+            ExOps.run([os.path.join(self.dir, "missing")], "step")
+        self.assertEqual(error.exception.returncode, 127)
+
+    def testTimeout(self):
+        ## the program is killed when the timeout is over
+        start = time.time()
+        with self.assertRaises(ExOps.CommandError) as error:
+            ExOps.run([sys.executable, "-c", "import time; time.sleep(30)"], "step", timeout=0.5)
+        self.assertLess(time.time() - start, 10)
+        self.assertIsNone(error.exception.returncode)
+        self.assertIn("timeout", str(error.exception))
+
+    def testSignal(self):
+        ## a program killed by a signal reports the negative signal
+        with self.assertRaises(ExOps.CommandError) as error:
+            ExOps.run([sys.executable, "-c", "import os, signal; os.kill(os.getpid(), signal.SIGTERM)"], "step")
+        self.assertEqual(error.exception.returncode, -15)
+
+    def testFiles(self):
+        for name in ["a.tre", "b.tre"]:
+            self.write(name, name + "\n")
+        self.assertEqual(ExOps.concat(["a.tre", "b.tre"], "all.tre"), "cat a.tre b.tre > all.tre")
+        with open("all.tre") as treeFile:
+            self.assertEqual(treeFile.read(), "a.tre\nb.tre\n")
+        ExOps.makedirs("out")
+        ExOps.move("*.tre", "out")
+        self.assertEqual(sorted(os.listdir("out")), ["a.tre", "all.tre", "b.tre"])
+        ExOps.rename("out/a.tre", "out/c.tre")
+        self.assertEqual(sorted(os.listdir("out")), ["all.tre", "b.tre", "c.tre"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+''' Shared set-up of the tests
+
+    The modules of FAAUTeC are imported from its folder, and the cache of
+    the user (XDG_CACHE_HOME), which holds the probes of CheckOps, is a
+    temporary folder of the test run. Every test of a FolderTest gets its
+    own temporary folder.
+'''
+
+import os
+import sys
+import atexit
+import shutil
+import tempfile
+import unittest
+
+FAAUTEC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "FAAUTeC")
+sys.path.insert(0, FAAUTEC_DIR)
+
+## set before the modules of FAAUTeC read it
+CACHE_HOME = tempfile.mkdtemp()
+os.environ["XDG_CACHE_HOME"] = CACHE_HOME
+atexit.register(shutil.rmtree, CACHE_HOME, True)
+
+class FolderTest(unittest.TestCase):
+    ''' A test case with the temporary folder self.dir; with chdir the
+        tests run in it '''
+
+    chdir = False
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cwd = os.getcwd()
+        if self.chdir:
+            os.chdir(self.dir)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.dir)
+
+    def write(self, name, text):
+        ''' Write text to the file name in self.dir and return its path '''
+        path = os.path.join(self.dir, name)
+        with open(path, "w") as outFile:
+            outFile.write(text)
+        return path
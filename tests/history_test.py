@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+''' Tests of the runtime history of HistoryOps '''
+
+import os
+import math
+import unittest
+
+import numpy as np
+
+import helper
+import HistoryOps as HsOps
+
+## log(seconds) = -9 + 1.2 * log(units) - 0.8 * log(threads)
+WEIGHTS = [-9.0, 1.2, -0.8]
+
+def runs(number, factor=1.0):
+    rng = np.random.default_rng(3)
+    units = np.exp(rng.uniform(8, 14, number)) * factor
+    threads = rng.integers(1, 9, number)
+    return [(float(u), int(t), math.exp(WEIGHTS[0] + WEIGHTS[1] * math.log(u / factor) + WEIGHTS[2] * math.log(t)))
+            for u, t in zip(units, threads)]
+
+def run(gene, seconds):
+    return {"gene": gene, "kind": "autest", "program": "CONSEL", "version": "0.20", "model": "GTRGAMMAI",
+            "taxa": 10, "sites": 1000, "patterns": 400, "trees": 3, "replicates": 10000, "threads": 2,
+            "units": 3000.0, "seconds": seconds}
+
+class FitTest(unittest.TestCase):
+
+    def testManyRuns(self):
+        ## many runs outweigh the prior
+        np.testing.assert_allclose(HsOps.fitRuns(runs(500), [0.0, 1.0, -1.0]), WEIGHTS, atol=0.05)
+
+    def testScale(self):
+        ## the pull of the prior does not depend on the unit of the
+        ## features: the same runs in other units give the same predictions
+        prior = [0.0, 1.0, -1.0]
+        small = HsOps.fitRuns(runs(4), prior)
+        large = HsOps.fitRuns(runs(4, 1000.0), [prior[0] + math.log(1000.0) * -prior[1], prior[1], prior[2]])
+        np.testing.assert_allclose(small[1:], large[1:])
+        np.testing.assert_allclose(small[0], large[0] + math.log(1000.0) * large[1])
+
+    def testConstantFeature(self):
+        ## runs with the same threads leave the weight of the threads at the
+        ## prior
+        fitted = HsOps.fitRuns([(u, 4, s) for u, t, s in runs(50)], [0.0, 1.0, -1.0])
+        self.assertAlmostEqual(fitted[2], -1.0)
+
+class HistoryTest(helper.FolderTest):
+
+    def testNoCacheDir(self):
+        self.assertIsNone(HsOps.openHistory(False))
+        self.assertEqual(HsOps.fit(None, {}, "GTRGAMMAI", {"autest": 1e-4}), {})
+
+    def testFit(self):
+        cache_dir = os.path.join(self.dir, "cache")
+        history = HsOps.openHistory(cache_dir)
+        HsOps.recordRuns(history, [run("g" + str(i), 0.5 * (i + 1)) for i in range(3)])
+        self.assertTrue(os.path.isfile(os.path.join(cache_dir, HsOps.HISTORY)))
+        fitted = HsOps.fit(history, {"CONSEL": "0.20"}, "GTRGAMMAI", {"autest": 1e-4, "search": 1e-3})
+        self.assertEqual(list(fitted), [("autest", "CONSEL")])
+        history.close()
+
+if __name__ == '__main__':
+    unittest.main()
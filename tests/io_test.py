@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+''' Tests of the alignment readers of IOOps '''
+
+import os
+import unittest
+
+import helper
+import IOOps as IOOps
+
+from Bio.Nexus import Nexus
+
+ALIGNMENT = [("a", "ACGTACGTACGTACGTACGT"),
+             ("b_c", "ACGTTCGTACGTACGAACGT"),
+             ("c", "ACGTACGTAC-TACGTAC-T")]
+
+FASTA = """>a description
+ACGTACGTAC
+GTACGTACGT
+>b_c
+ACGTTCGTACGTACGAACGT
+
+>c
+ACGTACGTAC-
+TACGTAC-T
+"""
+
+PHYLIP_SEQUENTIAL = """3 20
+a   ACGTACGTACGTACGTACGT
+b_c ACGTTCGTAC GTACGAACGT
+c   ACGTACGTAC-TACGTAC-T
+"""
+
+PHYLIP_INTERLEAVED = """3 20
+a   ACGTACGTAC
+b_c ACGTTCGTAC
+c   ACGTACGTAC
+
+GTACGTACGT
+GTACGAACGT
+-TACGTAC-T
+"""
+
+PHYLIP_WRAPPED = """3 20
+a   ACGTACGTAC
+GTACGTACGT
+b_c ACGTTCGTACGTACGAACGT
+c   ACGTACGTAC
+-TACG
+TAC-T
+"""
+
+NEXUS_SEQUENTIAL = """#NEXUS
+BEGIN DATA;
+DIMENSIONS NTAX=3 NCHAR=20;
+FORMAT DATATYPE=DNA MISSING=? GAP=-;
+MATRIX
+[wrapped over several lines]
+a ACGTACGTAC
+GTACGTACGT
+'b_c' ACGTTCGTAC GTACG
+AACGT
+c
+ACGTACGTAC-TACGTAC-T
+;
+END;
+"""
+
+NEXUS_INTERLEAVED = """#NEXUS
+BEGIN DATA;
+DIMENSIONS NTAX=3 NCHAR=20;
+FORMAT DATATYPE=DNA GAP=- INTERLEAVE;
+MATRIX
+a   ACGTACGTAC
+b_c ACGTTCGTAC
+c   ACGTACGTAC
+
+a   GTACGTACGT
+b_c GTACGAACGT
+c   -TACGTAC-T
+;
+END;
+"""
+
+class ReadAlignmentTest(helper.FolderTest):
+
+    def read(self, name, text):
+        return list(IOOps.Inp().readAlignment(self.write(name, text)))
+
+    def testFasta(self):
+        self.assertEqual(self.read("a.fasta", FASTA), ALIGNMENT)
+        self.assertEqual(self.read("a.fa", FASTA), ALIGNMENT)
+
+    def testPhylip(self):
+        self.assertEqual(self.read("a.phy", PHYLIP_SEQUENTIAL), ALIGNMENT)
+        self.assertEqual(self.read("b.phy", PHYLIP_INTERLEAVED), ALIGNMENT)
+        self.assertEqual(self.read("c.phy", PHYLIP_WRAPPED), ALIGNMENT)
+        self.assertEqual(self.read("d.phy", "2 12\nA ACGTAC\nGTACGT\nB ACGTAC\nGTACGT\n"),
+                         [("A", "ACGTACGTACGT"), ("B", "ACGTACGTACGT")])
+
+    def testNexus(self):
+        for text in [NEXUS_SEQUENTIAL, NEXUS_INTERLEAVED]:
+            path = self.write("a.nex", text)
+            nexus = Nexus.Nexus()
+            nexus.read(path)
+            self.assertEqual(list(IOOps.Inp().readAlignment(path)), ALIGNMENT)
+            self.assertEqual([(name, str(nexus.matrix[name]).upper()) for name in nexus.taxlabels], ALIGNMENT)
+
+    def testUnsupported(self):
+        with self.assertRaises(ValueError):
+            self.read("a.aln", FASTA)
+
+    def testNormalize(self):
+        ## gap only sequences are removed, N of PHYLIP files become gaps
+        path = self.write("a.phy", "3 4\na ACGN\nb ----\nc ACGT\n")
+        names, length = IOOps.Inp().normalizeAlignment(path, os.path.join(self.dir, "a.fasta"))
+        self.assertEqual((names, length), (["a", "c"], 4))
+        self.assertEqual(list(IOOps.Inp().readAlignment(os.path.join(self.dir, "a.fasta"))), [("a", "ACG-"), ("c", "ACGT")])
+
+    def testNormalizeUnequalLengths(self):
+        path = self.write("a.fasta", ">a\nACGT\n>b\nACG\n")
+        with self.assertRaises(ValueError):
+            IOOps.Inp().normalizeAlignment(path, os.path.join(self.dir, "b.fasta"))
+
+if __name__ == '__main__':
+    unittest.main()
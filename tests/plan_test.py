@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+''' Tests of the planning of PlanOps '''
+
+import os
+import unittest
+
+import helper
+import PlanOps as PlOps
+
+STAGES = ["ingest", "search", "evaluate", "autest"]
+
+def settings(**changes):
+    values = {"programs": ["CONSEL", "Native"], "mlcalc": "RAxML", "constraints": [{}, {}], "seed": 1,
+              "raxml_path": "raxmlHPC", "iqtree_path": "iqtree", "iqtree2_path": "iqtree2", "consel_path": "",
+              "bootstrap_number": 1000, "reuse_model": False, "replicates": 1}
+    values.update(changes)
+    return values
+
+class SimulateTest(unittest.TestCase):
+
+    def testOneStage(self):
+        ## two tasks of 1 and 3 seconds on one or two slots
+        self.assertEqual(PlOps.simulate([[1.0], [3.0]], {"a": 1}, ["a"]), 4.0)
+        self.assertEqual(PlOps.simulate([[1.0], [3.0]], {"a": 2}, ["a"]), 3.0)
+
+    def testPipeline(self):
+        ## the second stage of the first task overlaps the first stage of
+        ## the second task
+        self.assertEqual(PlOps.simulate([[1.0, 1.0], [1.0, 1.0]], {"a": 1, "b": 1}, ["a", "b"]), 3.0)
+
+    def testThreadBudget(self):
+        ## both stages need all threads, so they cannot overlap
+        durations = [[1.0, 1.0], [1.0, 1.0]]
+        self.assertEqual(PlOps.simulate(durations, {"a": 1, "b": 1}, ["a", "b"], {"a": 4, "b": 4}, 4), 4.0)
+        self.assertEqual(PlOps.simulate(durations, {"a": 1, "b": 1}, ["a", "b"], {"a": 2, "b": 2}, 4), 3.0)
+
+    def testLongestFirst(self):
+        self.assertEqual(PlOps.longestFirst([[1.0, 1.0], [5.0, 0.0], [1.0, 1.0], [0.5, 0.5]]), [1, 0, 2, 3])
+        ## a long task at the end delays the end of the run
+        durations = [[1.0], [1.0], [4.0]]
+        order = [durations[i] for i in PlOps.longestFirst(durations)]
+        self.assertLess(PlOps.simulate(order, {"a": 2}, ["a"]), PlOps.simulate(durations, {"a": 2}, ["a"]))
+
+class CostTest(unittest.TestCase):
+
+    def testCalls(self):
+        scan = {"taxa": 10, "sites": 1000, "patterns": 200}
+        graph = PlOps.calls("g", scan, settings())
+        self.assertEqual([call["step"] for call in graph],
+                         ["normalize alignment", "mltree_unconst", "mltree_hypo0", "mltree_hypo1", "evaluate", "autest_CONSEL", "autest_Native"])
+        self.assertEqual(graph[2]["after"], ["normalize alignment"])
+        ## with --reuse_model the hypotheses wait for the unconstrained tree
+        graph = PlOps.calls("g", scan, settings(reuse_model=True, replicates=2))
+        self.assertEqual(graph[2]["after"], ["mltree_unconst"])
+        self.assertEqual(len([call for call in graph if call["stage"] == "autest"]), 6)
+
+    def testEstimate(self):
+        scan = {"taxa": 10, "sites": 1000, "patterns": 200}
+        graph = PlOps.calls("g", scan, settings())
+        one = PlOps.estimate(graph, dict([(stage, 1) for stage in STAGES]), STAGES)
+        four = PlOps.estimate(graph, dict([(stage, 4) for stage in STAGES]), STAGES)
+        for s in range(len(STAGES)):
+            self.assertAlmostEqual(one[s], 4 * four[s])
+        ## a larger alignment takes longer in every stage
+        larger = PlOps.estimate(PlOps.calls("g", {"taxa": 20, "sites": 2000, "patterns": 400}, settings()), dict([(stage, 1) for stage in STAGES]), STAGES)
+        self.assertTrue(all([larger[s] > one[s] for s in range(len(STAGES))]))
+
+    def testPredict(self):
+        ## a fitted model of log(seconds) replaces the fixed coefficient
+        self.assertAlmostEqual(PlOps.predict(None, "search", "RAxML", 1e6, 2), PlOps.COEFFICIENTS["search"] * 1e6 / 2)
+        self.assertAlmostEqual(PlOps.predict({("search", "RAxML"): [0.0, 1.0, -1.0]}, "search", "RAxML", 100, 4), 25.0)
+        self.assertEqual(PlOps.predict(None, "search", "RAxML", 0, 1), 0.0)
+
+    def testChooseLimits(self):
+        graphs = [PlOps.calls("g" + str(i), {"taxa": 10 + i, "sites": 1000, "patterns": 200}, settings()) for i in range(4)]
+        limits, threads = PlOps.chooseLimits(graphs, 4, STAGES)
+        for stage in STAGES:
+            self.assertTrue(1 <= limits[stage] <= 4)
+            self.assertEqual(threads[stage], max(1, 4 // limits[stage]))
+
+class PlanTest(helper.FolderTest):
+
+    def testPlan(self):
+        tasks = []
+        for gene, taxa in [("small", 4), ("large", 12), ("broken", 0)]:
+            path = os.path.join(self.dir, gene + ".fasta")
+            with open(path, "w") as alignment:
+                for i in range(taxa):
+                    alignment.write(">t" + str(i) + "\n" + "ACGT"[i % 4] * 50 + "ACGT" * 50 + "\n")
+                if gene == "broken":
+                    alignment.write(">t0\nACGT\n>t1\nACG\n")
+            tasks.append((path, gene, None))
+        threads = dict([(stage, 1) for stage in STAGES])
+        runPlan = PlOps.plan(tasks, settings(threads=threads), dict([(stage, 1) for stage in STAGES]), STAGES, None, 2)
+        self.assertEqual([row["gene"] for row in runPlan["rows"]], ["large", "small", "broken"])
+        self.assertEqual((runPlan["rows"][0]["taxa"], runPlan["rows"][0]["sites"], runPlan["rows"][0]["patterns"]), (12, 250, 5))
+        self.assertIsNone(runPlan["rows"][2]["taxa"])
+        ## the unreadable alignment fails at once in the ingest stage
+        self.assertEqual(sum(runPlan["rows"][2]["seconds"]), 0)
+        self.assertGreater(runPlan["planned_s"], 0)
+        PlOps.writePlan(runPlan, os.path.join(self.dir, "plan.csv"))
+        with open(os.path.join(self.dir, "plan.csv")) as planFile:
+            self.assertEqual(len(planFile.readlines()), 4)
+
+if __name__ == '__main__':
+    unittest.main()
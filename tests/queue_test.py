@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+''' Tests of the work queue of QueueOps '''
+
+import os
+import time
+import unittest
+
+import helper
+import QueueOps as QOps
+import CacheOps as CaOps
+
+class QueueTest(helper.FolderTest):
+
+    def setUp(self):
+        helper.FolderTest.setUp(self)
+        self.queue = QOps.openQueue(os.path.join(self.dir, "queue.sqlite"))
+        QOps.submit(self.queue, {"root": self.dir, "cache": None, "constraints": []}, [("a.fasta", "a"), ("b.fasta", "b")])
+
+    def tearDown(self):
+        self.queue.close()
+        helper.FolderTest.tearDown(self)
+
+    def testUnits(self):
+        self.assertEqual(QOps.settings(self.queue), {"root": self.dir, "cache": None, "constraints": []})
+        self.assertEqual(QOps.claim(self.queue, "w1"), ("a", "a.fasta"))
+        self.assertEqual(QOps.claim(self.queue, "w2"), ("b", "b.fasta"))
+        self.assertIsNone(QOps.claim(self.queue, "w3"))
+        self.assertEqual(QOps.unfinished(self.queue), 2)
+        ## only the worker which holds a unit can complete it
+        self.assertFalse(QOps.complete(self.queue, "a", "w2", {"gene": "a"}))
+        self.assertTrue(QOps.complete(self.queue, "a", "w1", {"gene": "a"}))
+        self.assertTrue(QOps.fail(self.queue, "b", "w2", "RuntimeError: bad tree"))
+        self.assertEqual(QOps.unfinished(self.queue), 0)
+        self.assertEqual(QOps.collect(self.queue), [("a", {"gene": "a"}, None), ("b", None, "RuntimeError: bad tree")])
+        self.assertEqual(QOps.collect(self.queue), [])
+
+    def testSettings(self):
+        ## the settings are stored as JSON, the cache as its folder and size
+        ## and the taxa of the constraint trees as lists
+        cache = CaOps.ResultCache(os.path.join(self.dir, "cache"), 10, {"raxmlHPC": "RAxML 8.2.12"})
+        constraints = [{"newick": "((a,b),c);", "tree": [["a", "b"], "c"], "taxa": set(["a", "b", "c"])}]
+        QOps.submit(self.queue, {"root": self.dir, "cache": cache, "constraints": constraints, "threads": {"search": 2}}, [])
+        self.assertIn('"cache_dir"', self.queue.execute("SELECT settings FROM job").fetchone()[0])
+        settings = QOps.settings(self.queue)
+        self.assertEqual((settings["threads"], settings["constraints"]), ({"search": 2}, constraints))
+        self.assertEqual((settings["cache"].cache_dir, settings["cache"].max_size, settings["cache"].versions),
+                         (cache.cache_dir, cache.max_size, cache.versions))
+
+    def testLostWorker(self):
+        ## a unit without heartbeat is taken over until it was claimed
+        ## attempts times, then it fails
+        self.assertEqual(QOps.claim(self.queue, "w1", lease=0, attempts=2), ("a", "a.fasta"))
+        time.sleep(0.01)
+        self.assertEqual(QOps.claim(self.queue, "w2", lease=0, attempts=2), ("a", "a.fasta"))
+        self.assertFalse(QOps.complete(self.queue, "a", "w1", {"gene": "a"}))
+        time.sleep(0.01)
+        self.assertEqual(QOps.claim(self.queue, "w3", lease=0, attempts=2), ("b", "b.fasta"))
+        gene, result, error = QOps.collect(self.queue)[0]
+        self.assertEqual((gene, result), ("a", None))
+        self.assertIn("2 times", error)
+
+    def testAbandon(self):
+        QOps.claim(self.queue, "w1")
+        QOps.abandon(self.queue, "no worker left")
+        self.assertEqual(QOps.unfinished(self.queue), 0)
+        self.assertEqual([error for gene, result, error in QOps.collect(self.queue)], ["no worker left"] * 2)
+
+    def testResubmit(self):
+        ## a new job drops the units of the one before
+        QOps.claim(self.queue, "w1")
+        QOps.submit(self.queue, {"root": "other", "cache": None, "constraints": []}, [("c.fasta", "c")])
+        self.assertEqual(QOps.claim(self.queue, "w2"), ("c", "c.fasta"))
+        self.assertFalse(QOps.complete(self.queue, "a", "w1", {"gene": "a"}))
+
+if __name__ == '__main__':
+    unittest.main()
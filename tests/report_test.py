@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+''' Tests of the report parsers of ReportOps '''
+
+import unittest
+
+import helper
+import ReportOps as RpOps
+
+## the model and the table of tree tests of an .iqtree report of IQ-TREE 1.6
+IQTREE = """IQ-TREE 1.6.12 built Aug 15 2019
+
+SUBSTITUTION PROCESS
+--------------------
+
+Model of substitution: GTR+F+I+G4
+
+Rate parameter R:
+
+  A-C: 1.2000
+  A-G: 3.4000
+  A-T: 0.9000
+  C-G: 1.1000
+  C-T: 4.2000
+  G-T: 1.0000
+
+Proportion of invariable sites: 0.1200
+Gamma shape alpha: 0.5700
+
+USER TREES
+----------
+
+See 01_test1_IQTree.trees for trees with branch lengths.
+
+Tree      logL    deltaL  bp-RELL    p-KH     p-SH       c-ELW       p-AU
+-------------------------------------------------------------------------
+  1 -7632.6473       0  0.508 +  0.572 +      1 +     0.507 +    0.624 + 
+  2 -7633.4118  0.7645  0.492 +  0.428 +  0.663 +     0.493 +    0.376 + 
+  3 -7690.0021   57.35      0 -      0 -      0 -  1.1e-09 -   0.0012 - 
+
+deltaL  : logL difference from the maximal logl in the set.
+bp-RELL : bootstrap proportion using RELL method (Kishino et al. 1990).
+"""
+
+## the same table with the weighted tests of -zw
+IQTREE_WEIGHTED = """USER TREES
+----------
+
+Tree      logL    deltaL  bp-RELL    p-KH     p-SH    p-WKH    p-WSH       c-ELW       p-AU
+------------------------------------------------------------------------------------------
+  1 -7632.6473       0  0.508 +  0.572 +      1 +  0.572 +      1 +     0.507 +    0.624 + 
+  2 -7633.4118  0.7645  0.492 +  0.428 +  0.663 +  0.428 +  0.781 +     0.493 +    0.376 + 
+
+deltaL  : logL difference from the maximal logl in the set.
+"""
+
+## the output of catpv, ranked by the observed statistic
+CONSEL = """# reading 01_test1_CONSEL.pv
+# rank item    obs     au     np |     bp     pp     kh     sh    wkh    wsh |
+#    1    2   -1.1  0.743  0.673 |  0.671  0.752  0.714  0.894  0.714  0.934 |
+#    2    1    1.1  0.257  0.327 |  0.329  0.248  0.286  0.482  0.286  0.482 |
+#    3    3   57.4  0.001  1e-05 |      0  2e-25      0      0      0      0 |
+"""
+
+class ReportTest(helper.FolderTest):
+
+    def testIQTree(self):
+        tests = RpOps.readIQTree(self.write("a.iqtree", IQTREE), 3)
+        self.assertEqual([test.tree for test in tests], [1, 2, 3])
+        self.assertEqual(RpOps.au(tests), [0.376, 0.0012])
+        self.assertEqual(tests[1].logL, -7633.4118)
+        self.assertEqual(tests[2].elw, 1.1e-09)
+        self.assertIsNone(tests[0].wkh)
+
+    def testIQTreeWeighted(self):
+        tests = RpOps.readIQTree(self.write("a.iqtree", IQTREE_WEIGHTED), 2)
+        self.assertEqual(tests[1].wsh, 0.781)
+        self.assertEqual(RpOps.au(tests), [0.376])
+
+    def testConsel(self):
+        ## the rows are ordered by the number of the tree, not by rank
+        tests = RpOps.readConsel(self.write("a.consel", CONSEL), 3)
+        self.assertEqual([test.tree for test in tests], [1, 2, 3])
+        self.assertEqual(RpOps.au(tests), [0.743, 0.001])
+        self.assertEqual(tests[0].obs, 1.1)
+        self.assertEqual(tests[2].np, 1e-05)
+
+    def testWrongTreeNumber(self):
+        with self.assertRaises(RpOps.ReportError):
+            RpOps.readConsel(self.write("a.consel", CONSEL), 4)
+        with self.assertRaises(RpOps.ReportError):
+            RpOps.readIQTree(self.write("a.iqtree", IQTREE), 2)
+
+    def testMissingTable(self):
+        with self.assertRaises(RpOps.ReportError):
+            RpOps.readIQTree(self.write("a.iqtree", IQTREE.split("USER TREES")[0]))
+        with self.assertRaises(RpOps.ReportError):
+            RpOps.readConsel(self.write("a.consel", "# reading a.pv\n"))
+
+    def testMalformedLine(self):
+        with self.assertRaises(RpOps.ReportError):
+            RpOps.readConsel(self.write("a.consel", CONSEL.replace("0.257", "x")))
+
+    def testIQTreeModel(self):
+        self.assertEqual(RpOps.readIQTreeModel(self.write("a.iqtree", IQTREE)), "GTR{1.2,3.4,0.9,1.1,4.2}+F+I{0.12}+G{0.57}")
+        self.assertIsNone(RpOps.readIQTreeModel(self.write("b.iqtree", IQTREE_WEIGHTED)))
+
+if __name__ == '__main__':
+    unittest.main()
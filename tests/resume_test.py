@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+''' Tests of the checkpoints of ResumeOps '''
+
+import os
+import sqlite3
+import unittest
+
+import helper
+import ResumeOps as RsOps
+
+def settings(**changes):
+    values = {"constraints": [{"newick": "((a,b),(c,d));"}, {"newick": "((a,c),(b,d));"}],
+              "mlcalc": "RAxML", "programs": ["CONSEL"], "model": "GTRGAMMAI", "alpha_level": 0.05, "outgroup": False,
+              "reuse_model": False, "replicates": 1, "seed": 1, "bootstrap_number": 10000,
+              "raxml_path": "raxmlHPC", "iqtree_path": "iqtree", "iqtree2_path": "iqtree2", "consel_path": "",
+              "versions": {"raxmlHPC": "8.2.12"}}
+    values.update(changes)
+    return values
+
+## the table of tree tests of an .iqtree report with three trees
+IQTREE = """USER TREES
+----------
+
+Tree      logL    deltaL  bp-RELL    p-KH     p-SH       c-ELW       p-AU
+-------------------------------------------------------------------------
+  1 -7632.6473       0  0.508 +  0.572 +      1 +     0.507 +    0.624 + 
+  2 -7633.4118  0.7645  0.492 +  0.428 +  0.663 +     0.493 +    0.376 + 
+  3 -7690.0021   57.35      0 -      0 -      0 -  1.1e-09 -   0.0012 - 
+
+deltaL  : logL difference from the maximal logl in the set.
+"""
+
+class ResumeTest(helper.FolderTest):
+
+    chdir = True
+
+    def setUp(self):
+        helper.FolderTest.setUp(self)
+        self.store = sqlite3.connect("results.sqlite")
+
+    def tearDown(self):
+        self.store.close()
+        helper.FolderTest.tearDown(self)
+
+    def testFingerprint(self):
+        run = RsOps.fingerprint(settings())
+        self.assertEqual(run, RsOps.fingerprint(settings()))
+        ## the same number of edited constraint trees
+        self.assertNotEqual(run, RsOps.fingerprint(settings(constraints=[{"newick": "((a,b),(c,d));"}, {"newick": "((a,d),(b,c));"}])))
+        for name, value in [("bootstrap_number", 1000), ("model", "GTRGAMMA"), ("outgroup", "a"), ("programs", ["CONSEL", "Native"]),
+                            ("seed", 2), ("versions", {"raxmlHPC": "8.2.13"})]:
+            self.assertNotEqual(run, RsOps.fingerprint(settings(**{name: value})), name)
+        ## the version of a program which is not used does not matter
+        self.assertEqual(run, RsOps.fingerprint(settings(versions={"raxmlHPC": "8.2.12", "iqtree": "2.0"})))
+
+    def testManifest(self):
+        run = RsOps.fingerprint(settings())
+        manifest = RsOps.openManifest(self.store, run)
+        self.assertEqual(manifest["genes"], {})
+        RsOps.recordGene(self.store, manifest, {"gene": "g1", "files": ["g1.tre"]})
+        RsOps.recordGene(self.store, manifest, {"gene": "g2", "files": ["g2.tre"]})
+        self.assertEqual(sorted(RsOps.openManifest(self.store, run)["genes"]), ["g1", "g2"])
+        RsOps.keepGenes(self.store, manifest, {"g2": manifest["genes"]["g2"]})
+        self.assertEqual(sorted(RsOps.openManifest(self.store, run)["genes"]), ["g2"])
+        self.assertFalse(RsOps.openManifest(self.store, RsOps.fingerprint(settings(seed=2))))
+
+    def testFinishedGenes(self):
+        for gene in ["g1", "g2", "g3", "g4"]:
+            os.makedirs(gene)
+            for name in ["unconst.tre", "hypo0.tre", "hypo1.tre"]:
+                with open(os.path.join(gene, name), "w") as treeFile:
+                    treeFile.write("((a:0.1,b:0.2):0.1,(c,d));\n")
+            with open(os.path.join(gene, gene + ".iqtree"), "w") as report:
+                report.write(IQTREE)
+        ## a tree and a report which were cut off while they were written
+        with open("g2/hypo1.tre", "w") as treeFile:
+            treeFile.write("((a:0.1,b:0.2):0.1,(c")
+        with open("g3/g3.iqtree", "w") as report:
+            report.write(IQTREE[:IQTREE.index("  3 ")])
+        ## an empty artifact counts as missing
+        open("g4/hypo0.tre", "w").close()
+        files = ["unconst.tre", "hypo0.tre", "hypo1.tre"]
+        manifest = {"genes": dict([(gene, {"files": files + [gene + ".iqtree"]}) for gene in ["g1", "g2", "g3", "g4"]] +
+                                  [("g5", {"files": []})])}
+        geneDirs = dict([(gene, gene) for gene in ["g1", "g2", "g3", "g4"]])
+        self.assertEqual(sorted(RsOps.finishedGenes(manifest, geneDirs, 3)), ["g1"])
+        ## a report with fewer trees than the run has hypotheses
+        self.assertEqual(sorted(RsOps.finishedGenes(manifest, geneDirs, 4)), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+''' Tests of the scheduling of SchedOps '''
+
+import os
+import time
+import functools
+import unittest
+
+import helper
+import SchedOps as SOps
+
+def stage(name, state):
+    ## a stage which records when it ran in its own file
+    start = time.time()
+    time.sleep(0.2)
+    with open(os.path.join(state["dir"], state["task"] + "_" + name), "w") as record:
+        record.write(str(start) + " " + str(time.time()))
+    if state["task"] == "stop" and name == "a":
+        return None
+    return dict(state, stages=state["stages"] + [name])
+
+def peak(folder, threads):
+    ## the largest number of threads in use at the same time
+    events = []
+    for name in os.listdir(folder):
+        with open(os.path.join(folder, name)) as record:
+            start, end = [float(value) for value in record.read().split()]
+        events = events + [(start, threads[name.split("_")[-1]]), (end, -threads[name.split("_")[-1]])]
+    used = 0
+    most = 0
+    ## a call which ends frees its threads before the next one starts
+    for moment, change in sorted(events, key=lambda event: (event[0], event[1])):
+        used = used + change
+        most = max(most, used)
+    return most
+
+class SplitTest(unittest.TestCase):
+
+    def testSplitThreads(self):
+        self.assertEqual(SOps.splitThreads(8, 2, 10), (2, 4))
+        ## no more jobs than threads or tasks
+        self.assertEqual(SOps.splitThreads(4, 8, 10), (4, 1))
+        self.assertEqual(SOps.splitThreads(8, 4, 1), (1, 8))
+
+    def testStageLimits(self):
+        stages = ["search", "autest"]
+        self.assertEqual(SOps.stageLimits(2, None, stages), {"search": 2, "autest": 2})
+        self.assertEqual(SOps.stageLimits(2, "autest=4", stages), {"search": 2, "autest": 4})
+        for spec in ["autest", "other=2", "autest=x"]:
+            with self.assertRaises(ValueError):
+                SOps.stageLimits(2, spec, stages)
+
+    def testRunThreads(self):
+        ## the results keep the order of the tasks
+        self.assertEqual(SOps.runThreads(lambda task: time.sleep(0.01 * (5 - task)) or task * 2, list(range(5)), 3),
+                         [0, 2, 4, 6, 8])
+
+class PipelineTest(helper.FolderTest):
+
+    def setUp(self):
+        helper.FolderTest.setUp(self)
+        ## partial objects of a function of the module can be pickled
+        self.stages = [(name, functools.partial(stage, name)) for name in ["a", "b"]]
+
+    def tasks(self, names):
+        return [{"dir": self.dir, "task": name, "stages": []} for name in names]
+
+    def testStages(self):
+        ## every task passes all stages, None ends the way of a task
+        written = []
+        SOps.runPipeline(self.stages, self.tasks(["t1", "stop", "t2"]), {"a": 2, "b": 2}, written.append)
+        self.assertEqual(sorted([state["task"] for state in written if state]), ["t1", "t2"])
+        self.assertEqual([state["stages"] for state in written if state], [["a", "b"], ["a", "b"]])
+        self.assertEqual(written.count(None), 1)
+        self.assertFalse(os.path.isfile(os.path.join(self.dir, "stop_b")))
+
+    def testThreadBudget(self):
+        ## stage a needs 2 and stage b 3 threads, so only one call of b or
+        ## two calls of a fit into a budget of 4 threads
+        written = []
+        threads = {"a": 2, "b": 3}
+        SOps.runPipeline(self.stages, self.tasks(["t" + str(i) for i in range(4)]), {"a": 4, "b": 4}, written.append, threads, 4)
+        self.assertEqual(len(written), 4)
+        self.assertLessEqual(peak(self.dir, threads), 4)
+        ## without the budget the calls would overlap
+        for name in os.listdir(self.dir):
+            os.remove(os.path.join(self.dir, name))
+        SOps.runPipeline(self.stages, self.tasks(["t" + str(i) for i in range(4)]), {"a": 4, "b": 4}, written.append)
+        self.assertGreater(peak(self.dir, threads), 4)
+
+if __name__ == '__main__':
+    unittest.main()
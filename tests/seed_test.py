@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+''' Tests of the seeds of SeedOps '''
+
+import unittest
+
+import helper
+import SeedOps as SdOps
+
+class SeedTest(unittest.TestCase):
+
+    def testSeed(self):
+        ## the same call gets the same seed in every process and run
+        self.assertEqual(SdOps.seed(1, "gene1", "hypo0", "RAxML"), SdOps.seed(1, "gene1", "hypo0", "RAxML"))
+        seeds = [SdOps.seed(run, gene, step, program) for run in [1, 2] for gene in ["gene1", "gene2"]
+                 for step in ["unconst", "hypo0", "evaluate"] for program in ["RAxML", "IQTree"]]
+        self.assertEqual(len(set(seeds)), len(seeds))
+        for seed in seeds:
+            self.assertTrue(1 <= seed <= SdOps.MAX_SEED)
+
+    def testNames(self):
+        ## the names are separated, so they cannot run into each other
+        self.assertNotEqual(SdOps.seed(1, "gene1", "0"), SdOps.seed(1, "gene", "10"))
+        self.assertNotEqual(SdOps.seed(1, "a"), SdOps.seed(1, "a", ""))
+
+    def testTreeSeeds(self):
+        self.assertEqual(SdOps.treeSeeds(5, "gene1", "IQTree", 2),
+                         [SdOps.seed(5, "gene1", "unconst", "IQTree"), SdOps.seed(5, "gene1", "hypo0", "IQTree"),
+                          SdOps.seed(5, "gene1", "hypo1", "IQTree")])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+''' Tests of the results store of StoreOps '''
+
+import os
+import unittest
+
+import helper
+import StoreOps as StOps
+
+PROGRAMS = ["CONSEL", "IQTree"]
+
+def records(gene, p_values, closest=0, runtime=1.0):
+    ## one record per hypothesis and program, p_values[program][i]
+    return [{"gene": gene, "hypothesis": i, "program": program, "p_value": p_values[program][i],
+             "significant": p_values[program][i] <= 0.05, "closest": i == closest,
+             "loglik": -100.0 - i, "unconst_loglik": -99.0, "runtime": runtime}
+            for program in PROGRAMS for i in range(len(p_values[program]))]
+
+def evaluation(runtime):
+    return {"program": "RAxML", "version": "8.2.12", "model": "GTRGAMMAI", "trees": 3, "sites": 100, "patterns": 40,
+            "runtime": runtime}
+
+class StoreTest(helper.FolderTest):
+
+    def setUp(self):
+        helper.FolderTest.setUp(self)
+        self.store = StOps.openStore(os.path.join(self.dir, "results.sqlite"))
+
+    def tearDown(self):
+        self.store.close()
+        helper.FolderTest.tearDown(self)
+
+    def testRecordGene(self):
+        StOps.recordGene(self.store, "g1", records("g1", {"CONSEL": [0.5, 0.01], "IQTree": [0.4, 0.02]}), evaluation(2.0),
+                         seeds=[{"gene": "g1", "step": "evaluate", "program": "RAxML", "seed": 7}])
+        ## recording a gene again replaces all its rows
+        StOps.recordGene(self.store, "g1", records("g1", {"CONSEL": [0.6, 0.01], "IQTree": [0.4, 0.03]}), evaluation(3.0))
+        self.assertEqual(self.store.execute("SELECT COUNT(*) FROM results").fetchone()[0], 4)
+        self.assertEqual(self.store.execute("SELECT runtime FROM evaluations").fetchall(), [(3.0,)])
+        self.assertEqual(self.store.execute("SELECT COUNT(*) FROM seeds").fetchone()[0], 0)
+
+    def testTransaction(self):
+        ## a gene which fails while it is written keeps its earlier rows
+        StOps.recordGene(self.store, "g1", records("g1", {"CONSEL": [0.5, 0.01], "IQTree": [0.4, 0.02]}), evaluation(2.0))
+        broken = records("g1", {"CONSEL": [0.6, 0.01], "IQTree": [0.4, 0.03]})
+        del broken[-1]["runtime"]
+        with self.assertRaises(KeyError):
+            StOps.recordGene(self.store, "g1", broken, evaluation(3.0))
+        self.assertEqual(self.store.execute("SELECT p_value FROM results WHERE program = 'CONSEL' AND hypothesis = 0").fetchall(), [(0.5,)])
+        self.assertEqual(self.store.execute("SELECT runtime FROM evaluations").fetchall(), [(2.0,)])
+
+    def testGenes(self):
+        ## the genes are ordered by name, not by the order they finished in
+        for gene in ["g3", "g1", "g2"]:
+            StOps.recordGene(self.store, gene, records(gene, {"CONSEL": [0.5], "IQTree": [0.5]}))
+        self.assertEqual(StOps.genes(self.store), ["g1", "g2", "g3"])
+        StOps.keepGenes(self.store, ["g2"])
+        self.assertEqual(StOps.genes(self.store), ["g2"])
+
+    def testWriteTable(self):
+        StOps.recordGene(self.store, "g1", records("g1", {"CONSEL": [0.5, 0.01], "IQTree": [0.4, 0.02]}, closest=0, runtime=1.5),
+                         evaluation(2.0))
+        StOps.recordGene(self.store, "g2", records("g2", {"CONSEL": [0.04, 0.3], "IQTree": [0.05, 0.2]}, closest=1))
+        path = os.path.join(self.dir, "au_runtime_table.csv")
+        StOps.writeTable(self.store, path, PROGRAMS, 2)
+        with open(path) as csvFile:
+            lines = csvFile.read().splitlines()
+        ## '*' marks significant p-values and 's' the closest tree
+        self.assertEqual(lines, ["gene,CONSEL_hypo0,IQTree_hypo0,CONSEL_hypo1,IQTree_hypo1,runtime_CONSEL,runtime_IQTree,runtime_evaluation",
+                                 "g1,0.5s,0.4s,0.01*,0.02*,1.5,1.5,2.0",
+                                 "g2,0.04*,0.05*,0.3s,0.2s,1.0,1.0,None"])
+
+    def testReplicates(self):
+        StOps.recordGene(self.store, "g1", records("g1", {"CONSEL": [0.5], "IQTree": [0.5]}),
+                         replicates=[{"gene": "g1", "hypothesis": 0, "program": "CONSEL", "replicate": i, "seed": i,
+                                      "p_value": value, "runtime": 1.0} for i, value in enumerate([0.2, 0.4])])
+        ## only CONSEL was repeated
+        [row] = StOps.replicateSummary(self.store, PROGRAMS, 1)
+        self.assertEqual(row[:4] + row[6:], ["g1", "CONSEL", "hypo0", 2, 0.2, 0.4])
+        self.assertAlmostEqual(row[4], 0.3)
+        self.assertAlmostEqual(row[5], 0.02 ** 0.5)
+
+if __name__ == '__main__':
+    unittest.main()
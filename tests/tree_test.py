@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+''' Tests of the tree distances of TreeOps against DendroPy '''
+
+import random
+import unittest
+
+import helper
+import TreeOps as TOps
+
+import dendropy
+from dendropy.simulate import treesim
+from dendropy.calculate import treecompare
+
+def randomTrees(number, taxa, seed):
+    ''' Newick strings of random trees with random branch lengths '''
+    rng = random.Random(seed)
+    namespace = dendropy.TaxonNamespace(["t" + str(i) for i in range(taxa)])
+    trees = []
+    for i in range(number):
+        tree = treesim.birth_death_tree(birth_rate=1.0, death_rate=0.0, taxon_namespace=namespace, num_extant_tips=taxa, rng=rng)
+        for edge in tree.postorder_edge_iter():
+            edge.length = round(rng.random(), 3)
+        trees.append(tree.as_string(schema="newick", suppress_rooting=True).strip())
+    return trees, namespace
+
+class TreeTest(unittest.TestCase):
+
+    def testAgainstDendroPy(self):
+        newicks, namespace = randomTrees(5, 10, 1)
+        distances = TOps.distanceMatrices(newicks)
+        trees = [dendropy.Tree.get(data=newick, schema="newick", taxon_namespace=namespace, rooting="force-unrooted") for newick in newicks]
+        for tree in trees:
+            tree.encode_bipartitions()
+        for i in range(len(trees)):
+            for j in range(len(trees)):
+                self.assertEqual(distances["rf"][i, j], treecompare.symmetric_difference(trees[i], trees[j]))
+                self.assertAlmostEqual(distances["wrf"][i, j], treecompare.weighted_robinson_foulds_distance(trees[i], trees[j]))
+                self.assertAlmostEqual(distances["euclidean"][i, j], treecompare.euclidean_distance(trees[i], trees[j]))
+
+    def testRootingAndOrder(self):
+        ## the same unrooted tree, rooted elsewhere and with other orders
+        distances = TOps.distanceMatrices(["((a:1,b:2):0.5,(c:3,d:4):0.5);",
+                                           "(a:1,b:2,(c:3,d:4):1);",
+                                           "((d:4,c:3):1,b:2,a:1);"])
+        self.assertEqual(distances["rf"].max(), 0)
+        self.assertAlmostEqual(distances["wrf"].max(), 0.0)
+
+    def testLabelsAndComments(self):
+        ## support values, quoted names and comments do not change the splits
+        distances = TOps.distanceMatrices(["(('a b':1,b:1)100:1,(c:1,d:1)95:1);",
+                                           "(('a b':1,b:1)[&support=1]:1,(c:1,d:1):1);"])
+        self.assertEqual(distances["rf"][0, 1], 0)
+        self.assertAlmostEqual(distances["euclidean"][0, 1], 0.0)
+
+    def testWriteDistances(self):
+        distances = TOps.distanceMatrices(["((a:1,b:1):1,(c:1,d:1):1);", "((a:1,c:1):1,(b:1,d:1):1);"])
+        rows = TOps.writeDistances(distances, "gene", ["unconst", "hypo0"])
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[2], "gene,rf,unconst,0,2\n")
+
+if __name__ == '__main__':
+    unittest.main()